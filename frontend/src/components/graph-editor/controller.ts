@@ -238,6 +238,9 @@ export class GraphController {
       case "linearRegression":
         parameters = ["x", "y", "hyp/testSize"]
         break;
+      case "regressionSweep":
+        parameters = ["x", "y", "sweep/testSizes", "sweep/alphas", "sweep/featureSubsets", "sweep/mode", "sweep/samples", "sweep/seed"]
+        break;
     }
 
     return parameters.reduce((val, param) => ({ ...val, [param]: node.getData(param) }), {}) as any;
@@ -4,12 +4,14 @@ import DataSourceNode from "./nodes/datasource";
 import JoinNode from "./nodes/join";
 import RenameNode from "./nodes/rename";
 import LinearRegressionNode from "./nodes/linear-regression";
+import RegressionSweepNode from "./nodes/regression-sweep";
 
 export const nodeTypes: NodeTypes = {
   dataSource: DataSourceNode,
   join: JoinNode,
   filter: FilterNode,
   linearRegression: LinearRegressionNode,
+  regressionSweep: RegressionSweepNode,
   rename: RenameNode,
 };
 
@@ -19,4 +21,5 @@ export const nodeTypeList = [
   { id: "filter", name: "Filter" },
   { id: "rename", name: "Rename" },
   { id: "linearRegression", name: "Linear Regression" },
+  { id: "regressionSweep", name: "Regression Sweep" },
 ];
@@ -220,7 +220,7 @@ export default function LinearRegressionNode({
   );
 }
 
-function FeatureSelectionModal({
+export function FeatureSelectionModal({
   schema,
   id,
   controller,
@@ -349,7 +349,7 @@ function OutputModal({ result }: { result: any }) {
   }
 }
 
-function InferenceModal({
+export function InferenceModal({
   kernelId,
   modelNodeId,
   controller,
@@ -416,8 +416,13 @@ function InferenceModal({
           throw new Error(`Server returned with status code ${status}`);
         }
 
-        const output = JSON.parse(data[modelNodeId].stream_text.trim());
-        setInference(output);
+        if (data[modelNodeId].error) {
+          throw new Error(data[modelNodeId].error.evalue);
+        }
+
+        // one row of inputs, one row of predictions
+        const output = data[modelNodeId].predictions[0];
+        setInference(Array.isArray(output) ? output : [output]);
       })
       .catch((err) => {
         console.error(err);
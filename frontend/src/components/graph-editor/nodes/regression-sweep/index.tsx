@@ -0,0 +1,379 @@
+import { Handle, NodeProps, Position } from "reactflow";
+import "./style.css";
+import {
+  Box,
+  Button,
+  Group,
+  NumberInput,
+  SegmentedControl,
+  Stack,
+  Switch,
+  Table,
+  TagsInput,
+  Text,
+  Tooltip,
+} from "@mantine/core";
+import { useGraph } from "../../context";
+import { TDataSourceSchema } from "../../../../types";
+import { useEffect, useRef, useState } from "react";
+import { GraphController, GraphNode } from "../../controller";
+import { modals } from "@mantine/modals";
+import RunButton from "../../run-button";
+import { useProjectContext } from "../../../../context/projectContext";
+import { useExecutionContext } from "../../../../context/executionContext";
+import { IconActivity, IconFileDatabase } from "@tabler/icons-react";
+import { FeatureSelectionModal, InferenceModal } from "../linear-regression";
+
+export default function RegressionSweepNode({
+  isConnectable,
+  selected,
+  id,
+}: NodeProps) {
+  const { controller } = useGraph();
+  const source = useRef<any>(undefined);
+  const [schema, setSchema] = useState<TDataSourceSchema>();
+  const [incomingNode, setIncomingNode] = useState<GraphNode>();
+  const kernelId = useProjectContext((state) => state.kernelId);
+  const result = useExecutionContext((state) => state.nodes)[id];
+  const executing = useExecutionContext((state) => state.executing);
+  const execute = useExecutionContext((state) => state.execute);
+
+  useEffect(() => {
+    return controller.subscribe(id, (node) => {
+      const nodes: GraphNode[] = [];
+      node.getIncomingNodes().forEach((id) => {
+        nodes.push(controller.getNode(id));
+      });
+      setIncomingNode(nodes.length > 0 ? nodes[0] : undefined);
+    });
+  }, [id, controller]);
+
+  useEffect(() => {
+    if (incomingNode === undefined) {
+      setSchema(undefined);
+      return;
+    }
+
+    // fetch initial data
+    source.current = incomingNode.getData("dataSource");
+
+    if (source.current) {
+      setSchema(source.current.schema);
+    }
+
+    const callback = ({ detail }: any) => {
+      source.current = detail;
+      setSchema(detail.schema);
+    };
+
+    incomingNode.addEventListener("dataSource", callback);
+
+    return () => {
+      if (incomingNode)
+        incomingNode.removeEventListener("dataSource", callback);
+    };
+  }, [incomingNode]);
+
+  const handleSelectFeature = () => {
+    modals.open({
+      title: "Select Features",
+      centered: true,
+      size: "md",
+      children: (
+        <FeatureSelectionModal
+          schema={schema ?? []}
+          id={id}
+          controller={controller}
+        />
+      ),
+    });
+  };
+
+  const handleSweepButton = () => {
+    modals.open({
+      title: "Search space",
+      centered: true,
+      size: "md",
+      children: (
+        <SweepModal
+          controller={controller}
+          id={id}
+        />
+      ),
+    });
+  };
+
+  const handleExecute = () => {
+    execute(kernelId, controller, id);
+  };
+
+  const showOutput = () => {
+    modals.open({
+      title: "Leaderboard",
+      centered: true,
+      size: "xl",
+      withCloseButton: true,
+      children: <OutputModal result={result} />,
+    });
+  };
+
+  const showInferenceDialog = () => {
+    modals.open({
+      title: "Inference",
+      centered: true,
+      size: "lg",
+      withCloseButton: true,
+      children: (
+        <InferenceModal
+          result={result}
+          kernelId={kernelId}
+          modelNodeId={id}
+          controller={controller}
+          schema={schema}
+        />
+      ),
+    });
+  };
+
+  return (
+    <div
+      className={`node regression-sweep-node ${selected ? "selected" : ""}`}>
+      {kernelId && schema && (
+        <RunButton
+          onClick={handleExecute}
+          disabled={executing}
+        />
+      )}
+
+      <Group
+        justify="space-between"
+        align="center">
+        <label>Regression Sweep</label>
+        <Group gap="5px">
+          {result && (
+            <Tooltip
+              label="leaderboard"
+              position="left">
+              <Button
+                variant="light"
+                size="xs"
+                className="nodrag"
+                onClick={showOutput}
+                h="28"
+                w="28"
+                p="0">
+                <IconFileDatabase size={12} />
+              </Button>
+            </Tooltip>
+          )}
+          {result && result.stream_text && (
+            <Tooltip
+              label="infer with the best model"
+              position="left">
+              <Button
+                variant="light"
+                size="xs"
+                className="nodrag"
+                onClick={showInferenceDialog}
+                h="28"
+                w="28"
+                p="0">
+                <IconActivity size={12} />
+              </Button>
+            </Tooltip>
+          )}
+        </Group>
+      </Group>
+
+      <Stack
+        mt="sm"
+        gap="xs">
+        <Button
+          size="xs"
+          w="100%"
+          disabled={!schema}
+          onClick={handleSelectFeature}>
+          Select Features
+        </Button>
+        <Button
+          size="xs"
+          w="100%"
+          disabled={!schema}
+          onClick={handleSweepButton}>
+          Search space
+        </Button>
+      </Stack>
+
+      <Handle
+        type="target"
+        position={Position.Left}
+        id="a"
+        isConnectable={isConnectable}
+        title="dataset"
+      />
+    </div>
+  );
+}
+
+function SweepModal({
+  controller,
+  id,
+}: {
+  controller: GraphController;
+  id: string;
+}) {
+  const node = controller.getNode(id);
+  const [testSizes, setTestSizes] = useState<string[]>(
+    (node.getData("sweep/testSizes") ?? [20]).map(String)
+  );
+  const [alphas, setAlphas] = useState<string[]>(
+    (node.getData("sweep/alphas") ?? [0]).map(String)
+  );
+  const [featureSubsets, setFeatureSubsets] = useState<boolean>(
+    node.getData("sweep/featureSubsets") ?? false
+  );
+  const [mode, setMode] = useState<string>(
+    node.getData("sweep/mode") ?? "grid"
+  );
+  const [samples, setSamples] = useState<number | string>(
+    node.getData("sweep/samples") ?? 10
+  );
+  const [seed, setSeed] = useState<number | string>(
+    node.getData("sweep/seed") ?? 0
+  );
+
+  // keeps the numbers of a list, in range
+  const parseList = (values: string[], min: number, max: number) =>
+    values
+      .map((value) => Number.parseFloat(value))
+      .filter((value) => !Number.isNaN(value) && value >= min && value <= max);
+
+  return (
+    <Box>
+      <Stack mb="25px">
+        <TagsInput
+          label="Test sizes (%)"
+          description="every value is tried, press enter after each"
+          value={testSizes}
+          onChange={(values) => {
+            const parsed = parseList(values, 1, 99);
+            setTestSizes(parsed.map(String));
+            node.setData("sweep/testSizes", parsed);
+          }}
+        />
+        <TagsInput
+          label="Regularization (alpha)"
+          description="0 fits a plain linear regression, larger values a ridge regression"
+          value={alphas}
+          onChange={(values) => {
+            const parsed = parseList(values, 0, Number.MAX_VALUE);
+            setAlphas(parsed.map(String));
+            node.setData("sweep/alphas", parsed);
+          }}
+        />
+        <Switch
+          label="Try every subset of the selected features"
+          checked={featureSubsets}
+          onChange={(ev) => {
+            const value = ev.currentTarget.checked;
+            setFeatureSubsets(value);
+            node.setData("sweep/featureSubsets", value);
+          }}
+        />
+        <Group>
+          <Text>Search: </Text>
+          <SegmentedControl
+            value={mode}
+            data={[
+              { label: "Grid", value: "grid" },
+              { label: "Random", value: "random" },
+            ]}
+            onChange={(value) => {
+              setMode(value);
+              node.setData("sweep/mode", value);
+            }}
+          />
+        </Group>
+        {mode === "random" && (
+          <NumberInput
+            label="Candidates"
+            min={1}
+            value={samples}
+            onChange={(value) => {
+              setSamples(value);
+              node.setData("sweep/samples", Number(value));
+            }}
+          />
+        )}
+        <NumberInput
+          label="Seed"
+          description="splits and random samples are the same for the same seed"
+          min={0}
+          value={seed}
+          onChange={(value) => {
+            setSeed(value);
+            node.setData("sweep/seed", Number(value));
+          }}
+        />
+      </Stack>
+      <Group justify="flex-end">
+        <Button
+          size="sm"
+          onClick={() => modals.closeAll()}>
+          Done
+        </Button>
+      </Group>
+    </Box>
+  );
+}
+
+function OutputModal({ result }: { result: any }) {
+  if (result === null) {
+    modals.closeAll();
+    return null;
+  }
+
+  if (result.error) {
+    return <pre>{result.error}</pre>;
+  }
+
+  if (result.stream_text) {
+    // the leaderboard is the last line printed by the cell
+    const { leaderboard, candidates } = JSON.parse(
+      result.stream_text.trim().split("\n").pop()
+    );
+    return (
+      <Stack>
+        <Text size="sm">
+          {candidates} candidates, the best one is used for inference
+        </Text>
+        <Table>
+          <Table.Thead>
+            <Table.Tr>
+              <Table.Th>#</Table.Th>
+              <Table.Th>Features</Table.Th>
+              <Table.Th>Test size</Table.Th>
+              <Table.Th>Alpha</Table.Th>
+              <Table.Th>R²</Table.Th>
+              <Table.Th>Fit time</Table.Th>
+            </Table.Tr>
+          </Table.Thead>
+          <Table.Tbody>
+            {leaderboard.map((entry: any, index: number) => (
+              <Table.Tr key={index}>
+                <Table.Td>{index + 1}</Table.Td>
+                <Table.Td>{entry.features.join(", ")}</Table.Td>
+                <Table.Td>{(entry.test_size * 100).toFixed(0)}%</Table.Td>
+                <Table.Td>{entry.alpha}</Table.Td>
+                <Table.Td>
+                  {entry.score === null ? "-" : entry.score.toFixed(4)}
+                </Table.Td>
+                <Table.Td>{(entry.fit_seconds * 1000).toFixed(1)}ms</Table.Td>
+              </Table.Tr>
+            ))}
+          </Table.Tbody>
+        </Table>
+      </Stack>
+    );
+  }
+}
@@ -2,37 +2,51 @@ import { client } from "../api"
 import { GraphController } from "../components/graph-editor/controller";
 import { KernelStatus } from "../stores/project";
 
-function connectKernel(projectId: string, intervalMs: number = 1500) {
-  const abortController = new AbortController();
-  let timeoutId: number | null = null
+type KernelStatusEvent = { status: KernelStatus, kernel_id: string | null, error: string | null };
+
+function connectKernel(projectId: string) {
+  let events: EventSource | null = null;
+  let cancelStream: (() => void) | null = null;
 
   return {
-    watch: (cb: (data: null | { status: KernelStatus, kernel_id: string }, err: Error | null) => void) => {
-      if (timeoutId !== null) return;
-
-      const poll = async () => {
-        await client.post(`/projects/${projectId}/connect`, { signal: abortController.signal })
-          .then(({ data, status }) => {
-            if (status !== 200) {
-              cb(null, new Error(`Response status ${status}`));
-            } else {
-              cb(data, null);
-            }
-          })
-          .catch(err => {
-            cb(null, err);
-          });
-
-        if (!abortController.signal.aborted) {
-          timeoutId = setTimeout(poll, intervalMs);
-        }
-      }
-
-      timeoutId = setTimeout(poll, intervalMs);
+    watch: (cb: (data: null | KernelStatusEvent, err: Error | null) => void) => {
+      if (cancelStream !== null) return;
+
+      let cancelled = false;
+      const subscribe = () => {
+        if (cancelled) return;
+        // kernel state changes are pushed by the server, starting with the current state
+        events = new EventSource(`${import.meta.env.VITE_API_URL}/projects/${projectId}/events`);
+        events.onmessage = (message) => {
+          const event = JSON.parse(message.data);
+          if (event.type === "kernel_status") {
+            cb(event, null);
+          }
+        };
+        events.onerror = () => {
+          cb(null, new Error("Kernel event stream interrupted"));
+        };
+      };
+
+      cancelStream = () => {
+        cancelled = true;
+        events?.close();
+      };
+
+      client.post(`/projects/${projectId}/connect`)
+        .then(({ status }) => {
+          if (status !== 200) {
+            cb(null, new Error(`Response status ${status}`));
+            return;
+          }
+          subscribe();
+        })
+        .catch(err => {
+          cb(null, err);
+        });
     },
     cancel: () => {
-      abortController.abort("Cancelled");
-      if (timeoutId !== null) clearTimeout(timeoutId);
+      cancelStream?.();
     }
   } as const;
 }
@@ -53,10 +67,33 @@ async function execute(kernel_id: string, graphController: GraphController, sour
   return data;
 }
 
+interface PreviewOptions {
+  offset?: number,
+  limit?: number,
+  columns?: string[],
+  sort?: { column: string, ascending?: boolean }[]
+}
+
+/**
+ * A page of rows of the output of an executed node, as an Arrow IPC stream.
+ * The total number of rows is also in the schema metadata of the stream.
+ */
+async function preview(kernel_id: string, graphController: GraphController, sourceNode: string, options: PreviewOptions = {}) {
+  const { data, status, headers } = await client.post(`/tunnel/${kernel_id}/execute/${sourceNode}/preview`, {
+    graph: graphController.export(),
+    ...options
+  }, { responseType: "arraybuffer" })
+  if (status !== 200) {
+    throw new Error(`Server returned with status code ${status}`);
+  }
+  return { data: data as ArrayBuffer, totalRows: Number(headers["x-total-rows"]) };
+}
+
 const projectService = {
   connectKernel,
   disconnectKernel,
-  execute
+  execute,
+  preview
 }
 
 export { projectService }
\ No newline at end of file
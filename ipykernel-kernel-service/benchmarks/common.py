@@ -0,0 +1,140 @@
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+import psutil
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SLAVE_APP_DIR = os.path.join(BENCHMARKS_DIR, "..", "slave", "app")
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+
+def use_slave_modules():
+    """the slave app uses flat imports, make them resolvable from here"""
+    path = os.path.abspath(SLAVE_APP_DIR)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def parse_size(size: str) -> int:
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMG]?B?)\s*", size.upper())
+    if match is None:
+        raise ValueError(f"invalid size {size}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def format_size(size: int) -> str:
+    for unit in ("GB", "MB", "KB"):
+        if size >= SIZE_UNITS[unit]:
+            return f"{size / SIZE_UNITS[unit]:g}{unit}"
+    return f"{size}B"
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """nearest-rank percentile, None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(values: List[float]) -> dict:
+    return {
+        "count": len(values),
+        "min": min(values) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+        "mean": sum(values) / len(values) if values else None
+    }
+
+
+class Timer:
+    def __init__(self):
+        self.elapsed_ms = 0.0
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.elapsed_ms = (time.perf_counter() - self._started) * 1000
+
+
+class MemorySampler:
+    """Samples the resident memory of a process and its children in the background, keeps the peak"""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self._process = psutil.Process(pid)
+        self._interval = interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.baseline = self.rss()
+        self.peak = self.baseline
+
+    def rss(self) -> int:
+        try:
+            processes = [self._process] + self._process.children(recursive=True)
+            return sum(process.memory_info().rss for process in processes)
+        except psutil.NoSuchProcess:
+            return 0
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="memory-sampler")
+        self._thread.start()
+        return self
+
+    def stop(self) -> dict:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.peak = max(self.peak, self.rss())
+        return {"baseline_bytes": self.baseline, "peak_bytes": self.peak, "growth_bytes": self.peak - self.baseline}
+
+    def _run(self):
+        while not self._stop_event.wait(self._interval):
+            self.peak = max(self.peak, self.rss())
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def write_results(suite: str, arguments: dict, scenarios: List[dict], output: Optional[str] = None) -> str:
+    """store the results of a run as json, named after the suite and the time it ran"""
+    started_at = datetime.utcnow()
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{suite}-{started_at.strftime('%Y%m%dT%H%M%S')}.json")
+    with open(output, "w") as fp:
+        json.dump({
+            "suite": suite,
+            "created_at": started_at.isoformat(),
+            "revision": git_revision(),
+            "machine": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "memory_bytes": psutil.virtual_memory().total
+            },
+            "arguments": arguments,
+            "scenarios": scenarios
+        }, fp, indent=2)
+    return output
@@ -0,0 +1,59 @@
+"""
+Compare two benchmark result files scenario by scenario.
+
+    python -m benchmarks.compare benchmarks/results/before.json benchmarks/results/after.json
+"""
+import argparse
+import json
+from typing import Iterator, Tuple
+
+# lower is better for every metric except throughput
+HIGHER_IS_BETTER = ("throughput",)
+
+
+def flatten(value, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    """numeric leaves of a scenario as dotted paths, the raw runs are left out"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key not in ("runs", "datasets", "arguments"):
+                yield from flatten(item, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, value
+
+
+def compare(before: dict, after: dict, threshold: float):
+    if before["suite"] != after["suite"]:
+        print(f"warning: comparing {before['suite']} with {after['suite']}")
+    print(f"{before.get('revision')} -> {after.get('revision')}")
+    scenarios = {scenario["name"]: scenario for scenario in before["scenarios"]}
+    for scenario in after["scenarios"]:
+        baseline = scenarios.get(scenario["name"])
+        if baseline is None:
+            print(f"\n{scenario['name']}: new scenario")
+            continue
+        print(f"\n{scenario['name']}")
+        baseline_metrics = dict(flatten(baseline))
+        for metric, value in flatten(scenario):
+            old = baseline_metrics.get(metric)
+            if old is None or old == 0:
+                continue
+            change = (value - old) / old * 100
+            if abs(change) < threshold:
+                continue
+            better = (change > 0) == metric.startswith(HIGHER_IS_BETTER)
+            print(f"  {metric:<40} {old:>14.3f} -> {value:>14.3f}  {change:+7.1f}% "
+                  f"{'better' if better else 'worse'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=5.0, help="hide changes smaller than this percentage")
+    args = parser.parse_args()
+    with open(args.before) as before, open(args.after) as after:
+        compare(json.load(before), json.load(after), args.threshold)
+
+
+if __name__ == "__main__":
+    main()
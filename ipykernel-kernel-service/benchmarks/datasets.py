@@ -0,0 +1,109 @@
+import os
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import format_size
+
+# rows are generated and written in chunks, so that GB sized files don't need GBs of memory
+CHUNK_ROWS = 200_000
+CATEGORIES = np.array(["alpha", "beta", "gamma", "delta", "epsilon"])
+WORDS = np.array(["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit"])
+# the type of the feature columns, "mixed" cycles through all of them
+DTYPES = ("float", "int", "string", "datetime", "mixed")
+
+
+def generate_feature(dtype: str, rows: int, rng: np.random.Generator) -> np.ndarray:
+    if dtype == "float":
+        return rng.normal(size=rows)
+    if dtype == "int":
+        return rng.integers(-1000, 1000, size=rows)
+    if dtype == "string":
+        return np.char.add(WORDS[rng.integers(0, len(WORDS), size=rows)], rng.integers(0, 100, size=rows).astype(str))
+    if dtype == "datetime":
+        return np.datetime64("2020-01-01") + rng.integers(0, 365 * 24 * 3600, size=rows).astype("timedelta64[s]")
+    raise ValueError(f"unknown dtype {dtype}")
+
+
+def generate_frame(start: int, rows: int, features: int, prefix: str, rng: np.random.Generator,
+                   dtype: str = "float") -> pd.DataFrame:
+    """
+    Rows with a unique integer `id` to join on, features of the given dtype, a string category
+    and a `target` which depends linearly on the first feature, so regressions have something to fit
+    """
+    data = {"id": np.arange(start, start + rows, dtype=np.int64)}
+    dtypes = ("float", "int", "string", "datetime") if dtype == "mixed" else (dtype,)
+    for i in range(features):
+        # the first feature stays numeric for the target
+        data[f"{prefix}x{i}"] = rng.normal(size=rows) if i == 0 else generate_feature(dtypes[i % len(dtypes)], rows, rng)
+    data[f"{prefix}cat"] = CATEGORIES[rng.integers(0, len(CATEGORIES), size=rows)]
+    data[f"{prefix}target"] = 3 * data[f"{prefix}x0"] + rng.normal(scale=0.5, size=rows)
+    return pd.DataFrame(data)
+
+
+def columns(features: int, prefix: str = "") -> List[str]:
+    return ["id"] + [f"{prefix}x{i}" for i in range(features)] + [f"{prefix}cat", f"{prefix}target"]
+
+
+def estimate_row_size(features: int, prefix: str, kind: str, layout: str, dtype: str = "float") -> float:
+    sample = generate_frame(0, 1000, features, prefix, np.random.default_rng(0), dtype)
+    if kind == "csv":
+        return len(sample.to_csv(index=False)) / len(sample)
+    return len(sample.to_json(orient="records", lines=layout == "lines")) / len(sample)
+
+
+def dataset_name(size: int, kind: str, features: int, prefix: str = "", layout: str = "lines",
+                 dtype: str = "float") -> str:
+    layout_suffix = f"-{layout}" if kind == "json" else ""
+    prefix_suffix = f"-{prefix.rstrip('_')}" if prefix else ""
+    dtype_suffix = f"-{dtype}" if dtype != "float" else ""
+    return f"synthetic-{format_size(size)}-{features}f{dtype_suffix}{prefix_suffix}{layout_suffix}.{kind}"
+
+
+def generate_dataset(directory: str, size: int, kind: str = "csv", features: int = 4, prefix: str = "",
+                     layout: str = "lines", dtype: str = "float", seed: int = 0) -> dict:
+    """
+    Write a synthetic dataset of roughly `size` bytes into the directory, reusing an existing
+    one with the same parameters. `layout` is either json `lines` or a json array of `records`.
+    """
+    if kind not in ("csv", "json"):
+        raise ValueError(f"unknown dataset kind {kind}")
+    filename = dataset_name(size, kind, features, prefix, layout, dtype)
+    path = os.path.join(directory, filename)
+    rows = max(1, int(size / estimate_row_size(features, prefix, kind, layout, dtype)))
+
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        rng = np.random.default_rng(seed)
+        partial_path = path + ".partial"
+        with open(partial_path, "w") as fp:
+            if kind == "json" and layout == "records":
+                fp.write("[")
+            for start in range(0, rows, CHUNK_ROWS):
+                chunk = generate_frame(start, min(CHUNK_ROWS, rows - start), features, prefix, rng, dtype)
+                if kind == "csv":
+                    chunk.to_csv(fp, index=False, header=start == 0)
+                elif layout == "lines":
+                    fp.write(chunk.to_json(orient="records", lines=True))
+                    fp.write("\n")
+                else:
+                    if start > 0:
+                        fp.write(",")
+                    fp.write(chunk.to_json(orient="records")[1:-1])
+            if kind == "json" and layout == "records":
+                fp.write("]")
+        os.replace(partial_path, path)
+
+    return {
+        "file": filename,
+        "path": path,
+        "kind": kind,
+        "layout": layout if kind == "json" else None,
+        "rows": rows,
+        "features": features,
+        "dtype": dtype,
+        "columns": columns(features, prefix),
+        "size": size,
+        "bytes": os.path.getsize(path)
+    }
@@ -0,0 +1,153 @@
+import random
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+import docker.errors
+
+
+class Latency:
+    """A delay of `mean` seconds, spread uniformly by `jitter` in both directions"""
+
+    def __init__(self, mean: float = 0.0, jitter: float = 0.0):
+        self.mean = mean
+        self.jitter = jitter
+
+    @classmethod
+    def parse(cls, value: str) -> "Latency":
+        """"0.5" or "0.5~0.1", in seconds"""
+        mean, _, jitter = value.partition("~")
+        return cls(float(mean), float(jitter or 0))
+
+    def wait(self):
+        delay = self.mean + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class FakeContainer:
+    def __init__(self, client: "FakeDockerClient", labels: Dict[str, str]):
+        self.client = client
+        self.id = uuid.uuid4().hex
+        self.labels = labels
+        self.status = "running"
+        self.attrs = {
+            "NetworkSettings": {
+                "Gateway": "127.0.0.1",
+                "Ports": {"5000/tcp": [{"HostIp": "0.0.0.0", "HostPort": str(client.next_port())}]}
+            }
+        }
+
+    def reload(self):
+        pass
+
+    def remove(self, force: bool = False):
+        self.client.latencies["remove"].wait()
+        self.client.containers.forget(self.id)
+
+    def stop(self):
+        self.client.latencies["stop"].wait()
+        self.status = "exited"
+
+    def start(self):
+        self.client.latencies["start"].wait()
+        self.status = "running"
+
+
+class FakeContainers:
+    def __init__(self, client: "FakeDockerClient"):
+        self._client = client
+        self._containers: Dict[str, FakeContainer] = {}
+        self._lock = threading.Lock()
+
+    def run(self, image: str, **config) -> FakeContainer:
+        self._client.latencies["run"].wait()
+        if random.random() < self._client.failure_rate:
+            raise docker.errors.APIError("injected failure of containers.run")
+        container = FakeContainer(self._client, config.get("labels", {}))
+        with self._lock:
+            self._containers[container.id] = container
+        return container
+
+    def get(self, container_id: str) -> FakeContainer:
+        self._client.latencies["get"].wait()
+        with self._lock:
+            container = self._containers.get(container_id)
+        if container is None:
+            raise docker.errors.NotFound(f"no such container {container_id}")
+        return container
+
+    def list(self, **kwargs):
+        with self._lock:
+            return list(self._containers.values())
+
+    def forget(self, container_id: str):
+        with self._lock:
+            self._containers.pop(container_id, None)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._containers)
+
+
+class FakeVolume:
+    def __init__(self, client: "FakeDockerClient", name: str):
+        self._client = client
+        self.name = name
+
+    def remove(self, force: bool = False):
+        self._client.latencies["remove"].wait()
+
+
+class FakeVolumes:
+    def __init__(self, client: "FakeDockerClient"):
+        self._client = client
+
+    def get(self, name: str) -> FakeVolume:
+        return FakeVolume(self._client, name)
+
+
+class FakeDockerClient:
+    """
+    Stands in for docker.DockerClient in the parts the master uses, every call waits for the
+    latency configured for it, `containers.run` fails with the given probability. With a
+    slave_port every container publishes that port, a fake slave can answer for all of them.
+    """
+
+    OPERATIONS = ("run", "get", "remove", "stop", "start", "info")
+
+    def __init__(self, latencies: Optional[Dict[str, Latency]] = None, failure_rate: float = 0.0,
+                 cpus: int = 1024, memory: int = 4096 * 1024 ** 3, slave_port: Optional[int] = None):
+        self.latencies = {operation: Latency() for operation in self.OPERATIONS}
+        self.latencies.update(latencies or {})
+        self.failure_rate = failure_rate
+        self.containers = FakeContainers(self)
+        self.volumes = FakeVolumes(self)
+        self._info = {"NCPU": cpus, "MemTotal": memory}
+        self._port = 20000
+        self._port_lock = threading.Lock()
+        self._slave_port = slave_port
+
+    def next_port(self) -> int:
+        if self._slave_port is not None:
+            return self._slave_port
+        with self._port_lock:
+            self._port += 1
+            return self._port
+
+    def info(self) -> dict:
+        self.latencies["info"].wait()
+        return self._info
+
+    def version(self) -> dict:
+        return {"Version": "fake"}
+
+    def ping(self) -> bool:
+        return True
+
+    def events(self, **kwargs):
+        return iter(())
+
+    def close(self):
+        pass
@@ -0,0 +1,85 @@
+from typing import List
+
+
+class GraphBuilder:
+    """Builds graphs in the shape the frontend sends to the slave"""
+
+    def __init__(self):
+        self.nodes: List[dict] = []
+        self.edges: List[dict] = []
+
+    def add(self, type: str, data: dict, *sources: str) -> str:
+        node_id = f"{type}-{len(self.nodes)}"
+        self.nodes.append({"id": node_id, "type": type, "data": data})
+        for source in sources:
+            self.edges.append({"id": f"{source}->{node_id}", "source": source, "target": node_id})
+        return node_id
+
+    def data_source(self, file: str) -> str:
+        return self.add("dataSource", {"file": file})
+
+    def rename(self, source: str, from_column: str, to_column: str) -> str:
+        return self.add("rename", {"from": from_column, "to": to_column}, source)
+
+    def filter(self, source: str, key: str, operation: str, value) -> str:
+        return self.add("filter", {"key": key, "operation": operation, "value": value}, source)
+
+    def join(self, key: str, *sources: str) -> str:
+        return self.add("join", {"key": key}, *sources)
+
+    def linear_regression(self, source: str, x: List[str], y: str, test_size: int = 20) -> str:
+        return self.add("linearRegression", {"x": x, "y": y, "hyp/testSize": test_size}, source)
+
+    def regression_sweep(self, source: str, x: List[str], y: str, test_sizes: List[int], alphas: List[float],
+                         feature_subsets: bool = True) -> str:
+        return self.add("regressionSweep", {"x": x, "y": y, "sweep/testSizes": test_sizes, "sweep/alphas": alphas,
+                                            "sweep/featureSubsets": feature_subsets}, source)
+
+    def build(self, sink: str) -> dict:
+        return {"nodes": self.nodes, "edges": self.edges, "sink": sink}
+
+
+def chain(dataset: dict, length: int, model: bool = False) -> dict:
+    """a data source followed by `length` nodes, alternating between filters and renames"""
+    builder = GraphBuilder()
+    node = builder.data_source(dataset["file"])
+    category = "cat"
+    for i in range(length):
+        if i % 2 == 0:
+            # keeps every row, the cost is the scan and the copy
+            node = builder.filter(node, "id", "greater_than", -1)
+        else:
+            node = builder.rename(node, category, f"cat_{i}")
+            category = f"cat_{i}"
+    if model:
+        node = builder.linear_regression(node, ["x0"], "target")
+    return builder.build(node)
+
+
+def diamonds(dataset: dict, count: int) -> dict:
+    """`count` diamonds in a row, each splits into a filter and a rename and joins them again"""
+    builder = GraphBuilder()
+    node = builder.data_source(dataset["file"])
+    for i in range(count):
+        left = builder.filter(node, "id", "greater_than", -1)
+        right = builder.rename(node, "cat", f"cat_{i}")
+        node = builder.join("id", left, right)
+    return builder.build(node)
+
+
+def wide_join(datasets: List[dict]) -> dict:
+    """one data source per dataset, all joined on `id` by a single node"""
+    builder = GraphBuilder()
+    sources = [builder.data_source(dataset["file"]) for dataset in datasets]
+    return builder.build(builder.join("id", *sources))
+
+
+def sweep(dataset: dict, features: int) -> dict:
+    """a regression sweep over every subset of the features, 3 test sizes and 4 regularization strengths"""
+    builder = GraphBuilder()
+    node = builder.data_source(dataset["file"])
+    x = [f"x{i}" for i in range(features)]
+    return builder.build(builder.regression_sweep(node, x, "target", [10, 20, 30], [0, 0.1, 1, 10]))
+
+
+SHAPES = ("chain", "diamond", "wide", "sweep")
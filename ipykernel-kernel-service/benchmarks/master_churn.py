@@ -0,0 +1,276 @@
+"""
+Load test of kernel allocate/register/delete churn in the master. The master app is served
+in-process by uvicorn with a fake docker client of configurable latency, and mongomock
+(or a real mongo with --mongo-uri) as its database.
+
+    python -m benchmarks.master_churn --users 32 --iterations 20 --docker-run 0.8~0.2
+"""
+import argparse
+import http.server
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import requests
+
+from benchmarks.common import Timer, MemorySampler, format_size, summarize, write_results
+from benchmarks.fake_docker import FakeDockerClient, Latency
+
+OPERATIONS = ("allocate", "register", "started", "delete")
+
+
+class Recorder:
+    """latencies and failures per operation, shared by all virtual users"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {operation: [] for operation in OPERATIONS}
+        self.errors: Dict[str, int] = {operation: 0 for operation in OPERATIONS}
+        self.error_samples: List[str] = []
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, elapsed_ms: float, ok: bool, error: str = None):
+        with self._lock:
+            if ok:
+                self.latencies[operation].append(elapsed_ms)
+            else:
+                self.errors[operation] += 1
+                if error is not None and len(self.error_samples) < 20:
+                    self.error_samples.append(f"{operation}: {error}")
+
+
+class CallbackSink:
+    """Receives the kernel webhooks the master sends to projects"""
+
+    def __init__(self):
+        self.received: Dict[str, tuple] = {}
+        self._events: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        sink = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_PUT(self):
+                event = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if event["type"] in ("started", "error"):
+                    sink.notify(event["kernel_id"], event["type"])
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._httpd.serve_forever, daemon=True, name="callback-sink").start()
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}/webhook"
+
+    def _event(self, kernel_id: str) -> threading.Event:
+        with self._lock:
+            return self._events.setdefault(kernel_id, threading.Event())
+
+    def notify(self, kernel_id: str, type: str):
+        self.received[kernel_id] = (time.perf_counter(), type)
+        self._event(kernel_id).set()
+
+    def wait(self, kernel_id: str, timeout: float) -> tuple:
+        """time and type of the callback of the kernel, raises if none arrived"""
+        if not self._event(kernel_id).wait(timeout):
+            raise TimeoutError(f"no callback for kernel {kernel_id}")
+        with self._lock:
+            self._events.pop(kernel_id, None)
+        return self.received.pop(kernel_id)
+
+
+class FakeSlave:
+    """Answers the slave endpoints the master calls, for every fake container at once"""
+
+    def __init__(self, latency: Latency):
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.reply({"server": "ok"})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                # the kernel process starts, the virtual user registers it in its place
+                latency.wait()
+                self.reply({"kernel_id": body["kernel_id"]})
+
+            def do_DELETE(self):
+                self.reply({"status": "deleted"})
+
+            def reply(self, body: dict):
+                content = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._httpd.serve_forever, daemon=True, name="fake-slave").start()
+        self.port = self._httpd.server_address[1]
+
+
+def start_master(args) -> tuple:
+    """import the master with its docker hosts replaced by fakes and its database by the stand-in"""
+    os.environ["KERNEL_POOL_SIZE"] = str(args.pool_size)
+    os.environ["KERNEL_LAUNCH_CONCURRENCY"] = str(args.launch_concurrency)
+    os.environ["KERNELS_PER_CONTAINER"] = str(args.kernels_per_container)
+    os.environ.setdefault("SLAVE_CALLBACK_URL", "http://127.0.0.1")
+
+    latencies = {operation: Latency.parse(getattr(args, f"docker_{operation}"))
+                 for operation in FakeDockerClient.OPERATIONS}
+    slave = FakeSlave(Latency.parse(args.kernel_start))
+    fake_docker = FakeDockerClient(latencies, failure_rate=args.failure_rate, slave_port=slave.port)
+
+    from master.docker_hosts import DockerHost
+    DockerHost.connect = lambda self, **kwargs: fake_docker
+
+    from master import app as master_app
+    from master import context
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        context.client = MongoClient(args.mongo_uri)
+    else:
+        import mongomock
+        context.client = mongomock.MongoClient()
+    context.database = context.client[args.database]
+    context.database["kernels"].drop()
+    master_app.kernel_repository.create_indexes()
+    # the docker event handler and the idle monitor are left out, they would only react to the churn
+    master_app.kernel_pool.start()
+
+    import uvicorn
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(master_app.app, host="127.0.0.1", port=port, lifespan="off",
+                                           log_level="warning"))
+    threading.Thread(target=server.run, daemon=True, name="master-server").start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", fake_docker, master_app
+
+
+def churn(user: int, args, base_url: str, sink: CallbackSink, recorder: Recorder):
+    """one project connecting and disconnecting over and over"""
+    session = requests.Session()
+    token = f"user-{user}"
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        try:
+            response = session.post(f"{base_url}/kernels", params={"callback": sink.url, "token": token},
+                                    timeout=args.timeout)
+        except requests.RequestException as e:
+            recorder.record("allocate", 0, False, str(e))
+            continue
+        recorder.record("allocate", (time.perf_counter() - started) * 1000, response.status_code == 200,
+                        f"status {response.status_code}")
+        if response.status_code != 200:
+            continue
+        kernel = response.json()
+
+        if kernel["status"] != "running":
+            # the container boots, then the slave registers, retrying while the launch isn't recorded
+            Latency.parse(args.boot).wait()
+            with Timer() as timer:
+                status_code = None
+                deadline = time.monotonic() + args.timeout
+                while time.monotonic() < deadline:
+                    try:
+                        status_code = session.post(
+                            f"{base_url}/internal/register/{kernel['id']}", timeout=args.timeout,
+                            json={"callback": sink.url, "token": token, "version": "benchmark",
+                                  "startup_time": Latency.parse(args.boot).mean}
+                        ).status_code
+                    except requests.RequestException as e:
+                        status_code = str(e)
+                        break
+                    if status_code != 409:
+                        break
+                    time.sleep(0.05)
+            recorder.record("register", timer.elapsed_ms, status_code == 200, f"status {status_code}")
+
+        try:
+            callback_at, callback_type = sink.wait(kernel["id"], args.timeout)
+            recorder.record("started", (callback_at - started) * 1000, callback_type == "started",
+                            f"{callback_type} callback")
+        except TimeoutError as e:
+            recorder.record("started", 0, False, str(e))
+
+        with Timer() as timer:
+            try:
+                status_code = session.delete(f"{base_url}/kernels/{kernel['id']}", timeout=args.timeout).status_code
+            except requests.RequestException as e:
+                status_code = str(e)
+        recorder.record("delete", timer.elapsed_ms, status_code == 200, f"status {status_code}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=16, help="projects connecting and disconnecting concurrently")
+    parser.add_argument("--iterations", type=int, default=10, help="connect/disconnect cycles per user")
+    parser.add_argument("--boot", default="0.5~0.1", help="seconds from container start until the slave registers")
+    parser.add_argument("--kernel-start", default="0.2~0.05", help="seconds the slave takes to start a kernel")
+    parser.add_argument("--kernels-per-container", type=int, default=1)
+    parser.add_argument("--pool-size", type=int, default=0)
+    parser.add_argument("--launch-concurrency", type=int, default=4)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of containers.run calls failing")
+    for operation, default in (("run", "0.5~0.1"), ("get", "0.005"), ("remove", "0.2~0.05"), ("stop", "0.2"),
+                               ("start", "0.3"), ("info", "0.01")):
+        parser.add_argument(f"--docker-{operation}", default=default,
+                            help=f"latency of docker {operation} in seconds, mean~jitter")
+    parser.add_argument("--mongo-uri", default=None, help="use a real mongo instead of mongomock")
+    parser.add_argument("--database", default="master-churn-benchmark")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", default=None, help="results file, defaults to benchmarks/results")
+    args = parser.parse_args()
+
+    base_url, fake_docker, master_app = start_master(args)
+    sink = CallbackSink()
+    recorder = Recorder()
+    sampler = MemorySampler(os.getpid()).start()
+    with Timer() as wall:
+        with ThreadPoolExecutor(max_workers=args.users) as executor:
+            for future in [executor.submit(churn, user, args, base_url, sink, recorder) for user in range(args.users)]:
+                future.result()
+    memory = sampler.stop()
+    master_app.kernel_pool.stop()
+
+    seconds = wall.elapsed_ms / 1000
+    attempts = {operation: len(recorder.latencies[operation]) + recorder.errors[operation] for operation in OPERATIONS}
+    scenario = {
+        "name": f"churn-u{args.users}-p{args.pool_size}-l{args.launch_concurrency}-k{args.kernels_per_container}",
+        "latency_ms": {operation: summarize(recorder.latencies[operation]) for operation in OPERATIONS},
+        "throughput": {
+            "allocations_per_s": len(recorder.latencies["started"]) / seconds,
+            "requests_per_s": sum(len(recorder.latencies[operation]) for operation in
+                                  ("allocate", "register", "delete")) / seconds
+        },
+        "errors": recorder.errors,
+        "error_rate": {operation: recorder.errors[operation] / attempts[operation] if attempts[operation] else 0.0
+                       for operation in OPERATIONS},
+        "error_samples": recorder.error_samples,
+        "leftover_containers": fake_docker.containers.count(),
+        "memory": memory,
+        "wall_s": seconds
+    }
+
+    for operation in OPERATIONS:
+        latency = scenario["latency_ms"][operation]
+        if latency["count"]:
+            print(f"{operation:<9} p50 {latency['p50']:8.1f}ms  p95 {latency['p95']:8.1f}ms  "
+                  f"p99 {latency['p99']:8.1f}ms  errors {scenario['error_rate'][operation]:.1%}")
+    print(f"{scenario['throughput']['allocations_per_s']:.2f} allocations/s, "
+          f"{scenario['leftover_containers']} container(s) left behind, peak memory {format_size(memory['peak_bytes'])}")
+    print(f"results written to {write_results('master-churn', vars(args), [scenario], args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+End-to-end benchmark of graph execution in the slave. Synthetic graphs run through
+`server.execute` against a real local ipykernel.
+
+    python -m benchmarks.slave_execute --sizes 1MB,100MB --shapes chain,diamond,wide
+"""
+import argparse
+import os
+import statistics
+import time
+from typing import List
+
+from jupyter_client.manager import start_new_kernel
+
+from benchmarks import graphs
+from benchmarks.common import Timer, MemorySampler, format_size, parse_size, summarize, use_slave_modules, \
+    write_results
+from benchmarks.datasets import generate_dataset
+
+use_slave_modules()
+
+import kernel  # noqa: E402
+import server  # noqa: E402
+from kernels import Kernel  # noqa: E402
+from code_generator import CodeGenerator  # noqa: E402
+from graph_processor import NodeScheduler  # noqa: E402
+
+PREPROCESSING_PATH = os.path.join(os.path.dirname(os.path.abspath(kernel.__file__)), "preprocessing.py")
+
+
+class TimedKernelClient:
+    """Wraps the kernel client used by the server and records how long every cell took"""
+
+    def __init__(self, client):
+        self._client = client
+        self.cells: List[dict] = []
+
+    def execute_interactive(self, code, **kwargs):
+        started = time.perf_counter()
+        reply = self._client.execute_interactive(code, **kwargs)
+        self.cells.append({
+            "msg_id": reply["parent_header"]["msg_id"],
+            "status": reply["content"]["status"],
+            "latency_ms": (time.perf_counter() - started) * 1000
+        })
+        return reply
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class LocalKernel:
+    """An ipykernel set up like the one in the slave container, working in the dataset directory"""
+
+    def __init__(self, cwd: str):
+        self.manager, self.client = start_new_kernel(kernel_name="python3", cwd=cwd)
+        self.client.execute_interactive(kernel.preprocessing_import.replace("/slave/app/preprocessing.py",
+                                                                            PREPROCESSING_PATH), silent=True)
+
+    @property
+    def pid(self) -> int:
+        return self.manager.provisioner.process.pid
+
+    def shutdown(self):
+        self.client.stop_channels()
+        self.manager.shutdown_kernel(now=True)
+
+
+def time_planning(graph: dict, repeat: int) -> dict:
+    """median time to build the schedule and to generate the code of every node, in-process"""
+    planning, codegen = [], []
+    for _ in range(repeat):
+        with Timer() as timer:
+            scheduler = NodeScheduler(graph["nodes"], graph["edges"], graph["sink"])
+            order = scheduler.get_execution_order()
+        planning.append(timer.elapsed_ms)
+        generator = CodeGenerator(scheduler)
+        with Timer() as timer:
+            code = [generator.generate_code(graph["nodes"][idx]) for idx in order]
+        codegen.append(timer.elapsed_ms)
+    return {
+        "planning_ms": statistics.median(planning),
+        "codegen_ms": statistics.median(codegen),
+        "order": [graph["nodes"][idx]["id"] for idx in order],
+        "code_bytes": sum(len(cell) for cell in code)
+    }
+
+
+def run_scenario(name: str, graph: dict, datasets: List[dict], data_dir: str, repeat: int) -> dict:
+    print(f"running {name}")
+    try:
+        plan = time_planning(graph, max(repeat, 5))
+    except Exception as e:
+        # the graph can't even be scheduled or turned into code
+        print(f"  failed to plan ({type(e).__name__}: {e})")
+        return {"name": name, "completed": False, "error": f"planning: {type(e).__name__}: {e}"}
+    node_types = {node["id"]: node["type"] for node in graph["nodes"]}
+    input_bytes = sum(dataset["bytes"] for dataset in datasets)
+    input_rows = sum(dataset["rows"] for dataset in datasets)
+
+    local_kernel = LocalKernel(data_dir)
+    timed_client = TimedKernelClient(local_kernel.client)
+    # the server runs cells through the client of the kernel it is handed
+    slave_kernel = Kernel("benchmark", root=data_dir)
+    slave_kernel.client = timed_client
+    sampler = MemorySampler(local_kernel.pid).start()
+    runs = []
+    try:
+        for _ in range(repeat):
+            timed_client.cells.clear()
+            error = None
+            with Timer() as timer:
+                try:
+                    results = server.execute(graph["sink"], server.Graph(nodes=graph["nodes"], edges=graph["edges"]),
+                                             slave_kernel)
+                except Exception as e:
+                    # e.g. a cell running into the execution timeout of the server
+                    results, error = {}, f"{type(e).__name__}: {e}"
+            nodes = [{
+                "node_id": node_id,
+                "type": node_types[node_id],
+                "latency_ms": cell["latency_ms"],
+                "status": cell["status"],
+                "error": results.get(node_id, {}).get("error", {}).get("evalue")
+            } for node_id, cell in zip(plan["order"], timed_client.cells)]
+            failed = [node for node in nodes if node["status"] != "ok"]
+            if error is None and failed:
+                error = f"{failed[0]['node_id']}: {failed[0]['error']}"
+            runs.append({
+                "total_ms": timer.elapsed_ms,
+                "nodes": nodes,
+                "completed": error is None and len(nodes) == len(plan["order"]),
+                "error": error
+            })
+    finally:
+        memory = sampler.stop()
+        local_kernel.shutdown()
+
+    totals = [run["total_ms"] for run in runs]
+    median_s = statistics.median(totals) / 1000
+    scenario = {
+        "name": name,
+        "graph": {"nodes": len(graph["nodes"]), "edges": len(graph["edges"])},
+        "datasets": [{key: dataset[key] for key in ("file", "kind", "layout", "rows", "bytes")}
+                     for dataset in datasets],
+        "planning_ms": plan["planning_ms"],
+        "codegen_ms": plan["codegen_ms"],
+        "code_bytes": plan["code_bytes"],
+        "total_ms": summarize(totals),
+        "node_latency_ms": {
+            node_type: summarize([node["latency_ms"] for run in runs for node in run["nodes"]
+                                  if node["type"] == node_type])
+            for node_type in sorted(set(node_types.values()))
+        },
+        "throughput": {
+            "nodes_per_s": len(plan["order"]) / median_s if median_s > 0 else None,
+            "rows_per_s": input_rows / median_s if median_s > 0 else None,
+            "bytes_per_s": input_bytes / median_s if median_s > 0 else None
+        },
+        "memory": memory,
+        "completed": all(run["completed"] for run in runs),
+        "runs": runs
+    }
+    status = "ok" if scenario["completed"] else f"failed ({runs[-1]['error']})"
+    print(f"  {status}, median {statistics.median(totals):.1f}ms, "
+          f"peak kernel memory {format_size(memory['peak_bytes'])}")
+    return scenario
+
+
+def build_scenarios(args) -> List[tuple]:
+    scenarios = []
+    for size in [parse_size(size) for size in args.sizes.split(",")]:
+        for kind in args.kinds.split(","):
+            dataset = generate_dataset(args.data_dir, size, kind, args.features, layout=args.json_layout)
+            label = f"{format_size(size)}-{kind}"
+            for shape in args.shapes.split(","):
+                if shape == "chain":
+                    graph = graphs.chain(dataset, args.depth, model=args.model)
+                    scenarios.append((f"chain{args.depth}-{label}", graph, [dataset]))
+                elif shape == "diamond":
+                    graph = graphs.diamonds(dataset, args.depth)
+                    scenarios.append((f"diamond{args.depth}-{label}", graph, [dataset]))
+                elif shape == "wide":
+                    datasets = [dataset] + [
+                        generate_dataset(args.data_dir, size, kind, args.features, prefix=f"s{i}_",
+                                         layout=args.json_layout)
+                        for i in range(1, args.width)
+                    ]
+                    scenarios.append((f"wide{args.width}-{label}", graphs.wide_join(datasets), datasets))
+                elif shape == "sweep":
+                    graph = graphs.sweep(dataset, args.features)
+                    scenarios.append((f"sweep{args.features}-{label}", graph, [dataset]))
+                else:
+                    raise ValueError(f"unknown shape {shape}, expected one of {graphs.SHAPES}")
+    return scenarios
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1MB,10MB", help="comma separated dataset sizes, e.g. 1MB,1GB")
+    parser.add_argument("--kinds", default="csv", help="comma separated dataset formats, csv and/or json")
+    parser.add_argument("--json-layout", default="lines", choices=("lines", "records"))
+    parser.add_argument("--features", type=int, default=4, help="float columns per dataset")
+    parser.add_argument("--shapes", default=",".join(graphs.SHAPES))
+    parser.add_argument("--depth", type=int, default=8, help="nodes of a chain, diamonds in a row")
+    parser.add_argument("--width", type=int, default=4, help="data sources of a wide join")
+    parser.add_argument("--model", action="store_true", help="end chains with a linear regression")
+    parser.add_argument("--repeat", type=int, default=3, help="executions of each graph")
+    parser.add_argument("--data-dir", default=os.path.join(os.path.dirname(__file__), "data"))
+    parser.add_argument("--output", default=None, help="results file, defaults to benchmarks/results")
+    args = parser.parse_args()
+
+    scenarios = [run_scenario(name, graph, datasets, args.data_dir, args.repeat)
+                 for name, graph, datasets in build_scenarios(args)]
+    print(f"results written to {write_results('slave-execute', vars(args), scenarios, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+Benchmark of the slave's dataset ingest path: `POST /fs`, `POST /fs/url` and `GET /fs`.
+The slave app is served by uvicorn in-process, without starting a kernel.
+
+    python -m benchmarks.slave_ingest --sizes 1MB,50MB --kinds csv,json --concurrency 1,4
+"""
+import argparse
+import contextvars
+import functools
+import http.server
+import os
+import shutil
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import requests
+import uvicorn
+
+from benchmarks.common import Timer, MemorySampler, format_size, parse_size, summarize, use_slave_modules, \
+    write_results
+from benchmarks.datasets import DTYPES, generate_dataset
+
+use_slave_modules()
+
+import server  # noqa: E402
+from kernels import Kernel  # noqa: E402
+
+KERNEL_ID = "benchmark"
+
+# timings of the request being handled, filled by the wrappers below
+phases: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("phases", default=None)
+records: List[dict] = []
+records_lock = threading.Lock()
+
+
+def record_phase(name: str, elapsed_ms: float):
+    current = phases.get()
+    if current is not None:
+        current[name] = current.get(name, 0.0) + elapsed_ms
+
+
+def timed(name: str, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record_phase(name, (time.perf_counter() - started) * 1000)
+    return wrapper
+
+
+class TimedAsyncFile:
+    def __init__(self, context_manager):
+        self._context_manager = context_manager
+
+    async def __aenter__(self):
+        self._started = time.perf_counter()
+        self._file = await self._context_manager.__aenter__()
+        return self
+
+    async def __aexit__(self, *args):
+        result = await self._context_manager.__aexit__(*args)
+        record_phase("disk_write_ms", (time.perf_counter() - self._started) * 1000)
+        return result
+
+    async def write(self, data):
+        return await self._file.write(data)
+
+
+class TimedAiofiles:
+    """Stands in for the aiofiles module of the server, times the upload from open to close"""
+
+    def __init__(self, aiofiles):
+        self._aiofiles = aiofiles
+
+    def open(self, *args, **kwargs):
+        return TimedAsyncFile(self._aiofiles.open(*args, **kwargs))
+
+
+def instrument():
+    """
+    Time the phases of an upload. extract_schema includes the visualizations, the parse
+    time is derived by subtracting them.
+    """
+    server.extract_schema = timed("extract_schema_ms", server.extract_schema)
+    server.get_visualizations = timed("visualizations_ms", server.get_visualizations)
+    server.urlretrieve = timed("download_ms", server.urlretrieve)
+    server.aiofiles = TimedAiofiles(server.aiofiles)
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return await server.app(scope, receive, send)
+        current = {}
+        token = phases.set(current)
+        status_code = None
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await server.app(scope, receive, send_wrapper)
+        finally:
+            current["handler_ms"] = (time.perf_counter() - started) * 1000
+            current["status"] = status_code
+            current["path"] = scope["path"]
+            phases.reset(token)
+            with records_lock:
+                records.append(current)
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_slave(app) -> str:
+    port = free_port()
+    # the kernel isn't needed for the filesystem endpoints, skip the lifespan which starts it
+    uvicorn_server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, lifespan="off",
+                                                   log_level="warning"))
+    threading.Thread(target=uvicorn_server.run, daemon=True, name="slave-server").start()
+    while not uvicorn_server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def serve_datasets(directory: str) -> str:
+    """a local http server the slave downloads datasets from"""
+    handler = functools.partial(QuietHandler, directory=directory)
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True, name="dataset-server").start()
+    return f"http://127.0.0.1:{httpd.server_address[1]}"
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def reset_uploads(upload_dir: str):
+    kernel = server.kernel_registry.get(KERNEL_ID)
+    kernel.dataset_schema_database.clear()
+    kernel.dataset_viz_database.clear()
+    for name in os.listdir(upload_dir):
+        os.remove(os.path.join(upload_dir, name))
+
+
+def breakdown(request_records: List[dict]) -> dict:
+    def phase(name: str) -> List[float]:
+        return [record.get(name, 0.0) for record in request_records]
+
+    parse = [record.get("extract_schema_ms", 0.0) - record.get("visualizations_ms", 0.0) for record in request_records]
+    return {
+        "handler_ms": summarize(phase("handler_ms")),
+        "download_ms": summarize(phase("download_ms")),
+        "parse_ms": summarize(parse),
+        "visualizations_ms": summarize(phase("visualizations_ms")),
+        "disk_write_ms": summarize(phase("disk_write_ms"))
+    }
+
+
+def upload(base_url: str, dataset: dict, name: str) -> requests.Response:
+    with open(dataset["path"], "rb") as fp:
+        return requests.post(f"{base_url}/fs", files={"file": (name, fp)})
+
+
+def upload_from_url(base_url: str, dataset_url: str, name: str) -> requests.Response:
+    return requests.post(f"{base_url}/fs/url", json={"url": f"{dataset_url}/{name}"})
+
+
+def ingested(response: requests.Response) -> bool:
+    """an upload counts when the slave could read a schema from it, an empty one means parsing went wrong"""
+    return response.status_code == 200 and bool(response.json()["file"]["schema"])
+
+
+def run_uploads(label: str, send, dataset: dict, concurrency: int, repeat: int, upload_dir: str) -> dict:
+    """send `repeat` uploads of the dataset with `concurrency` of them in flight"""
+    reset_uploads(upload_dir)
+    with records_lock:
+        records.clear()
+    sampler = MemorySampler(os.getpid()).start()
+    latencies, failures = [], 0
+
+    def send_one(i: int):
+        with Timer() as timer:
+            response = send(f"{i}-{dataset['file']}")
+        return timer.elapsed_ms, ingested(response)
+
+    with Timer() as wall:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for elapsed_ms, ok in executor.map(send_one, range(repeat)):
+                latencies.append(elapsed_ms)
+                failures += not ok
+    memory = sampler.stop()
+
+    with records_lock:
+        request_records = list(records)
+    seconds = wall.elapsed_ms / 1000
+    result = {
+        "name": f"{label}-{format_size(dataset['size'])}-{dataset['kind']}"
+                f"{'-' + dataset['layout'] if dataset['layout'] else ''}-{dataset['features']}f-{dataset['dtype']}"
+                f"-c{concurrency}",
+        "dataset": {key: dataset[key] for key in ("file", "kind", "layout", "rows", "features", "dtype", "bytes")},
+        "concurrency": concurrency,
+        "latency_ms": summarize(latencies),
+        "breakdown": breakdown(request_records),
+        "throughput": {
+            "files_per_s": repeat / seconds,
+            "bytes_per_s": repeat * dataset["bytes"] / seconds
+        },
+        "errors": failures,
+        "error_rate": failures / repeat,
+        "completed": failures == 0,
+        "memory": memory
+    }
+    print(f"{result['name']}: p50 {result['latency_ms']['p50']:.1f}ms, "
+          f"{format_size(int(result['throughput']['bytes_per_s']))}/s, {failures} error(s), "
+          f"peak memory {format_size(memory['peak_bytes'])}")
+    return result
+
+
+def run_listing(base_url: str, upload_dir: str, files: int, dataset: dict, repeat: int) -> dict:
+    """list the working directory with `files` datasets in it"""
+    reset_uploads(upload_dir)
+    for i in range(files):
+        response = upload(base_url, dataset, f"{i}-{dataset['file']}")
+        response.raise_for_status()
+    latencies, sizes = [], []
+    for _ in range(repeat):
+        with Timer() as timer:
+            response = requests.get(f"{base_url}/fs")
+        latencies.append(timer.elapsed_ms)
+        sizes.append(len(response.content))
+    result = {
+        "name": f"list-{files}files",
+        "files": files,
+        "latency_ms": summarize(latencies),
+        "response_bytes": statistics.median(sizes)
+    }
+    print(f"{result['name']}: p50 {result['latency_ms']['p50']:.1f}ms, "
+          f"{format_size(int(result['response_bytes']))} response")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1MB,10MB", help="comma separated dataset sizes, at most 512MB")
+    parser.add_argument("--kinds", default="csv,json", help="comma separated dataset formats, csv and/or json")
+    parser.add_argument("--json-layouts", default="lines,records")
+    parser.add_argument("--features", default="4,32", help="comma separated feature column counts")
+    parser.add_argument("--dtypes", default="float,mixed", help=f"comma separated, any of {','.join(DTYPES)}")
+    parser.add_argument("--concurrency", default="1,4", help="comma separated numbers of uploads in flight")
+    parser.add_argument("--repeat", type=int, default=4, help="uploads per scenario")
+    parser.add_argument("--list-files", default="1,10", help="comma separated numbers of files for GET /fs")
+    parser.add_argument("--data-dir", default=os.path.join(os.path.dirname(__file__), "data"))
+    parser.add_argument("--output", default=None, help="results file, defaults to benchmarks/results")
+    args = parser.parse_args()
+
+    datasets = []
+    for size in [parse_size(size) for size in args.sizes.split(",")]:
+        for kind in args.kinds.split(","):
+            for layout in (args.json_layouts.split(",") if kind == "json" else ["lines"]):
+                for features in [int(features) for features in args.features.split(",")]:
+                    for dtype in args.dtypes.split(","):
+                        datasets.append(generate_dataset(args.data_dir, size, kind, features, layout=layout,
+                                                         dtype=dtype))
+
+    # the slave stores uploads in the working directory of the kernel, which needs no process for that
+    upload_root = tempfile.mkdtemp(prefix="slave-ingest-")
+    kernel = server.kernel_registry.add(Kernel(KERNEL_ID, root=upload_root))
+    upload_dir = kernel.working_dir
+    os.makedirs(upload_dir)
+    # downloads are served from a directory holding the renamed copies the server asks for
+    serve_dir = tempfile.mkdtemp(prefix="slave-ingest-source-")
+    os.chdir(upload_dir)
+    base_url = f"{serve_slave(instrument())}/kernels/{KERNEL_ID}"
+    dataset_url = serve_datasets(serve_dir)
+
+    scenarios = []
+    try:
+        for dataset in datasets:
+            for concurrency in [int(concurrency) for concurrency in args.concurrency.split(",")]:
+                scenarios.append(run_uploads("upload", functools.partial(upload, base_url, dataset), dataset,
+                                             concurrency, args.repeat, upload_dir))
+                for i in range(args.repeat):
+                    target = os.path.join(serve_dir, f"{i}-{dataset['file']}")
+                    if not os.path.exists(target):
+                        os.symlink(dataset["path"], target)
+                scenarios.append(run_uploads("url", functools.partial(upload_from_url, base_url, dataset_url),
+                                             dataset, concurrency, args.repeat, upload_dir))
+        for files in [int(files) for files in args.list_files.split(",")]:
+            scenarios.append(run_listing(base_url, upload_dir, files, datasets[0], args.repeat))
+    finally:
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        shutil.rmtree(upload_root, ignore_errors=True)
+        shutil.rmtree(serve_dir, ignore_errors=True)
+
+    print(f"results written to {write_results('slave-ingest', vars(args), scenarios, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
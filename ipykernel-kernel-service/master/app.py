@@ -1,59 +1,126 @@
 import multiprocessing
 import os
+import threading
 from datetime import datetime
 
 import docker
-import requests
 from dotenv import load_dotenv
-from fastapi import FastAPI, status, HTTPException
+from fastapi import FastAPI, status, HTTPException, Response
 from pydantic import BaseModel
+from docker.utils import parse_bytes
+from motor.motor_asyncio import AsyncIOMotorClient
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pymongo import MongoClient
 
 from master import context
 from master import docker_event_handler
+from master.docker_hosts import load_docker_hosts
+from master.controller.container_stats_collector import ContainerStatsCollector
+from master.controller.idle_monitor import IdleMonitor
 from master.controller.kernel_container_controller import KernelContainerController
 from master.controller.kernel_controller import KernelController
+from master.controller.kernel_launcher import KernelLauncher
+from master.controller.kernel_pool import KernelPool
+from master.controller.placement_scheduler import PlacementScheduler
 from master.logger import logger
-from master.models.kernel import KernelStatus
+from master.metrics import KERNEL_ALLOCATION_DURATION, KERNEL_EVENTS, register_kernel_status_collector, \
+    track_request_duration
+from master.models.kernel import KernelModel, KernelStatus
 from master.repository.kernel_repository import KernelRepository
 
 load_dotenv()
 
-docker_client: docker.DockerClient = docker.from_env()
+docker_hosts = load_docker_hosts()
+docker_client: docker.DockerClient = next(iter(docker_hosts.values())).client
 docker_event_handler_proc: multiprocessing.Process | None = None
+kernel_invalidations: multiprocessing.Queue = multiprocessing.Queue()
 
 app = FastAPI(debug=True)
+app.middleware("http")(track_request_duration)
 kernel_container_controller = KernelContainerController(
-    "mlblock-kernel-slave:0.0.6", os.getenv("SLAVE_CALLBACK_URL"), docker_client
+    "mlblock-kernel-slave:0.0.6", os.getenv("SLAVE_CALLBACK_URL"), docker_hosts,
+    cpu_limit=float(os.getenv("KERNEL_CPU_LIMIT")) if os.getenv("KERNEL_CPU_LIMIT") else None,
+    memory_limit=parse_bytes(os.getenv("KERNEL_MEMORY_LIMIT")) if os.getenv("KERNEL_MEMORY_LIMIT") else None,
+    kernels_per_container=int(os.getenv("KERNELS_PER_CONTAINER", "1")),
+    shared_dataset_volume=os.getenv("SHARED_DATASET_VOLUME") or None
 )
 kernel_repository = KernelRepository()
-kernel_controller = KernelController(kernel_repository, kernel_container_controller)
+kernel_launcher = KernelLauncher(
+    kernel_repository, kernel_container_controller, float(os.getenv("SLAVE_READY_TIMEOUT", "60"))
+)
+placement_scheduler = PlacementScheduler(
+    kernel_repository, kernel_container_controller, os.getenv("KERNEL_PLACEMENT_STRATEGY", "spread")
+)
+kernel_pool = KernelPool(
+    kernel_repository, kernel_launcher, placement_scheduler,
+    int(os.getenv("KERNEL_POOL_SIZE", "0")), float(os.getenv("KERNEL_POOL_REFILL_INTERVAL", "30"))
+)
+register_kernel_status_collector(kernel_repository.count_by_status)
+kernel_controller = KernelController(
+    kernel_repository, kernel_launcher, placement_scheduler, kernel_pool,
+    int(os.getenv("KERNEL_LAUNCH_CONCURRENCY", "4"))
+)
+idle_monitor = IdleMonitor(
+    kernel_repository, kernel_controller,
+    float(os.getenv("KERNEL_IDLE_TIMEOUT", "0")), float(os.getenv("KERNEL_IDLE_CHECK_INTERVAL", "60"))
+)
+# every running container holds one stats stream open, so the collectors get their own connection pools
+stats_collectors = {
+    name: ContainerStatsCollector(
+        host.connect(max_pool_size=int(os.getenv("STATS_MAX_STREAMS", "64"))),
+        history_size=int(os.getenv("STATS_HISTORY_SIZE", "120"))
+    ) for name, host in docker_hosts.items()
+}
 
 
 @app.on_event("startup")
 def on_startup():
     context.client = MongoClient(os.getenv("MONGO_URI"))
     context.database = context.client[os.getenv("DB_NAME")]
+    context.async_client = AsyncIOMotorClient(os.getenv("MONGO_URI"))
+    context.async_database = context.async_client[os.getenv("DB_NAME")]
     logger.info(f"Connected to {os.getenv('MONGO_URI')}")
+    kernel_repository.create_indexes()
     global docker_event_handler_proc
     docker_event_handler_proc = multiprocessing.Process(
-        target=docker_event_handler.handle_docker_event
+        target=docker_event_handler.handle_docker_event, args=(kernel_invalidations,)
     )
     docker_event_handler_proc.start()
+    threading.Thread(target=invalidate_kernels, daemon=True, name="kernel-invalidations").start()
+    kernel_pool.start()
+    idle_monitor.start()
+    for stats_collector in stats_collectors.values():
+        stats_collector.start()
 
 
 @app.on_event("shutdown")
 def on_shutdown():
+    kernel_pool.stop()
+    idle_monitor.stop()
+    for stats_collector in stats_collectors.values():
+        stats_collector.stop()
     context.client.close()
+    context.async_client.close()
     logger.info("Database disconnected")
     docker_event_handler_proc.terminate()
 
 
+def invalidate_kernels():
+    """drop cached kernels whose status the docker event handler changed"""
+    while True:
+        kernel_repository.invalidate(container_id=kernel_invalidations.get())
+
+
 @app.get("/")
 async def index():
     return {"status": "OK", "docker": {"version": docker_client.version()}}
 
 
+@app.get("/metrics")
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/docker/info")
 async def docker_info():
     return docker_client.info()
@@ -69,14 +136,29 @@ async def docker_df():
     return docker_client.df()
 
 
+@app.get("/docker/hosts")
+def docker_hosts_capacity():
+    return placement_scheduler.capacity()
+
+
 @app.get("/kernels")
-def get_all_kernels():
-    return kernel_repository.get_all()
+async def get_all_kernels(skip: int = 0, limit: int = 100):
+    return await kernel_repository.get_all_async(skip, limit)
+
+
+@app.get("/kernels/pool")
+def get_kernel_pool_metrics():
+    return kernel_pool.metrics()
+
+
+@app.get("/kernels/health")
+def get_kernels_health():
+    return kernel_controller.get_kernels_health()
 
 
 @app.get("/kernels/{kernel_id}")
-def get_kernel(kernel_id: str):
-    kernel = kernel_repository.get(kernel_id)
+async def get_kernel(kernel_id: str):
+    kernel = await kernel_repository.get_async(kernel_id)
     if kernel is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Kernel not found"
@@ -84,8 +166,7 @@ def get_kernel(kernel_id: str):
     return kernel
 
 
-@app.get("/kernels/{kernel_id}/stats")
-def get_kernel_top(kernel_id: str):
+def get_allocated_kernel(kernel_id: str) -> KernelModel:
     kernel = kernel_repository.get(kernel_id)
     if kernel is None:
         raise HTTPException(
@@ -95,8 +176,28 @@ def get_kernel_top(kernel_id: str):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail="container not allocated"
         )
+    return kernel
+
+
+def get_stats_collector(kernel: KernelModel) -> ContainerStatsCollector:
+    return stats_collectors[kernel.host or kernel_container_controller.get_host().name]
+
+
+@app.get("/kernels/{kernel_id}/stats")
+def get_kernel_top(kernel_id: str):
+    kernel = get_allocated_kernel(kernel_id)
+    sample = get_stats_collector(kernel).latest(kernel.container_id)
+    if sample is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="No stats collected yet"
+        )
+    return sample
 
-    return docker_client.api.stats(kernel.container_id, stream=False)
+
+@app.get("/kernels/{kernel_id}/stats/history")
+def get_kernel_stats_history(kernel_id: str, limit: int | None = None):
+    kernel = get_allocated_kernel(kernel_id)
+    return get_stats_collector(kernel).history(kernel.container_id, limit)
 
 
 @app.post("/kernels")
@@ -110,10 +211,27 @@ def delete_kernel(kernel_id: str, callback: str | None = None, token: str | None
     return {"message": "OK"}
 
 
+@app.post("/kernels/{kernel_id}/suspend")
+def suspend_kernel(kernel_id: str):
+    kernel = kernel_repository.get(kernel_id)
+    if kernel is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Kernel not found"
+        )
+    kernel_controller.suspend_kernel(kernel)
+    return kernel_repository.get(kernel_id)
+
+
+@app.post("/kernels/{kernel_id}/resume")
+def resume_kernel(kernel_id: str, callback: str | None = None, token: str | None = None):
+    return kernel_controller.resume_kernel(kernel_id, callback, token)
+
+
 class HeartBeat(BaseModel):
     callback: str
     token: str
     version: str
+    startup_time: float | None = None
 
 
 @app.post("/internal/register/{kernel_id}")
@@ -124,27 +242,43 @@ def internal_register_container(kernel_id: str, heartbeat: HeartBeat):
             status_code=status.HTTP_404_NOT_FOUND,
             detail="kernel registration not found",
         )
+    if kernel.container_id is None:
+        # the container came up before its launch was recorded, the kernel retries registering
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="kernel is still being launched",
+        )
     logger.info(f"Received heartbeat from {kernel_id}")
-
-    container_url = f'http://{kernel_container_controller.get_address(kernel.container_id)}'
+    if heartbeat.startup_time is not None:
+        logger.info(f"Kernel {kernel_id} took {heartbeat.startup_time:.3f}s to register")
+
+    kernel.startup_time = heartbeat.startup_time
+    kernel.url = kernel_container_controller.get_kernel_url(kernel.container_id, kernel.id, kernel.host)
+    KERNEL_EVENTS.labels("registered").inc()
+
+    # pooled kernels wait for a project to claim them before notifying anyone
+    if kernel.pooled:
+        kernel.status = KernelStatus.POOLED
+        if kernel_repository.save(kernel, {"status", "url", "startup_time"}) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="kernel registration not found")
+        return {"message": "OK"}
+
+    # resumed kernels were allocated long ago
+    if kernel.status == KernelStatus.STARTING and kernel.suspended_at is None:
+        KERNEL_ALLOCATION_DURATION.observe((datetime.utcnow() - kernel.created_at).total_seconds())
     kernel.status = KernelStatus.RUNNING
-    kernel.url = container_url
+
+    if kernel_repository.save(kernel, {"status", "url", "startup_time"}) is None:
+        # deleted while it was starting, the delete or the launch removes it
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="kernel registration not found")
 
     try:
-        kernel_repository.save(kernel)
-        response = requests.put(heartbeat.callback, headers={"Authorization": heartbeat.token}, json={
-            "type": "started",
-            "timestamp": datetime.utcnow().isoformat(),
-            "kernel_id": kernel.id,
-            "status": "started",
-            "kernel_url": container_url
-        })
-        if response.status_code != 200:
-            raise Exception(f"Callback returned with status code {response.status_code}")
+        if heartbeat.callback:
+            kernel_controller.notify_started(kernel, heartbeat.callback, heartbeat.token)
     except Exception as e:
         logger.error(e)
-        kernel_container_controller.delete_container(kernel.container_id)
         kernel_repository.delete(kernel.id)
+        kernel_launcher.remove(kernel)
         return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Callback failed")
 
     return {"message": "OK"}
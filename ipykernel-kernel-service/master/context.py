@@ -1,7 +1,10 @@
 from typing import Mapping, Any, Optional
 
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from pymongo import MongoClient
 from pymongo.database import Database
 
 client: MongoClient[Mapping[str, Any]]
 database: Optional[Database[Mapping[str, Any]]] = None
+async_client: Optional[AsyncIOMotorClient] = None
+async_database: Optional[AsyncIOMotorDatabase] = None
@@ -0,0 +1,113 @@
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+import docker
+
+from master.controller.kernel_container_controller import KERNEL_LABEL
+from master.logger import logger
+
+
+def to_sample(stats: dict) -> dict:
+    """reduce a raw docker stats payload to the figures the dashboard needs"""
+    cpu_stats = stats.get('cpu_stats', {})
+    precpu_stats = stats.get('precpu_stats', {})
+    cpu_delta = cpu_stats.get('cpu_usage', {}).get('total_usage', 0) - \
+        precpu_stats.get('cpu_usage', {}).get('total_usage', 0)
+    system_delta = cpu_stats.get('system_cpu_usage', 0) - precpu_stats.get('system_cpu_usage', 0)
+    online_cpus = cpu_stats.get('online_cpus') or len(cpu_stats.get('cpu_usage', {}).get('percpu_usage') or [1])
+    cpu_percent = cpu_delta / system_delta * online_cpus * 100 if system_delta > 0 and cpu_delta > 0 else 0.0
+
+    memory_stats = stats.get('memory_stats', {})
+    memory_cache = memory_stats.get('stats', {}).get('inactive_file', memory_stats.get('stats', {}).get('cache', 0))
+    memory_usage = memory_stats.get('usage', 0) - memory_cache
+
+    networks = (stats.get('networks') or {}).values()
+
+    block_read, block_write = 0, 0
+    for entry in (stats.get('blkio_stats') or {}).get('io_service_bytes_recursive') or []:
+        if entry['op'].lower() == 'read':
+            block_read += entry['value']
+        elif entry['op'].lower() == 'write':
+            block_write += entry['value']
+
+    return {
+        "timestamp": stats.get('read'),
+        "cpu_percent": cpu_percent,
+        "memory_usage": memory_usage,
+        "memory_limit": memory_stats.get('limit', 0),
+        "network_rx_bytes": sum(network.get('rx_bytes', 0) for network in networks),
+        "network_tx_bytes": sum(network.get('tx_bytes', 0) for network in networks),
+        "block_read_bytes": block_read,
+        "block_write_bytes": block_write
+    }
+
+
+class ContainerStatsCollector:
+    """Keeps one streaming stats subscription per running kernel container and stores
+    the samples in fixed size ring buffers"""
+
+    def __init__(self, client: docker.DockerClient, history_size: int = 120, refresh_interval: float = 5.0):
+        self._client = client
+        self._history_size = history_size
+        self._refresh_interval = refresh_interval
+        self._history: Dict[str, deque] = {}
+        self._streams: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="stats-collector")
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self._refresh_interval)
+            self._thread = None
+
+    def latest(self, container_id: str) -> Optional[dict]:
+        with self._lock:
+            history = self._history.get(container_id)
+            return history[-1] if history else None
+
+    def history(self, container_id: str, limit: Optional[int] = None) -> List[dict]:
+        with self._lock:
+            samples = list(self._history.get(container_id, ()))
+        return samples[-limit:] if limit else samples
+
+    def refresh(self):
+        """subscribe to new kernel containers and forget the ones which are gone"""
+        running = {container['Id'] for container in self._client.api.containers(filters={"label": KERNEL_LABEL})}
+        with self._lock:
+            for container_id in running - self._streams.keys():
+                self._history[container_id] = deque(maxlen=self._history_size)
+                thread = threading.Thread(target=self._collect, args=(container_id,), daemon=True,
+                                          name=f"stats-{container_id[:12]}")
+                self._streams[container_id] = thread
+                thread.start()
+            for container_id in [cid for cid, thread in self._streams.items() if not thread.is_alive()]:
+                del self._streams[container_id]
+                if container_id not in running:
+                    del self._history[container_id]
+
+    def _collect(self, container_id: str):
+        try:
+            for stats in self._client.api.stats(container_id, stream=True, decode=True):
+                if self._stop_event.is_set():
+                    return
+                sample = to_sample(stats)
+                with self._lock:
+                    self._history[container_id].append(sample)
+        except Exception as e:
+            logger.debug(f"Stats stream for {container_id} closed: {e}")
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Stats collector refresh failed: {e}")
+            self._stop_event.wait(self._refresh_interval)
@@ -0,0 +1,56 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from master.controller.kernel_controller import KernelController
+from master.logger import logger
+from master.repository.kernel_repository import KernelRepository
+
+
+class IdleMonitor:
+    """Suspends kernels whose slave reports no activity for longer than the idle timeout"""
+
+    def __init__(self,
+                 kernel_repository: KernelRepository,
+                 kernel_controller: KernelController,
+                 idle_timeout: float,
+                 check_interval: float = 60.0):
+        self._kernel_repository = kernel_repository
+        self._kernel_controller = kernel_controller
+        self._idle_timeout = timedelta(seconds=idle_timeout)
+        self._check_interval = check_interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._idle_timeout.total_seconds() <= 0:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="idle-monitor")
+        self._thread.start()
+        logger.info(f"Suspending kernels idle for more than {self._idle_timeout}")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def check(self):
+        now = datetime.utcnow()
+        for result in self._kernel_controller.get_kernels_health()["kernels"]:
+            if result["health"] is None or "last_activity" not in result["health"]:
+                continue
+            last_activity = datetime.fromisoformat(result["health"]["last_activity"])
+            if now - last_activity < self._idle_timeout:
+                continue
+            kernel = self._kernel_repository.get(result["kernel_id"])
+            if kernel is not None:
+                self._kernel_controller.suspend_kernel(kernel)
+
+    def _run(self):
+        while not self._stop_event.wait(self._check_interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Idle check failed: {e}")
@@ -1,19 +1,50 @@
+import os
+import time
+import uuid
+from typing import Dict, Optional
+
 import docker
+import requests
+
+from master.docker_hosts import DockerHost
+from master.http_session import TIMEOUT
+
+# label attached to every kernel container, used to filter docker events and listings
+KERNEL_LABEL = "mlblock.kernel"
+SNAPSHOT_VOLUME_LABEL = "mlblock.snapshot_volume"
+SNAPSHOT_DIR = "/snapshot"
+SHARED_DATASET_DIR = "/datasets"
+# tracing, shared dataset and sweep configuration of the master, handed down to the kernels
+FORWARDED_ENV_PREFIXES = ("TRACE_", "OTEL_", "SHARED_DATASET_", "SWEEP_")
 
 
 class KernelContainerController:
-    def __init__(self, image: str, master_host: str, client: docker.DockerClient):
-        self._client = client
+    def __init__(self,
+                 image: str,
+                 master_host: str,
+                 hosts: Dict[str, DockerHost],
+                 cpu_limit: Optional[float] = None,
+                 memory_limit: Optional[int] = None,
+                 kernels_per_container: int = 1,
+                 shared_dataset_volume: Optional[str] = None):
+        self._hosts = hosts
         self._image = image
         self._master_host = master_host
+        self._cpu_limit = cpu_limit
+        self._memory_limit = memory_limit
+        self._kernels_per_container = kernels_per_container
+        self._shared_dataset_volume = shared_dataset_volume
+        self._slaves = requests.Session()
 
-    def launch_kernel_container(self, kernel_id: str, callback_url: str, token: str):
+    def launch_container(self, host: Optional[str] = None):
+        """start a slave container, kernels are started in it with start_kernel once it is up"""
+        # the snapshots of all kernels of the container live in one volume, a directory each
+        snapshot_volume = f"mlblock-snapshot-{uuid.uuid4().hex}"
         env = {
-            'KERNEL_ID': kernel_id,
             'KERNEL_MASTER_HOST': self._master_host or "http://host.docker.internal:8000",
-            'CALLBACK_URL': callback_url,
-            'AUTH_TOKEN': token,
-            'KERNEL_CONFIG_FILE': '/root/.local/share/jupyter/runtime/config.json'
+            'KERNEL_SNAPSHOT_DIR': SNAPSHOT_DIR,
+            'SLAVE_MAX_KERNELS': str(self._kernels_per_container),
+            **{key: value for key, value in os.environ.items() if key.startswith(FORWARDED_ENV_PREFIXES)}
         }
 
         config = {
@@ -22,22 +53,109 @@ class KernelContainerController:
             'extra_hosts': {
                 'host.docker.internal': 'host-gateway'
             },
-            'environment': env
+            'environment': env,
+            'labels': {
+                KERNEL_LABEL: "true",
+                SNAPSHOT_VOLUME_LABEL: snapshot_volume
+            },
+            'volumes': {
+                snapshot_volume: {'bind': SNAPSHOT_DIR, 'mode': 'rw'}
+            }
         }
+        # the limits are per kernel, the kernels of a container share them
+        if self._cpu_limit is not None:
+            config['nano_cpus'] = int(self._cpu_limit * self._kernels_per_container * 1e9)
+        if self._memory_limit is not None:
+            config['mem_limit'] = self._memory_limit * self._kernels_per_container
+        # one volume per host, every kernel there maps the datasets parsed by any of them
+        if self._shared_dataset_volume:
+            config['volumes'][self._shared_dataset_volume] = {'bind': SHARED_DATASET_DIR, 'mode': 'rw'}
+            env['SHARED_DATASET_DIR'] = SHARED_DATASET_DIR
 
-        container = self._client.containers.run(self._image, **config)
+        container = self.get_host(host).client.containers.run(self._image, **config)
 
         return container
 
-    def delete_container(self, container_id: str):
-        container = self._client.containers.get(container_id)
+    def delete_container(self, container_id: str, host: Optional[str] = None):
+        client = self.get_host(host).client
+        container = client.containers.get(container_id)
+        snapshot_volume = container.labels.get(SNAPSHOT_VOLUME_LABEL)
         container.remove(force=True)
+        if snapshot_volume is not None:
+            try:
+                client.volumes.get(snapshot_volume).remove(force=True)
+            except docker.errors.NotFound:
+                pass
+
+    def stop_container(self, container_id: str, host: Optional[str] = None):
+        self.get_host(host).client.containers.get(container_id).stop()
+
+    def start_container(self, container_id: str, host: Optional[str] = None):
+        self.get_host(host).client.containers.get(container_id).start()
+
+    def is_running(self, container_id: str, host: Optional[str] = None) -> bool:
+        container = self.get_host(host).client.containers.get(container_id)
+        container.reload()
+        return container.status == "running"
+
+    def wait_for_slave(self, container_id: str, host: Optional[str] = None, timeout: float = 60):
+        """wait until the server of a freshly started container answers"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                url = f"http://{self.get_address(container_id, host)}/health"
+                if self._slaves.get(url, timeout=2).status_code == 200:
+                    return
+            except (requests.RequestException, KeyError, IndexError, TypeError):
+                # the port is published only once the container runs
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"slave {container_id} did not come up within {timeout}s")
+            time.sleep(0.2)
+
+    def start_kernel(self, container_id: str, kernel_id: str, callback_url: str, token: str,
+                     host: Optional[str] = None):
+        """start a kernel in a running container, it registers with the master once it is up"""
+        response = self._slaves.post(f"http://{self.get_address(container_id, host)}/kernels", timeout=(5, 120), json={
+            "kernel_id": kernel_id,
+            "callback": callback_url,
+            "token": token
+        })
+        if response.status_code != 200:
+            raise Exception(f"Slave returned with status code {response.status_code}: {response.text}")
+
+    def stop_kernel(self, container_id: str, kernel_id: str, keep_snapshot: bool = False,
+                    host: Optional[str] = None):
+        response = self._slaves.delete(f"http://{self.get_address(container_id, host)}/kernels/{kernel_id}",
+                                       params={"keep_snapshot": keep_snapshot}, timeout=TIMEOUT)
+        if response.status_code not in (200, 404):
+            raise Exception(f"Slave returned with status code {response.status_code}")
+
+    def get_kernels_per_container(self) -> int:
+        return self._kernels_per_container
 
     def get_image_name(self):
         return self._image
 
-    def get_address(self, container_id):
-        container = self._client.containers.get(container_id)
-        ip = container.attrs['NetworkSettings']['Gateway']
+    def get_resource_limits(self):
+        return self._cpu_limit, self._memory_limit
+
+    def get_hosts(self) -> Dict[str, DockerHost]:
+        return self._hosts
+
+    def get_host(self, name: Optional[str] = None) -> DockerHost:
+        """kernels created before multi host placement carry no host, they live on the first one"""
+        if name is None:
+            return next(iter(self._hosts.values()))
+        return self._hosts[name]
+
+    def get_address(self, container_id, host: Optional[str] = None):
+        docker_host = self.get_host(host)
+        container = docker_host.client.containers.get(container_id)
+        ip = docker_host.address or container.attrs['NetworkSettings']['Gateway']
         port = container.attrs['NetworkSettings']['Ports']['5000/tcp'][0]['HostPort']
         return f"{ip}:{port}"
+
+    def get_kernel_url(self, container_id: str, kernel_id: str, host: Optional[str] = None) -> str:
+        return f"http://{self.get_address(container_id, host)}/kernels/{kernel_id}"
+
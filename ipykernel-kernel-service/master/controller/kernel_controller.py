@@ -1,42 +1,201 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Optional
 
 import requests
 
-from master.controller.kernel_container_controller import KernelContainerController
+from master.controller.kernel_launcher import KernelLauncher, KernelDeletedError
+from master.controller.kernel_pool import KernelPool
+from master.controller.placement_scheduler import PlacementScheduler, NoCapacityError
+from master.http_session import create_session, TIMEOUT
+from master.logger import logger
+from master.metrics import KERNEL_EVENTS, KERNEL_LAUNCH_DURATION
 from master.repository.kernel_repository import KernelRepository
-from master.models.kernel import KernelModel
+from master.models.kernel import KernelModel, KernelStatus
 from fastapi import HTTPException, status
 
 
 class KernelController:
     def __init__(self,
                  kernel_repository: KernelRepository,
-                 kernel_container_controller: KernelContainerController):
+                 kernel_launcher: KernelLauncher,
+                 placement_scheduler: PlacementScheduler,
+                 kernel_pool: Optional[KernelPool] = None,
+                 launch_concurrency: int = 4):
         self._kernel_repository = kernel_repository
-        self._kernel_container_controller = kernel_container_controller
+        self._kernel_launcher = kernel_launcher
+        self._placement_scheduler = placement_scheduler
+        self._kernel_pool = kernel_pool
+        self._health_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="kernel-health")
+        # container launches are queued, a burst of allocations doesn't hold a request thread each
+        self._launch_executor = ThreadPoolExecutor(max_workers=launch_concurrency, thread_name_prefix="kernel-launch")
+        self._callbacks = create_session()
 
     def allocate_kernel(self, callback: str, token: str):
-        # Add a new entry in the database
-        kernel = KernelModel(
-            container_image=self._kernel_container_controller.get_image_name()
-        )
-        kernel = self._kernel_repository.save(kernel)
-
-        # launch container
-        container = self._kernel_container_controller.launch_kernel_container(kernel.id, callback, token)
-        kernel.container_id = container.id
-        kernel = self._kernel_repository.save(kernel)
+        # Try to hand out an already booted kernel from the pool
+        if self._kernel_pool is not None:
+            kernel = self._kernel_pool.claim()
+            if kernel is not None:
+                KERNEL_EVENTS.labels("pool_claimed").inc()
+                self._launch_executor.submit(self._bind_pooled_kernel, kernel, callback, token)
+                return kernel
+
+        # Add a new entry in the database, placed on the host with room for it
+        try:
+            kernel = self._placement_scheduler.reserve_kernel()
+        except NoCapacityError as e:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+        KERNEL_EVENTS.labels("allocated").inc()
+
+        # the container is launched in the background, the project learns about it through the callback
+        self._launch_executor.submit(self._launch_kernel, kernel, callback, token)
         return kernel
 
+    def _launch_kernel(self, kernel: KernelModel, callback: str, token: str):
+        started = time.perf_counter()
+        try:
+            self._kernel_launcher.launch(kernel, callback, token)
+        except KernelDeletedError as e:
+            # the project deleted the kernel itself, there is nobody to tell
+            KERNEL_EVENTS.labels("launch_cancelled").inc()
+            logger.info(e)
+            return
+        except Exception as e:
+            KERNEL_EVENTS.labels("launch_failed").inc()
+            logger.error(f"Failed to launch kernel {kernel.id}: {e}")
+            # free the reservation, nothing refers to the kernel yet
+            self._kernel_repository.delete(kernel.id)
+            try:
+                self.notify_failed(kernel, callback, token, str(e))
+            except Exception as callback_error:
+                logger.error(callback_error)
+            return
+        KERNEL_LAUNCH_DURATION.observe(time.perf_counter() - started)
+        KERNEL_EVENTS.labels("launched").inc()
+
+    def notify_started(self, kernel: KernelModel, callback: str, token: str):
+        response = self._callbacks.put(callback, headers={"Authorization": token}, timeout=TIMEOUT, json={
+            "type": "started",
+            "timestamp": datetime.utcnow().isoformat(),
+            "kernel_id": kernel.id,
+            "status": "started",
+            "kernel_url": kernel.url
+        })
+        if response.status_code != 200:
+            raise Exception(f"Callback returned with status code {response.status_code}")
+
+    def notify_failed(self, kernel: KernelModel, callback: str, token: str, error: str):
+        response = self._callbacks.put(callback, headers={"Authorization": token}, timeout=TIMEOUT, json={
+            "type": "error",
+            "timestamp": datetime.utcnow().isoformat(),
+            "kernel_id": kernel.id,
+            "status": "error",
+            "error": error
+        })
+        if response.status_code != 200:
+            raise Exception(f"Callback returned with status code {response.status_code}")
+
+    def _bind_pooled_kernel(self, kernel: KernelModel, callback: str, token: str):
+        try:
+            self.notify_started(kernel, callback, token)
+        except Exception as e:
+            logger.error(e)
+            self._kernel_repository.delete(kernel.id)
+            self._kernel_launcher.remove(kernel)
+
+    def get_kernels_health(self, timeout: float = 2.0) -> dict:
+        """poll the health endpoint of every running kernel concurrently"""
+        kernels = self._kernel_repository.find_by_status(KernelStatus.RUNNING)
+        results = list(self._health_executor.map(lambda kernel: self._get_kernel_health(kernel, timeout), kernels))
+        return {
+            "total": len(results),
+            "healthy": sum(1 for result in results if result["healthy"]),
+            "kernels": results
+        }
+
+    @staticmethod
+    def _get_kernel_health(kernel: KernelModel, timeout: float) -> dict:
+        result = {"kernel_id": kernel.id, "url": kernel.url, "healthy": False, "latency_ms": None, "health": None}
+        started = time.perf_counter()
+        try:
+            response = requests.get(f"{kernel.url}/health", timeout=timeout)
+            result["latency_ms"] = (time.perf_counter() - started) * 1000
+            if response.status_code == 200:
+                result["health"] = response.json()
+                result["healthy"] = bool(result["health"]["ipykernel"]["heartbeat"])
+        except Exception as e:
+            result["error"] = str(e)
+        return result
+
+    def suspend_kernel(self, kernel: KernelModel):
+        """snapshot the kernel namespace and stop it, along with its container once no kernel there is active"""
+        if not self._kernel_repository.transition_status(kernel.id, KernelStatus.RUNNING, KernelStatus.SUSPENDING):
+            return
+        try:
+            response = requests.post(f"{kernel.url}/snapshot", timeout=600)
+            if response.status_code != 200:
+                raise Exception(f"Snapshot returned with status code {response.status_code}")
+        except Exception as e:
+            logger.error(f"Failed to snapshot kernel {kernel.id}: {e}")
+            self._kernel_repository.transition_status(kernel.id, KernelStatus.SUSPENDING, KernelStatus.RUNNING)
+            return
+
+        try:
+            self._kernel_launcher.suspend(kernel)
+        except Exception as e:
+            # the snapshot is taken, the kernel resumes from it whether or not it was stopped
+            logger.error(f"Failed to stop suspended kernel {kernel.id}: {e}")
+        # a kernel deleted meanwhile stays deleted
+        if not self._kernel_repository.transition_status(kernel.id, KernelStatus.SUSPENDING, KernelStatus.SUSPENDED,
+                                                         suspended_at=datetime.utcnow()):
+            return
+        KERNEL_EVENTS.labels("suspended").inc()
+        logger.info(f"Suspended idle kernel {kernel.id}")
+
+    def resume_kernel(self, kernel_id: str, callback: Optional[str], token: Optional[str], timeout: float = 120):
+        """restart a suspended kernel and wait until it has registered again"""
+        deadline = time.monotonic() + timeout
+        kernel = self._kernel_repository.get(kernel_id)
+        # a kernel is only started again once its snapshot is complete
+        while kernel is not None and kernel.status == KernelStatus.SUSPENDING and time.monotonic() < deadline:
+            time.sleep(0.2)
+            kernel = self._kernel_repository.get(kernel_id)
+        if kernel is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="kernel not found")
+
+        if self._kernel_repository.transition_status(kernel_id, KernelStatus.SUSPENDED, KernelStatus.STARTING):
+            # the kernel reports to the project which asked for it once it registers again
+            try:
+                self._kernel_launcher.resume(kernel, callback or "", token or "")
+            except Exception as e:
+                logger.error(f"Failed to resume kernel {kernel_id}: {e}")
+                self._kernel_repository.transition_status(kernel_id, KernelStatus.STARTING, KernelStatus.SUSPENDED)
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="kernel failed to resume")
+            KERNEL_EVENTS.labels("resumed").inc()
+        elif kernel.status not in (KernelStatus.STARTING, KernelStatus.RUNNING):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"kernel is {kernel.status.value}")
+
+        # concurrent resumes of the same kernel all wait for the one kernel start
+        while time.monotonic() < deadline:
+            kernel = self._kernel_repository.get(kernel_id)
+            if kernel is None or kernel.status in (KernelStatus.STOPPED, KernelStatus.ERROR):
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="kernel failed to resume")
+            if kernel.status == KernelStatus.RUNNING:
+                return kernel
+            time.sleep(0.2)
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="kernel did not resume in time")
+
     def delete_kernel(self, kernel_id: str, callback, token):
         kernel = self._kernel_repository.get(kernel_id)
         self._kernel_repository.delete(kernel_id)
         if kernel is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="kernel not found")
+        KERNEL_EVENTS.labels("deleted").inc()
         if kernel.container_id:
-            self._kernel_container_controller.delete_container(kernel.container_id)
+            self._kernel_launcher.remove(kernel)
             if callback:
-                requests.put(callback, headers={"Authorization": token}, json={
+                self._callbacks.put(callback, headers={"Authorization": token}, timeout=TIMEOUT, json={
                     "type": "deleted",
                     "timestamp": datetime.utcnow().isoformat(),
                     "kernel_id": kernel_id,
@@ -0,0 +1,118 @@
+import threading
+from collections import defaultdict
+from typing import Dict, Optional
+
+import docker.errors
+
+from master.controller.kernel_container_controller import KernelContainerController
+from master.logger import logger
+from master.models.kernel import KernelModel, KernelStatus
+from master.repository.kernel_repository import KernelRepository
+
+# kernels which hold a place in their container
+HOSTED_STATUSES = (KernelStatus.STARTING, KernelStatus.POOLED, KernelStatus.RUNNING, KernelStatus.SUSPENDING,
+                   KernelStatus.SUSPENDED)
+# kernels which keep their container running
+ACTIVE_STATUSES = (KernelStatus.STARTING, KernelStatus.POOLED, KernelStatus.RUNNING)
+
+
+class KernelDeletedError(Exception):
+    """the kernel was deleted while it was being launched"""
+    pass
+
+
+class KernelLauncher:
+    """
+    Starts kernels in slave containers, up to kernels_per_container of them share a container.
+    A kernel is placed in the fullest running container of its host which has room left, a new
+    container is launched when there is none.
+    """
+
+    def __init__(self,
+                 kernel_repository: KernelRepository,
+                 kernel_container_controller: KernelContainerController,
+                 ready_timeout: float = 60):
+        self._kernel_repository = kernel_repository
+        self._kernel_container_controller = kernel_container_controller
+        self._kernels_per_container = kernel_container_controller.get_kernels_per_container()
+        self._ready_timeout = ready_timeout
+        # containers are chosen, started and stopped under the lock of their host
+        self._locks: Dict[Optional[str], threading.Lock] = defaultdict(threading.Lock)
+
+    def launch(self, kernel: KernelModel, callback: str, token: str):
+        """start a reserved kernel, the container it was placed in is recorded before the kernel starts"""
+        created = False
+        with self._locks[kernel.host]:
+            container_id = None
+            if self._kernels_per_container > 1:
+                container_id = self._kernel_repository.find_container_with_room(kernel.host, self._kernels_per_container)
+            if container_id is None:
+                container_id = self._kernel_container_controller.launch_container(kernel.host).id
+                created = True
+            kernel.container_id = container_id
+            if self._kernel_repository.save(kernel, {"container_id"}) is None:
+                # deleted before its container was recorded, nothing else knows about a new container
+                if created:
+                    self._delete_container(kernel)
+                raise KernelDeletedError(f"kernel {kernel.id} was deleted while it was being launched")
+
+        try:
+            self._kernel_container_controller.wait_for_slave(container_id, kernel.host, self._ready_timeout)
+            self._kernel_container_controller.start_kernel(container_id, kernel.id, callback, token, kernel.host)
+        except Exception as e:
+            if not self._kernel_repository.exists(kernel.id):
+                # deleted while it was starting, the delete removed it from its container
+                raise KernelDeletedError(f"kernel {kernel.id} was deleted while it was being launched") from e
+            if created:
+                self._remove_container_if_unused(kernel)
+            raise
+
+    def remove(self, kernel: KernelModel):
+        """stop a kernel for good, its container goes once no other kernel is left in it"""
+        if kernel.container_id is None:
+            return
+        with self._locks[kernel.host]:
+            if self._others(kernel):
+                try:
+                    self._kernel_container_controller.stop_kernel(kernel.container_id, kernel.id, host=kernel.host)
+                except Exception as e:
+                    logger.error(f"Failed to stop kernel {kernel.id}: {e}")
+            else:
+                try:
+                    self._kernel_container_controller.delete_container(kernel.container_id, kernel.host)
+                except docker.errors.NotFound:
+                    # the last kernels of a container were removed at the same time
+                    pass
+
+    def suspend(self, kernel: KernelModel):
+        """stop a snapshotted kernel, its container is stopped too once none of its kernels are active"""
+        with self._locks[kernel.host]:
+            if any(other.status in ACTIVE_STATUSES for other in self._others(kernel)):
+                self._kernel_container_controller.stop_kernel(kernel.container_id, kernel.id, keep_snapshot=True,
+                                                              host=kernel.host)
+            else:
+                self._kernel_container_controller.stop_container(kernel.container_id, kernel.host)
+
+    def resume(self, kernel: KernelModel, callback: str, token: str):
+        """start a suspended kernel again, in the container which holds its snapshot"""
+        with self._locks[kernel.host]:
+            if not self._kernel_container_controller.is_running(kernel.container_id, kernel.host):
+                self._kernel_container_controller.start_container(kernel.container_id, kernel.host)
+        self._kernel_container_controller.wait_for_slave(kernel.container_id, kernel.host, self._ready_timeout)
+        self._kernel_container_controller.start_kernel(kernel.container_id, kernel.id, callback, token, kernel.host)
+
+    def _others(self, kernel: KernelModel):
+        return [other for other in self._kernel_repository.find_by_container_id(kernel.container_id)
+                if other.id != kernel.id and other.status in HOSTED_STATUSES]
+
+    def _remove_container_if_unused(self, kernel: KernelModel):
+        # kernels placed in the new container meanwhile fail to start on their own
+        with self._locks[kernel.host]:
+            if not self._others(kernel):
+                self._delete_container(kernel)
+
+    def _delete_container(self, kernel: KernelModel):
+        try:
+            self._kernel_container_controller.delete_container(kernel.container_id, kernel.host)
+        except Exception as e:
+            logger.error(f"Failed to remove container {kernel.container_id}: {e}")
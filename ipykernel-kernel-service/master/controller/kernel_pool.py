@@ -0,0 +1,92 @@
+import threading
+from typing import Optional
+
+from master.controller.kernel_launcher import KernelLauncher
+from master.controller.placement_scheduler import PlacementScheduler
+from master.logger import logger
+from master.metrics import KERNEL_EVENTS
+from master.models.kernel import KernelModel
+from master.repository.kernel_repository import KernelRepository
+
+
+class KernelPool:
+    """Keeps a number of pre-booted, unassigned kernels ready to be claimed"""
+
+    def __init__(self,
+                 kernel_repository: KernelRepository,
+                 kernel_launcher: KernelLauncher,
+                 placement_scheduler: PlacementScheduler,
+                 size: int,
+                 refill_interval: float = 30.0):
+        self._kernel_repository = kernel_repository
+        self._kernel_launcher = kernel_launcher
+        self._placement_scheduler = placement_scheduler
+        self._size = max(size, 0)
+        self._refill_interval = refill_interval
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+        self._refill_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._size == 0:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="kernel-pool-refill")
+        self._thread.start()
+        logger.info(f"Kernel pool started with size {self._size}")
+
+    def stop(self):
+        self._stop_event.set()
+        self._refill_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def claim(self) -> Optional[KernelModel]:
+        """take a booted kernel out of the pool, returns None on a pool miss"""
+        kernel = self._kernel_repository.claim_pooled() if self._size > 0 else None
+        with self._lock:
+            if kernel is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        self._refill_event.set()
+        return kernel
+
+    def refill(self):
+        missing = self._size - self._kernel_repository.count_pooled()
+        for _ in range(missing):
+            kernel = self._placement_scheduler.reserve_kernel(pooled=True)
+            try:
+                # pooled kernels are not bound to a project yet, the callback is sent once claimed
+                self._kernel_launcher.launch(kernel, "", "")
+            except Exception as e:
+                KERNEL_EVENTS.labels("launch_failed").inc()
+                logger.error(f"Failed to launch pooled kernel: {e}")
+                self._kernel_repository.delete(kernel.id)
+                return
+            KERNEL_EVENTS.labels("launched").inc()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            hits, misses = self._hits, self._misses
+        claims = hits + misses
+        return {
+            "size": self._size,
+            "available": self._kernel_repository.count_pooled() if self._size > 0 else 0,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / claims if claims > 0 else None
+        }
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refill()
+            except Exception as e:
+                logger.error(f"Kernel pool refill failed: {e}")
+            self._refill_event.wait(self._refill_interval)
+            self._refill_event.clear()
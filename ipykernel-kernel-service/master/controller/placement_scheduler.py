@@ -0,0 +1,98 @@
+import threading
+from typing import Dict, List
+
+from master.controller.kernel_container_controller import KernelContainerController
+from master.logger import logger
+from master.models.kernel import KernelModel
+from master.repository.kernel_repository import KernelRepository
+
+
+class NoCapacityError(Exception):
+    pass
+
+
+class PlacementScheduler:
+    """
+    Picks the docker host a new kernel is started on. "spread" places kernels on the host
+    with the largest share of free capacity, "pack" fills the fullest host that still fits
+    the kernel before moving to the next one.
+    """
+
+    STRATEGIES = ("spread", "pack")
+
+    def __init__(self,
+                 kernel_repository: KernelRepository,
+                 kernel_container_controller: KernelContainerController,
+                 strategy: str = "spread"):
+        if strategy not in self.STRATEGIES:
+            raise Exception(f"unknown placement strategy {strategy}")
+        self._kernel_repository = kernel_repository
+        self._kernel_container_controller = kernel_container_controller
+        self._strategy = strategy
+        self._host_info: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def capacity(self) -> List[dict]:
+        """total and allocated resources of every reachable host"""
+        allocated = {name: {"cpus": 0.0, "memory": 0, "kernels": 0}
+                     for name in self._kernel_container_controller.get_hosts()}
+        default_host = self._kernel_container_controller.get_host().name
+        # kernels which are still being launched hold their reservation too
+        for kernel in self._kernel_repository.find_active(require_container=False):
+            usage = allocated.get(kernel.host or default_host)
+            if usage is None:
+                continue
+            usage["cpus"] += kernel.cpu_limit or 0
+            usage["memory"] += kernel.memory_limit or 0
+            usage["kernels"] += 1
+
+        capacity = []
+        for name in self._kernel_container_controller.get_hosts():
+            try:
+                info = self._get_host_info(name)
+            except Exception as e:
+                logger.error(f"Docker host {name} is unreachable: {e}")
+                continue
+            capacity.append({
+                "host": name,
+                "cpus": info["NCPU"],
+                "memory": info["MemTotal"],
+                "allocated_cpus": allocated[name]["cpus"],
+                "allocated_memory": allocated[name]["memory"],
+                "kernels": allocated[name]["kernels"],
+                "free_cpus": info["NCPU"] - allocated[name]["cpus"],
+                "free_memory": info["MemTotal"] - allocated[name]["memory"]
+            })
+        return capacity
+
+    def reserve_kernel(self, **kwargs) -> KernelModel:
+        """place a new kernel and save it, so that its resources count against the chosen host"""
+        cpu_limit, memory_limit = self._kernel_container_controller.get_resource_limits()
+        with self._lock:
+            kernel = KernelModel(
+                container_image=self._kernel_container_controller.get_image_name(),
+                host=self._place(cpu_limit, memory_limit),
+                cpu_limit=cpu_limit,
+                memory_limit=memory_limit,
+                **kwargs
+            )
+            return self._kernel_repository.save(kernel)
+
+    def _place(self, cpu_limit, memory_limit) -> str:
+        candidates = [host for host in self.capacity()
+                      if host["free_cpus"] >= (cpu_limit or 0) and host["free_memory"] >= (memory_limit or 0)]
+        if not candidates:
+            raise NoCapacityError("no docker host has enough free capacity for a kernel")
+
+        def free_share(host: dict) -> float:
+            return min(host["free_cpus"] / host["cpus"], host["free_memory"] / host["memory"])
+
+        if self._strategy == "spread":
+            return max(candidates, key=lambda host: (free_share(host), -host["kernels"]))["host"]
+        return min(candidates, key=lambda host: (free_share(host), -host["kernels"]))["host"]
+
+    def _get_host_info(self, name: str) -> dict:
+        # cpu count and memory size of a daemon don't change, ask once
+        if name not in self._host_info:
+            self._host_info[name] = self._kernel_container_controller.get_host(name).client.info()
+        return self._host_info[name]
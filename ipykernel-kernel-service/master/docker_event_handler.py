@@ -1,20 +1,31 @@
-import json
 import logging
+import multiprocessing
+import multiprocessing.queues
 import os
+import queue
 import signal
+import threading
+import time
 
-import docker
 from pymongo import MongoClient
 
 from master import context
+from master.controller.kernel_container_controller import KERNEL_LABEL
+from master.docker_hosts import DockerHost, load_docker_hosts
 from master.repository.kernel_repository import KernelRepository
 from master.models.kernel import KernelStatus
 
-docker_client: docker.DockerClient | None = None
+BATCH_SIZE = int(os.getenv("DOCKER_EVENT_BATCH_SIZE", "50"))
+FLUSH_INTERVAL = float(os.getenv("DOCKER_EVENT_FLUSH_INTERVAL", "1.0"))
+EVENT_FILTERS = {"type": "container", "event": "die", "label": KERNEL_LABEL}
+
+docker_hosts: dict[str, DockerHost] = {}
+# container ids whose kernel changed, read by the master to invalidate its kernel cache
+invalidations: multiprocessing.queues.Queue | None = None
 kernel_repository: KernelRepository
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
+logger.setLevel(os.getenv("DOCKER_EVENT_LOG_LEVEL", "INFO"))
 f_handler = logging.FileHandler('docker_events.log')
 f_handler.setLevel(logging.DEBUG)
 f_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -24,8 +35,8 @@ logger.addHandler(f_handler)
 
 def cleanup(signum, frame):
     logger.debug("received signal %d", signum)
-    if docker_client:
-        docker_client.close()
+    for host in docker_hosts.values():
+        host.client.close()
     logger.info("cleaned up docker event handler")
     if context.client:
         context.client.close()
@@ -33,32 +44,90 @@ def cleanup(signum, frame):
     exit(signum)
 
 
-def handle_container_death(event_json: dict):
-    container_id = event_json['id']
-    kernel = kernel_repository.find_kernel_by_container_id(container_id)
-    if kernel is None:
-        return
+def get_exit_status(exit_code: int) -> KernelStatus:
+    if exit_code in (1,):
+        return KernelStatus.ERROR
+    return KernelStatus.STOPPED
+
+
+def handle_container_death(event_json: dict, pending: dict):
     if 'Actor' not in event_json or 'Attributes' not in event_json['Actor']:
         return
     try:
-        exit_code = int(event_json['Actor']['Attributes']['exitCode'] or "0")
-        status = KernelStatus.STOPPED
-        if exit_code in (1,):
-            status = KernelStatus.ERROR
-        kernel.status = status
-        kernel_repository.save(kernel)
+        exit_code = int(event_json['Actor']['Attributes'].get('exitCode') or "0")
+        pending[event_json['id']] = get_exit_status(exit_code)
     except Exception as e:
         logger.error(e)
 
 
-def handle_event(event: str):
-    logger.debug("[docker event] %s", event)
-    event_json = json.loads(event)
+def handle_event(event_json: dict, pending: dict):
+    logger.debug("[docker event] %s", event_json)
     if 'Type' not in event_json or 'Action' not in event_json or 'id' not in event_json:
         return
 
     if event_json['Type'] == 'container' and event_json['Action'] == 'die':
-        handle_container_death(event_json)
+        handle_container_death(event_json, pending)
+
+
+def flush(pending: dict):
+    """write the buffered status changes in a single bulk operation"""
+    if not pending:
+        return
+    try:
+        modified = kernel_repository.bulk_update_status(pending)
+        logger.info("updated %d kernel(s) from %d container(s)", modified, len(pending))
+        if invalidations is not None:
+            for container_id in pending:
+                invalidations.put(container_id)
+    except Exception as e:
+        logger.error(e)
+    pending.clear()
+
+
+def reconcile():
+    """bring the kernels collection in line with the containers which actually exist"""
+    kernels = kernel_repository.find_active()
+    if not kernels:
+        return
+
+    default_host = next(iter(docker_hosts))
+    kernels_by_host = {}
+    for kernel in kernels:
+        kernels_by_host.setdefault(kernel.host or default_host, []).append(kernel)
+
+    updates = {}
+    for name, host_kernels in kernels_by_host.items():
+        if name not in docker_hosts:
+            logger.warning("%d kernel(s) are placed on unknown docker host %s", len(host_kernels), name)
+            continue
+        client = docker_hosts[name].client
+        containers = {
+            container['Id']: container for container in
+            client.api.containers(all=True, filters={"id": [kernel.container_id for kernel in host_kernels]})
+        }
+        for kernel in host_kernels:
+            container = containers.get(kernel.container_id)
+            if container is None:
+                updates[kernel.container_id] = KernelStatus.STOPPED
+            elif container['State'] in ('exited', 'dead'):
+                exit_code = client.api.inspect_container(kernel.container_id)['State']['ExitCode']
+                updates[kernel.container_id] = get_exit_status(exit_code)
+
+    logger.info("reconciled %d kernel(s), %d changed", len(kernels), len(updates))
+    flush(updates)
+
+
+def read_events(host: DockerHost, events: queue.Queue):
+    since = None
+    while True:
+        try:
+            for event in host.client.api.events(since=since, decode=True, filters=EVENT_FILTERS):
+                # resume from the last seen event if the stream has to be reopened
+                since = event.get('time', since)
+                events.put(event)
+        except Exception as e:
+            logger.error(e)
+            time.sleep(1)
 
 
 def connect_to_db():
@@ -67,11 +136,14 @@ def connect_to_db():
     logger.info("connected to database")
 
 
-def handle_docker_event():
-    # connect to docker server
-    global docker_client
-    docker_client = docker.from_env()
-    logger.info("connected to docker")
+def handle_docker_event(invalidation_queue: multiprocessing.queues.Queue | None = None):
+    global invalidations
+    invalidations = invalidation_queue
+
+    # connect to docker servers
+    global docker_hosts
+    docker_hosts = load_docker_hosts()
+    logger.info("connected to docker hosts %s", ", ".join(docker_hosts))
 
     # initialize database and repository
     global kernel_repository
@@ -81,6 +153,20 @@ def handle_docker_event():
     # cleanup resources on exit
     signal.signal(signal.SIGTERM, cleanup)
 
+    # subscribe before reconciling so that no event is missed in between
+    events = queue.Queue()
+    for host in docker_hosts.values():
+        threading.Thread(target=read_events, args=(host, events), daemon=True, name=f"docker-events-{host.name}").start()
+    reconcile()
+
     # listen for events
-    for event in docker_client.api.events():
-        handle_event(event)
+    pending = {}
+    last_flush = time.monotonic()
+    while True:
+        try:
+            handle_event(events.get(timeout=FLUSH_INTERVAL), pending)
+        except queue.Empty:
+            pass
+        if len(pending) >= BATCH_SIZE or time.monotonic() - last_flush >= FLUSH_INTERVAL:
+            flush(pending)
+            last_flush = time.monotonic()
@@ -0,0 +1,43 @@
+import os
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import docker
+
+LOCAL_HOST = "local"
+
+
+class DockerHost:
+    """A docker daemon kernels can be placed on"""
+
+    def __init__(self, name: str, base_url: Optional[str] = None):
+        self.name = name
+        self.base_url = base_url
+        # published ports of a remote daemon are reached through its hostname,
+        # local containers keep using their network gateway
+        self.address = urlparse(base_url).hostname if base_url and base_url.startswith(("tcp://", "ssh://")) else None
+        self.client = self.connect()
+
+    def connect(self, **kwargs) -> docker.DockerClient:
+        if self.base_url is None:
+            return docker.from_env(**kwargs)
+        return docker.DockerClient(base_url=self.base_url, **kwargs)
+
+
+def load_docker_hosts() -> Dict[str, DockerHost]:
+    """
+    Reads DOCKER_HOSTS, a comma separated list of name=base_url pairs, e.g.
+    "a=tcp://10.0.0.2:2375,b=tcp://10.0.0.3:2375". Falls back to the docker daemon
+    configured in the environment when it is not set.
+    """
+    config = os.getenv("DOCKER_HOSTS", "").strip()
+    if not config:
+        return {LOCAL_HOST: DockerHost(LOCAL_HOST)}
+
+    hosts = {}
+    for entry in config.split(","):
+        name, _, base_url = entry.strip().partition("=")
+        if not base_url:
+            raise Exception(f"invalid DOCKER_HOSTS entry '{entry}', expected name=base_url")
+        hosts[name] = DockerHost(name, base_url)
+    return hosts
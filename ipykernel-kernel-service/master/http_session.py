@@ -0,0 +1,29 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) timeout of every outgoing request
+TIMEOUT = (5, 30)
+
+
+def create_session(retries: int = 4, backoff_factor: float = 0.5, pool_size: int = 32) -> requests.Session:
+    """
+    Pooled session which retries requests that never reached the other side or were refused
+    for being overloaded, waiting an exponentially growing, jittered delay in between.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=retries,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=None,
+        backoff_factor=backoff_factor,
+        backoff_jitter=backoff_factor,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
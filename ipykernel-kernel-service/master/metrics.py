@@ -0,0 +1,67 @@
+import time
+from typing import Callable, Dict
+
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from starlette.requests import Request
+from starlette.responses import Response
+
+from master.logger import logger
+from master.models.kernel import KernelStatus
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent handling HTTP requests", ["method", "route", "status"]
+)
+KERNEL_EVENTS = Counter(
+    "kernel_lifecycle_events_total", "Kernel lifecycle transitions",
+    ["event"]  # allocated, pool_claimed, launched, launch_failed, launch_cancelled, registered, deleted, suspended, resumed
+)
+KERNEL_ALLOCATION_DURATION = Histogram(
+    "kernel_allocation_duration_seconds", "Time from allocating a kernel until it registered",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+)
+KERNEL_LAUNCH_DURATION = Histogram(
+    "kernel_launch_duration_seconds", "Time spent starting a kernel, along with its container if it needed one",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+)
+
+
+class KernelStatusCollector:
+    """Number of kernels by status, counted in the database when scraped"""
+
+    def __init__(self, count_by_status: Callable[[], Dict[KernelStatus, int]]):
+        self._count_by_status = count_by_status
+
+    def collect(self):
+        gauge = GaugeMetricFamily("kernels", "Kernels by status", labels=["status"])
+        try:
+            for status, count in self._count_by_status().items():
+                gauge.add_metric([status.value], count)
+        except Exception as e:
+            logger.error(f"Failed to count kernels: {e}")
+        yield gauge
+
+
+def register_kernel_status_collector(count_by_status: Callable[[], Dict[KernelStatus, int]]):
+    REGISTRY.register(KernelStatusCollector(count_by_status))
+
+
+async def track_request_duration(request: Request, call_next) -> Response:
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        HTTP_REQUEST_DURATION.labels(request.method, route_name(request), str(status_code)) \
+            .observe(time.perf_counter() - started)
+
+
+def route_name(request: Request) -> str:
+    # the route template keeps ids out of the labels
+    route = request.scope.get("route")
+    if route is not None:
+        return route.path
+    endpoint = request.scope.get("endpoint")
+    return endpoint.__name__ if endpoint is not None else "unmatched"
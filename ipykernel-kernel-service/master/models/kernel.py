@@ -9,7 +9,11 @@ from .model import PyObjectId
 
 class KernelStatus(str, Enum):
     STARTING = "starting"
+    POOLED = "pooled"
     RUNNING = "running"
+    # being snapshotted and stopped, a resume waits until it is suspended
+    SUSPENDING = "suspending"
+    SUSPENDED = "suspended"
     STOPPED = "stopped"
     ERROR = "error"
 
@@ -20,6 +24,12 @@ class KernelModel(BaseModel):
     container_image: str
     url: Optional[str] = None
     status: KernelStatus = KernelStatus.STARTING
+    pooled: bool = False
+    startup_time: Optional[float] = None
+    host: Optional[str] = None
+    cpu_limit: Optional[float] = None
+    memory_limit: Optional[int] = None
+    suspended_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
     class Config:
@@ -0,0 +1,75 @@
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from master.models.kernel import KernelModel
+
+
+class KernelCache:
+    """In-process read-through cache of kernel records with a time to live as a safety net"""
+
+    def __init__(self, ttl: float = 30.0, max_size: int = 4096):
+        self._ttl = ttl
+        self._max_size = max_size
+        self._kernels: Dict[str, Tuple[float, KernelModel]] = {}
+        # several kernels share a container
+        self._container_to_kernels: Dict[str, Set[str]] = {}
+        # kernels deleted within the ttl, a save racing their delete must not cache them again
+        self._deleted: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, kernel_id: str) -> Optional[KernelModel]:
+        with self._lock:
+            entry = self._kernels.get(kernel_id)
+            if entry is None:
+                return None
+            expires_at, kernel = entry
+            if expires_at < time.monotonic():
+                self._evict(kernel_id)
+                return None
+            return kernel.model_copy()
+
+    def put(self, kernel: KernelModel):
+        with self._lock:
+            if kernel.id in self._deleted:
+                return
+            if len(self._kernels) >= self._max_size and kernel.id not in self._kernels:
+                # dicts keep insertion order, drop the oldest entry
+                self._evict(next(iter(self._kernels)))
+            self._kernels[kernel.id] = (time.monotonic() + self._ttl, kernel.model_copy())
+            if kernel.container_id is not None:
+                self._container_to_kernels.setdefault(kernel.container_id, set()).add(kernel.id)
+
+    def invalidate(self, kernel_id: str):
+        with self._lock:
+            self._evict(kernel_id)
+
+    def forget(self, kernel_id: str):
+        """drop a deleted kernel and keep it out of the cache"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict(kernel_id)
+            # every tombstone lives for the ttl, the oldest ones come first
+            while self._deleted and next(iter(self._deleted.values())) < now:
+                del self._deleted[next(iter(self._deleted))]
+            self._deleted[kernel_id] = now + self._ttl
+
+    def invalidate_container(self, container_id: str):
+        with self._lock:
+            for kernel_id in self._container_to_kernels.pop(container_id, set()):
+                self._evict(kernel_id)
+
+    def clear(self):
+        with self._lock:
+            self._kernels.clear()
+            self._container_to_kernels.clear()
+            self._deleted.clear()
+
+    def _evict(self, kernel_id: str):
+        entry = self._kernels.pop(kernel_id, None)
+        if entry is not None and entry[1].container_id is not None:
+            kernel_ids = self._container_to_kernels.get(entry[1].container_id)
+            if kernel_ids is not None:
+                kernel_ids.discard(kernel_id)
+                if not kernel_ids:
+                    del self._container_to_kernels[entry[1].container_id]
@@ -1,40 +1,192 @@
-from typing import Optional, List
+from typing import Optional, List, Dict
 
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateMany
 from pymongo.collection import ObjectId
 
 import master.context as ctx
-from master.models.kernel import KernelModel
+from master.models.kernel import KernelModel, KernelStatus
+from master.repository.kernel_cache import KernelCache
+
+# fields returned by kernel listings
+SUMMARY_PROJECTION = {
+    "container_id": 1, "container_image": 1, "url": 1, "status": 1, "pooled": 1, "host": 1, "created_at": 1
+}
 
 
 class KernelRepository:
-    def __init__(self, collection_name="kernels"):
+    def __init__(self, collection_name="kernels", cache: Optional[KernelCache] = None):
         self._collection_name = collection_name
+        self._cache = cache or KernelCache()
+
+    def create_indexes(self):
+        ctx.database[self._collection_name].create_indexes([
+            IndexModel([("container_id", ASCENDING)]),
+            IndexModel([("status", ASCENDING), ("pooled", ASCENDING), ("created_at", ASCENDING)]),
+            IndexModel([("created_at", DESCENDING)])
+        ])
 
-    def save(self, kernel: KernelModel) -> KernelModel:
+    def save(self, kernel: KernelModel, fields: Optional[set[str]] = None) -> Optional[KernelModel]:
+        """
+        insert or update a kernel, with fields only those fields are written.
+        Returns None when the kernel was deleted meanwhile.
+        """
         if kernel.id is None:
             result = ctx.database[self._collection_name].insert_one(kernel.model_dump(by_alias=True, exclude={"id"}))
             kernel.id = str(result.inserted_id)
         else:
-            ctx.database[self._collection_name].update_one({"_id": ObjectId(kernel.id)},
-                                                           {"$set": kernel.model_dump(by_alias=True, exclude={"id"})},
-                                                           upsert=False)
+            document = kernel.model_dump(by_alias=True, exclude={"id"}, include=fields)
+            result = ctx.database[self._collection_name].update_one({"_id": ObjectId(kernel.id)},
+                                                                    {"$set": document},
+                                                                    upsert=False)
+            # matched rather than modified, writing the values a record already has modifies nothing
+            if result.matched_count == 0:
+                self._cache.invalidate(kernel.id)
+                return None
+            if fields is not None:
+                # the other fields of the model may be stale, the next get reads the record again
+                self._cache.invalidate(kernel.id)
+                return kernel
+        self._cache.put(kernel)
         return kernel
 
     def get(self, kernel_id: str) -> Optional[KernelModel]:
+        kernel = self._cache.get(kernel_id)
+        if kernel is not None:
+            return kernel
         result = ctx.database[self._collection_name].find_one({"_id": ObjectId(kernel_id)})
         if result is None:
             return None
-        return KernelModel(**result)
+        kernel = KernelModel(**result)
+        self._cache.put(kernel)
+        return kernel
+
+    async def get_async(self, kernel_id: str) -> Optional[KernelModel]:
+        kernel = self._cache.get(kernel_id)
+        if kernel is not None:
+            return kernel
+        result = await ctx.async_database[self._collection_name].find_one({"_id": ObjectId(kernel_id)})
+        if result is None:
+            return None
+        kernel = KernelModel(**result)
+        self._cache.put(kernel)
+        return kernel
+
+    def exists(self, kernel_id: str) -> bool:
+        """whether the kernel's record is still there, without the cache"""
+        return ctx.database[self._collection_name].count_documents({"_id": ObjectId(kernel_id)}, limit=1) > 0
 
     def delete(self, kernel_id: str) -> bool:
+        self._cache.forget(kernel_id)
         result = ctx.database[self._collection_name].delete_one({"_id": ObjectId(kernel_id)})
         return result.deleted_count > 0
 
-    def get_all(self) -> List[KernelModel]:
-        return [KernelModel(**record) for record in list(ctx.database[self._collection_name].find())]
+    def get_all(self, skip: int = 0, limit: int = 100) -> List[KernelModel]:
+        cursor = ctx.database[self._collection_name].find(
+            projection=SUMMARY_PROJECTION, sort=[("created_at", DESCENDING)], skip=skip, limit=limit
+        )
+        return [KernelModel(**record) for record in cursor]
+
+    async def get_all_async(self, skip: int = 0, limit: int = 100) -> List[KernelModel]:
+        cursor = ctx.async_database[self._collection_name].find(
+            projection=SUMMARY_PROJECTION, sort=[("created_at", DESCENDING)], skip=skip, limit=limit
+        )
+        return [KernelModel(**record) async for record in cursor]
+
+    def invalidate(self, kernel_id: Optional[str] = None, container_id: Optional[str] = None):
+        """drop cached kernels which were changed outside of this repository"""
+        if kernel_id is not None:
+            self._cache.invalidate(kernel_id)
+        if container_id is not None:
+            self._cache.invalidate_container(container_id)
 
-    def find_kernel_by_container_id(self, container_id: str) -> Optional[KernelModel]:
-        result = ctx.database[self._collection_name].find_one({"container_id": container_id})
+    def transition_status(self, kernel_id: str, from_status: KernelStatus, to_status: KernelStatus, **fields) -> bool:
+        """
+        change the status, along with fields, only if the kernel is still in from_status,
+        so that one caller wins a race
+        """
+        result = ctx.database[self._collection_name].update_one(
+            {"_id": ObjectId(kernel_id), "status": from_status.value},
+            {"$set": {"status": to_status.value, **fields}}
+        )
+        self._cache.invalidate(kernel_id)
+        return result.modified_count > 0
+
+    def find_by_status(self, status: KernelStatus) -> List[KernelModel]:
+        return [KernelModel(**record) for record in ctx.database[self._collection_name].find({"status": status.value})]
+
+    def find_by_container_id(self, container_id: str) -> List[KernelModel]:
+        """all kernels hosted by a container"""
+        return [KernelModel(**record) for record in
+                ctx.database[self._collection_name].find({"container_id": container_id})]
+
+    def find_container_with_room(self, host: str, kernels_per_container: int) -> Optional[str]:
+        """
+        the fullest running container on the host which still hosts fewer than kernels_per_container kernels,
+        suspended kernels keep their place in the container they are resumed in
+        """
+        active = [KernelStatus.STARTING.value, KernelStatus.POOLED.value, KernelStatus.RUNNING.value]
+        for record in ctx.database[self._collection_name].aggregate([
+            {"$match": {"host": host, "container_id": {"$ne": None},
+                        "status": {"$in": active + [KernelStatus.SUSPENDING.value, KernelStatus.SUSPENDED.value]}}},
+            {"$group": {
+                "_id": "$container_id",
+                "kernels": {"$sum": 1},
+                "active": {"$sum": {"$cond": [{"$in": ["$status", active]}, 1, 0]}}
+            }},
+            # a container whose kernels are all suspended is stopped
+            {"$match": {"kernels": {"$lt": kernels_per_container}, "active": {"$gt": 0}}},
+            {"$sort": {"kernels": -1}},
+            {"$limit": 1}
+        ]):
+            return record["_id"]
+        return None
+
+    def count_by_status(self) -> Dict[KernelStatus, int]:
+        counts = {status: 0 for status in KernelStatus}
+        for record in ctx.database[self._collection_name].aggregate([
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]):
+            counts[KernelStatus(record["_id"])] = record["count"]
+        return counts
+
+    def count_pooled(self) -> int:
+        return ctx.database[self._collection_name].count_documents({
+            "pooled": True,
+            "status": {"$in": [KernelStatus.STARTING.value, KernelStatus.POOLED.value]}
+        })
+
+    def claim_pooled(self) -> Optional[KernelModel]:
+        """atomically take the oldest booted pool kernel out of the pool"""
+        result = ctx.database[self._collection_name].find_one_and_update(
+            {"pooled": True, "status": KernelStatus.POOLED.value},
+            {"$set": {"pooled": False, "status": KernelStatus.RUNNING.value}},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
         if result is None:
             return None
-        return KernelModel(**result)
+        kernel = KernelModel(**result)
+        self._cache.put(kernel)
+        return kernel
+
+    def find_active(self, require_container: bool = True) -> List[KernelModel]:
+        """kernels which are expected to have a live container"""
+        query = {"status": {"$in": [KernelStatus.STARTING.value, KernelStatus.POOLED.value, KernelStatus.RUNNING.value]}}
+        if require_container:
+            query["container_id"] = {"$ne": None}
+        return [KernelModel(**record) for record in ctx.database[self._collection_name].find(query)]
+
+    def bulk_update_status(self, statuses: Dict[str, KernelStatus]) -> int:
+        """set the status of many kernels at once, keyed by the container id they share"""
+        if not statuses:
+            return 0
+        result = ctx.database[self._collection_name].bulk_write([
+            # suspended kernels are stopped on purpose, their container dying is expected
+            UpdateMany({"container_id": container_id,
+                        "status": {"$nin": [KernelStatus.SUSPENDING.value, KernelStatus.SUSPENDED.value]}},
+                       {"$set": {"status": status.value}})
+            for container_id, status in statuses.items()
+        ], ordered=False)
+        for container_id in statuses:
+            self._cache.invalidate_container(container_id)
+        return result.modified_count
@@ -1,19 +1,28 @@
-from typing import Dict, Any, List
+import hashlib
+import json
+import logging
+import os
+import uuid
+from typing import Dict, List, Optional, Tuple
 
 from graph_processor import NodeScheduler
 
 
 class CodeGenerator:
-    def __init__(self, node_scheduler: NodeScheduler):
+    def __init__(self, node_scheduler: NodeScheduler, working_dir: str = "."):
         self.func_to_output_map = {
             "dataSource": ["df"],
             "join": ["df_merged"],
             "rename": ["df_rename"],
             "filter": ["df_filter"],
-            "linearRegression": ["lin_reg"]
+            "linearRegression": ["lin_reg"],
+            "regressionSweep": ["sweep"]
         }
         self.node_to_var_map = {}
         self.node_scheduler = node_scheduler
+        # data source files are relative to the working directory of the kernel, not to the server's
+        self.working_dir = working_dir
+        self.fingerprints = {}
 
     def generate_code(self, node: dict) -> str:
         code: str = ""
@@ -119,12 +128,85 @@ class CodeGenerator:
             else:
                 self.node_to_var_map[node_id] = [var_name]
 
-        return code
+        if node["type"] == "regressionSweep":
+            df_var = self.node_to_var_map[
+                self.node_scheduler.num_to_node_id_map[
+                    self.node_scheduler.dependencies[self.node_scheduler.node_to_num_map[node_id]][0]]][
+                0]
+            var_name = self.get_model_var(node_id)
+            data = node["data"]
+            test_sizes = [test_size / 100.0 for test_size in data.get("sweep/testSizes") or [20]]
+            alphas = [float(alpha) for alpha in data.get("sweep/alphas") or [0]]
 
-    def get_inference_code(self, source_node_id, inputs: List[Any]):
-        var_name = self.func_to_output_map["linearRegression"][
-                       0] + f"_{self.node_scheduler.dependencies[self.node_scheduler.node_to_num_map[source_node_id]][0]}"
+            code += f"{var_name} = preprocessing.HyperparameterSweep.regression({df_var}, {data['x']!r}, " \
+                    f"{data['y']!r}, {test_sizes!r}, {alphas!r}, {bool(data.get('sweep/featureSubsets'))}, " \
+                    f"{data.get('sweep/mode') or 'grid'!r}, {int(data.get('sweep/samples') or 10)}, " \
+                    f"{int(data.get('sweep/seed') or 0)})\n"
+            code += f"print(preprocessing.HyperparameterSweep.report({var_name}))\n"
+
+            if node_id in self.node_to_var_map:
+                if var_name not in self.node_to_var_map[node_id]:
+                    self.node_to_var_map[node_id].append(var_name)
+            else:
+                self.node_to_var_map[node_id] = [var_name]
 
-        code = f"prediction = preprocessing.Inference.infer({var_name}, {str(inputs)})\n"
-        code += f"print(prediction)"
         return code
+
+    def get_model_var(self, node_id: str) -> str:
+        """the variable the model of a regression node is kept in, named after the node's input"""
+        node_type = self.node_scheduler.nodes[self.node_scheduler.node_to_num_map[node_id]]["type"]
+        return self.func_to_output_map[node_type][0] + \
+            f"_{self.node_scheduler.dependencies[self.node_scheduler.node_to_num_map[node_id]][0]}"
+
+    def get_preview_code(self, source_node_id: str, path: str, offset: int, limit: int,
+                         columns: Optional[List[str]], sort: List[Tuple[str, bool]]) -> str:
+        # planning the graph again names the variable the output of the node was stored in
+        for idx in self.node_scheduler.get_execution_order():
+            self.generate_code(self.node_scheduler.nodes[idx])
+        var_name = self.node_to_var_map[source_node_id][0]
+
+        # the row count travels in the schema metadata of the file, nothing is left in the namespace
+        return f"preprocessing.Preview.write_arrow({var_name}, {path!r}, {offset}, {limit}, {columns!r}, {sort!r})"
+
+    def get_fingerprint(self, node_id: str) -> str:
+        """identifies the output of a node by its own settings, its data file and the fingerprints of its inputs"""
+        if node_id in self.fingerprints:
+            return self.fingerprints[node_id]
+        num = self.node_scheduler.node_to_num_map[node_id]
+        node = self.node_scheduler.nodes[num]
+        parts = [node["type"], node.get("data", {})]
+        if node["type"] == "dataSource":
+            try:
+                stat = os.stat(os.path.join(self.working_dir, node["data"]["file"]))
+                parts.append([stat.st_size, stat.st_mtime_ns])
+            except OSError as e:
+                # without the size and modification time a changed file can't be told apart, never reuse
+                logging.warning(f"Statistics of {node_id} are not cached: {e}")
+                parts.append(uuid.uuid4().hex)
+        parts += [self.get_fingerprint(self.node_scheduler.num_to_node_id_map[dep])
+                  for dep in self.node_scheduler.dependencies[num]]
+        fingerprint = hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+        self.fingerprints[node_id] = fingerprint
+        return fingerprint
+
+    def get_statistics_code(self, node_ids: List[str]) -> str:
+        """statistics of the outputs of nodes which were generated, in execution order"""
+        plan = []
+        for node_id in node_ids:
+            num = self.node_scheduler.node_to_num_map[node_id]
+            node = self.node_scheduler.nodes[num]
+            if node["type"] not in ("dataSource", "rename", "join", "filter"):
+                continue
+            dependencies = self.node_scheduler.dependencies[num]
+            parent = self.get_fingerprint(self.node_scheduler.num_to_node_id_map[dependencies[0]]) \
+                if len(dependencies) == 1 else None
+            detail = {"from": node["data"]["from"], "to": node["data"]["to"]} if node["type"] == "rename" else {}
+            plan.append((node_id, self.get_fingerprint(node_id), self.node_to_var_map[node_id][0], node["type"],
+                         parent, detail))
+        return f"print(preprocessing.Statistics.report(globals(), {plan!r}))"
+
+    def get_inference_code(self, source_node_id, inputs_path: str, outputs_path: str):
+        var_name = self.get_model_var(source_node_id)
+
+        # the inputs and predictions are exchanged as .npy files, the cell stays the same size for any batch
+        return f"preprocessing.Inference.infer({var_name}, {inputs_path!r}, {outputs_path!r})\n"
@@ -0,0 +1,84 @@
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+import zmq
+
+
+class HeartbeatMonitor:
+    """Pings the kernel heartbeat channel on a schedule and caches the latest result"""
+
+    def __init__(self, context: zmq.Context, address: str, interval: float = 5.0, timeout: float = 1.0):
+        self._context = context
+        self._address = address
+        self._interval = interval
+        self._timeout_ms = int(timeout * 1000)
+        self._socket: Optional[zmq.Socket] = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._status = {
+            "alive": False,
+            "latency_ms": None,
+            "last_checked": None,
+            "last_seen": None,
+            "consecutive_failures": 0,
+        }
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="heartbeat-monitor")
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self._interval + self._timeout_ms / 1000)
+            self._thread = None
+
+    def status(self) -> dict:
+        with self._lock:
+            return dict(self._status)
+
+    def _connect(self):
+        if self._socket is not None:
+            self._socket.close(linger=0)
+        self._socket = self._context.socket(zmq.DEALER)
+        self._socket.connect(self._address)
+
+    def _ping(self) -> Optional[float]:
+        """returns the round trip time in milliseconds, None if the kernel did not answer in time"""
+        message = b"ping"
+        started = time.perf_counter()
+        self._socket.send(message)
+        if not self._socket.poll(self._timeout_ms, zmq.POLLIN):
+            # drop the socket so that a late reply is not mistaken for the next one
+            self._connect()
+            return None
+        reply = self._socket.recv()
+        if reply != message:
+            return None
+        return (time.perf_counter() - started) * 1000
+
+    def _run(self):
+        self._connect()
+        while not self._stop_event.is_set():
+            try:
+                latency = self._ping()
+            except zmq.ZMQError:
+                self._connect()
+                latency = None
+            now = datetime.utcnow().isoformat()
+            with self._lock:
+                self._status["alive"] = latency is not None
+                self._status["latency_ms"] = latency
+                self._status["last_checked"] = now
+                if latency is None:
+                    self._status["consecutive_failures"] += 1
+                else:
+                    self._status["last_seen"] = now
+                    self._status["consecutive_failures"] = 0
+            self._stop_event.wait(self._interval)
+        self._socket.close(linger=0)
+        self._socket = None
@@ -1,12 +1,17 @@
 import os
+import random
+import threading
+import time
 from typing import Optional
-from multiprocessing.connection import Client
+from multiprocessing.connection import Connection
 
 import requests
 from ipykernel.kernelapp import IPKernelApp
 import sys
 import signal
 
+from tracing import CellTracer, setup_tracing
+
 __stdout__ = sys.stdout
 configuration_file: Optional[str] = None
 
@@ -21,19 +26,25 @@ del sys
 del importlib
 """
 
+# every kernel keeps its snapshot in a directory named after it
+SNAPSHOT_DIR = os.getenv("KERNEL_SNAPSHOT_DIR", "/snapshot")
+REGISTER_ATTEMPTS = int(os.getenv("KERNEL_REGISTER_ATTEMPTS", "8"))
+
 
 class MLBlockKernel(IPKernelApp):
     no_stdout = True
     kernel_name = "MLBlock"
     description = "MLBlocks interactive kernel"
     version = "0.0.1.SNAPSHOT"
-    hb_port = int(os.getenv("KERNEL_HB_PORT", "6004"))
-    iopub_port = int(os.getenv("KERNEL_IOPUB_PORT", "6003"))
-    stdin_port = int(os.getenv("KERNEL_STDIN_PORT", "6002"))
-    control_port = int(os.getenv("KERNEL_CONTROL_PORT", "6001"))
-    shell_port = int(os.getenv("KERNEL_SHELL_PORT", "6000"))
+    # ports of 0 are picked at random when binding and written to the connection file,
+    # several kernels share the slave container
+    hb_port = 0
+    iopub_port = 0
+    stdin_port = 0
+    control_port = 0
+    shell_port = 0
     ip = "127.0.0.1"
-    connection_file = "config.json"
+    snapshot_dir = SNAPSHOT_DIR
 
     def initialize(self, argv=[]):
         super().initialize(argv)
@@ -43,6 +54,12 @@ class MLBlockKernel(IPKernelApp):
         self.shell.run_cell(
             preprocessing_import, store_history=False
         )
+        # bring back the namespace of a suspended kernel before registering again
+        self.shell.run_cell(
+            f"preprocessing.Snapshot.restore(globals(), {self.snapshot_dir!r})", store_history=False
+        )
+        # registered last, the setup cells above carry no trace context anyway
+        CellTracer(self.kernel).register(self.shell)
 
 
 def close(signum, _):
@@ -51,42 +68,61 @@ def close(signum, _):
     exit(signum)
 
 
-def ping_master(app: IPKernelApp, kernel_id: str, master_host: str):
-    """notify the master about kernel initialization"""
-    # TODO: implement retry policy
-    response = requests.post(f"{master_host}/internal/register/{kernel_id}", json={
-        "version": app.version,
-        "callback": os.getenv("CALLBACK_URL"),
-        "token": os.getenv("AUTH_TOKEN")
-    })
-
-    if response.status_code != 200:
-        exit(2)
-
-
-def get_kernel_id():
-    kernel_id = os.getenv("KERNEL_ID")
-    if kernel_id is not None:
-        return kernel_id
-
-    if len(sys.argv) < 2:
-        print("Usage: %s kernel_id" % sys.argv[0])
-        exit(1)
-
-    return sys.argv[1]
-
-
-def main():
-    ipc_client = Client(address=('localhost', 7000), authkey=b'password')
-    kernel_id = get_kernel_id()
-    app = MLBlockKernel.instance()
+def get_startup_time(requested_at: float) -> float:
+    """seconds elapsed since the slave was asked to start the kernel"""
+    return time.time() - requested_at
+
+
+def prewarm_imports():
+    """import the heavy libraries in the background once the kernel is registered"""
+    def _import():
+        import pandas  # noqa
+        import matplotlib
+        matplotlib.use("Agg")
+
+    threading.Thread(target=_import, daemon=True, name="prewarm-imports").start()
+
+
+def ping_master(app: IPKernelApp, kernel_id: str, master_host: str, callback: Optional[str], token: Optional[str],
+                startup_time: float):
+    """notify the master about kernel initialization, retrying with a jittered exponential backoff"""
+    print(f"kernel {kernel_id} registering after {startup_time:.3f}s", file=__stdout__)
+    for attempt in range(REGISTER_ATTEMPTS):
+        try:
+            response = requests.post(f"{master_host}/internal/register/{kernel_id}", timeout=(5, 30), json={
+                "version": app.version,
+                "callback": callback,
+                "token": token,
+                "startup_time": startup_time
+            })
+            if response.status_code == 200:
+                return
+            if response.status_code == 404:
+                # the master doesn't know this kernel, retrying won't help
+                break
+            error = f"status code {response.status_code}"
+        except requests.RequestException as e:
+            error = str(e)
+        delay = min(0.5 * 2 ** attempt, 10) * random.uniform(0.5, 1)
+        print(f"kernel {kernel_id} failed to register ({error}), retrying in {delay:.2f}s", file=__stdout__)
+        time.sleep(delay)
+
+    exit(2)
+
+
+def main(conn: Connection, kernel_id: str, connection_file: str, working_dir: str, snapshot_dir: str,
+         callback: Optional[str], token: Optional[str], requested_at: float):
+    global configuration_file
+    os.chdir(working_dir)
+    setup_tracing("mlblock-kernel")
+    configuration_file = connection_file
+    MLBlockKernel.snapshot_dir = snapshot_dir
+    app = MLBlockKernel.instance(connection_file=connection_file)
     app.initialize()
-    ipc_client.send('config')
-    ipc_client.close()
-    ping_master(app, kernel_id, os.getenv("KERNEL_MASTER_HOST", "host.docker.internal"))
+    conn.send('config')
+    conn.close()
+    ping_master(app, kernel_id, os.getenv("KERNEL_MASTER_HOST", "host.docker.internal"), callback, token,
+                get_startup_time(requested_at))
+    prewarm_imports()
     signal.signal(signal.SIGQUIT, close)
     app.start()
-
-
-if __name__ == "__main__":
-    main()
@@ -0,0 +1,203 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+from multiprocessing import get_context
+from multiprocessing.process import BaseProcess
+from typing import Dict, List, Optional
+
+from zmq import Context
+
+import kernel as kernel_process
+from heartbeat import HeartbeatMonitor
+from tracing import TracingKernelClient
+
+WORKSPACE_ROOT = os.getenv("KERNEL_WORKSPACE_ROOT", os.getcwd())
+RUNTIME_DIR = os.getenv("KERNEL_RUNTIME_DIR", "/root/.local/share/jupyter/runtime")
+START_TIMEOUT = float(os.getenv("KERNEL_START_TIMEOUT", "60"))
+HEARTBEAT_INTERVAL = float(os.getenv("HEARTBEAT_INTERVAL", "5"))
+HEARTBEAT_TIMEOUT = float(os.getenv("HEARTBEAT_TIMEOUT", "1"))
+KERNEL_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+# kernels are started while the server runs threads, fork them from a clean process instead,
+# which has ipykernel imported already
+_processes = get_context("forkserver")
+_processes.set_forkserver_preload(["kernel"])
+
+
+class NoCapacityError(Exception):
+    pass
+
+
+class Kernel:
+    """One ipykernel hosted by the slave, with its own ports, connection file, working directory and snapshot"""
+
+    def __init__(self, kernel_id: str, root: str = WORKSPACE_ROOT, snapshot_root: str = kernel_process.SNAPSHOT_DIR,
+                 runtime_dir: str = RUNTIME_DIR):
+        self.id = kernel_id
+        self.working_dir = os.path.join(root, kernel_id)
+        # the directory the filesystem endpoints currently look at, inside the working directory
+        self.cwd = self.working_dir
+        self.snapshot_dir = os.path.join(snapshot_root, kernel_id)
+        self.connection_file = os.path.join(runtime_dir, f"kernel-{kernel_id}.json")
+        self.process: Optional[BaseProcess] = None
+        self.client = TracingKernelClient()
+        self.heartbeat_monitor: Optional[HeartbeatMonitor] = None
+        self.started_on = datetime.utcnow()
+        self.last_activity = self.started_on
+        self.dataset_schema_database: Dict[str, list] = {}
+        self.dataset_viz_database: Dict[str, list] = {}
+
+    def start(self, context: Context, callback: Optional[str], token: Optional[str], timeout: float = START_TIMEOUT):
+        os.makedirs(self.working_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(self.connection_file), exist_ok=True)
+        # ipykernel would reuse the ports of a connection file left behind by a crash
+        if os.path.exists(self.connection_file):
+            os.remove(self.connection_file)
+        receiver, sender = _processes.Pipe(duplex=False)
+        # not a daemon, daemonic processes can't start worker processes of their own (the regression sweep),
+        # the registry kills its kernels when the server stops
+        self.process = _processes.Process(
+            target=kernel_process.main, daemon=False, name=f"mlblock-kernel-{self.id}",
+            args=(sender, self.id, self.connection_file, self.working_dir, self.snapshot_dir, callback, token,
+                  time.time())
+        )
+        self.process.start()
+        sender.close()
+        try:
+            # the kernel picks free ports and writes them to its connection file before it reports back
+            if not receiver.poll(timeout):
+                raise TimeoutError(f"kernel {self.id} did not start within {timeout}s")
+            receiver.recv()
+        except EOFError:
+            raise RuntimeError(f"kernel {self.id} exited with code {self.process.exitcode} while starting")
+        finally:
+            receiver.close()
+
+        self.client.load_connection_file(self.connection_file)
+        self.client.start_channels()
+        self.restore_datasets()
+        self.heartbeat_monitor = HeartbeatMonitor(
+            context, f"tcp://{self.client.ip}:{self.client.hb_port}",
+            interval=HEARTBEAT_INTERVAL, timeout=HEARTBEAT_TIMEOUT
+        )
+        self.heartbeat_monitor.start()
+
+    def stop(self, keep_snapshot: bool = False):
+        """kill the kernel, its snapshot and working directory survive for it to be started again"""
+        if self.heartbeat_monitor is not None:
+            self.heartbeat_monitor.stop()
+        if self.client.channels_running:
+            self.client.stop_channels()
+        if self.process is not None and self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=5)
+        if os.path.exists(self.connection_file):
+            os.remove(self.connection_file)
+        if not keep_snapshot:
+            shutil.rmtree(self.snapshot_dir, ignore_errors=True)
+            shutil.rmtree(self.working_dir, ignore_errors=True)
+
+    def touch(self):
+        self.last_activity = datetime.utcnow()
+
+    def resolve(self, path: str) -> str:
+        """absolute path of a file the filesystem endpoints name, which must stay inside the working directory"""
+        resolved = os.path.realpath(os.path.join(self.cwd, path))
+        working_dir = os.path.realpath(self.working_dir)
+        if resolved != working_dir and not resolved.startswith(working_dir + os.sep):
+            raise PermissionError(f"{path} is outside of the working directory")
+        return resolved
+
+    def health(self) -> dict:
+        heartbeat = self.heartbeat_monitor.status() if self.heartbeat_monitor is not None else {
+            "alive": False, "latency_ms": None, "last_checked": None, "last_seen": None
+        }
+        return {
+            "server": "ok",
+            "kernel_id": self.id,
+            "ipykernel": {
+                "process_alive": self.process.is_alive() if self.process is not None else False,
+                "heartbeat": heartbeat["alive"],
+                "heartbeat_latency_ms": heartbeat["latency_ms"],
+                "heartbeat_checked_at": heartbeat["last_checked"],
+                "heartbeat_last_seen": heartbeat["last_seen"],
+                "exitcode": self.process.exitcode if self.process is not None else None,
+            },
+            "started_on": self.started_on.isoformat(),
+            "last_activity": self.last_activity.isoformat(),
+        }
+
+    def save_datasets(self):
+        with open(os.path.join(self.snapshot_dir, "datasets.json"), "w") as fp:
+            json.dump({"schema": self.dataset_schema_database, "viz": self.dataset_viz_database}, fp)
+
+    def restore_datasets(self):
+        datasets_file = os.path.join(self.snapshot_dir, "datasets.json")
+        if not os.path.exists(datasets_file):
+            return
+        with open(datasets_file) as fp:
+            datasets = json.load(fp)
+        self.dataset_schema_database.update(datasets["schema"])
+        self.dataset_viz_database.update(datasets["viz"])
+        os.remove(datasets_file)
+
+
+class KernelRegistry:
+    """The kernels of this slave by id, at most max_kernels of them"""
+
+    def __init__(self, max_kernels: int):
+        self._max_kernels = max_kernels
+        self._kernels: Dict[str, Kernel] = {}
+        self._context = Context()
+        self._lock = threading.Lock()
+
+    def add(self, kernel: Kernel) -> Kernel:
+        with self._lock:
+            if kernel.id in self._kernels:
+                return self._kernels[kernel.id]
+            if len(self._kernels) >= self._max_kernels:
+                raise NoCapacityError(f"the slave already hosts {self._max_kernels} kernel(s)")
+            self._kernels[kernel.id] = kernel
+            return kernel
+
+    def start(self, kernel_id: str, callback: Optional[str] = None, token: Optional[str] = None) -> Kernel:
+        """start a kernel, or return it if it runs already"""
+        if not KERNEL_ID_PATTERN.fullmatch(kernel_id):
+            raise ValueError(f"invalid kernel id {kernel_id}")
+        kernel = Kernel(kernel_id)
+        registered = self.add(kernel)
+        if registered is not kernel:
+            return registered
+        try:
+            kernel.start(self._context, callback, token)
+        except Exception:
+            with self._lock:
+                self._kernels.pop(kernel_id, None)
+            kernel.stop(keep_snapshot=True)
+            raise
+        return kernel
+
+    def get(self, kernel_id: str) -> Optional[Kernel]:
+        with self._lock:
+            return self._kernels.get(kernel_id)
+
+    def list(self) -> List[Kernel]:
+        with self._lock:
+            return list(self._kernels.values())
+
+    def stop(self, kernel_id: str, keep_snapshot: bool = False) -> bool:
+        with self._lock:
+            kernel = self._kernels.pop(kernel_id, None)
+        if kernel is None:
+            return False
+        kernel.stop(keep_snapshot)
+        return True
+
+    def stop_all(self):
+        # a container being stopped keeps everything for its kernels to be started again
+        for kernel in self.list():
+            self.stop(kernel.id, keep_snapshot=True)
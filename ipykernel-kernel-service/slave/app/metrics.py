@@ -0,0 +1,38 @@
+import time
+
+from prometheus_client import Histogram
+from starlette.requests import Request
+from starlette.responses import Response
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent handling HTTP requests", ["method", "route", "status"]
+)
+NODE_EXECUTION_DURATION = Histogram(
+    "node_execution_duration_seconds", "Time the kernel spent executing the cell of a graph node",
+    ["node_type", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20)
+)
+INFERENCE_DURATION = Histogram(
+    "inference_duration_seconds", "Time the kernel spent running an inference", ["status"]
+)
+
+
+async def track_request_duration(request: Request, call_next) -> Response:
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        HTTP_REQUEST_DURATION.labels(request.method, route_name(request), str(status_code)) \
+            .observe(time.perf_counter() - started)
+
+
+def route_name(request: Request) -> str:
+    # the route template keeps file names and node ids out of the labels
+    route = request.scope.get("route")
+    if route is not None:
+        return route.path
+    endpoint = request.scope.get("endpoint")
+    return endpoint.__name__ if endpoint is not None else "unmatched"
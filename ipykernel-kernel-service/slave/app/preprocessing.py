@@ -1,13 +1,20 @@
 import os
-
-import pandas as pd
+import json
+import types
+from collections import OrderedDict
 from functools import reduce
-from sklearn.model_selection import train_test_split, learning_curve, LearningCurveDisplay
-from sklearn.linear_model import LinearRegression
-import matplotlib.pyplot as plt
 import io
 import base64
-import numpy as np
+
+# pandas, numpy, sklearn and matplotlib are imported on first use so that loading this
+# module does not delay the kernel registering with the master
+
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
 
 
 class DataSource:
@@ -17,17 +24,133 @@ class DataSource:
         if ext not in ('.csv', '.json'):
             raise Exception(f"invalid file extension {ext}")
 
-        df: pd.DataFrame | None = None
+        if SharedDatasets.enabled():
+            df = SharedDatasets.load(filename, DataSource.read)
+        else:
+            df = DataSource.read(filename)
 
+        return df, df is not None
+
+    @staticmethod
+    def read(filename: str):
+        import pandas as pd
+
+        _, ext = os.path.splitext(filename)
         if ext == '.csv':
-            df = pd.read_csv(filename)
-        elif ext == '.json':
-            try:
-                df = pd.read_json(filename)
-            except ValueError:
-                df = pd.read_json(filename, lines=True)
+            return pd.read_csv(filename)
+        try:
+            return pd.read_json(filename)
+        except ValueError:
+            return pd.read_json(filename, lines=True)
 
-        return df, df is not None
+
+class SharedDatasets:
+    """
+    Datasets parsed once per host and kept as uncompressed Arrow files in SHARED_DATASET_DIR, named after
+    a hash of the source file's content. Kernels memory map them, so every kernel of the host loading the
+    same file reads the same pages. Numeric columns without nulls are read-only views of the mapping,
+    copy-on-write makes the nodes downstream copy what they change instead of writing to it.
+    """
+
+    DIRECTORY = os.getenv("SHARED_DATASET_DIR")
+    # 0 keeps every dataset
+    MAX_BYTES = int(os.getenv("SHARED_DATASET_MAX_BYTES", "0"))
+    # file name, size and modification time to content hash, so that re-running a graph reads no file twice
+    _digests: dict = {}
+
+    @staticmethod
+    def enabled() -> bool:
+        return bool(SharedDatasets.DIRECTORY)
+
+    @staticmethod
+    def load(filename: str, read):
+        path = os.path.join(SharedDatasets.DIRECTORY, f"{SharedDatasets.digest(filename)}.arrow")
+        try:
+            df = SharedDatasets.attach(path)
+        except FileNotFoundError:
+            # not published yet, or evicted by another kernel in the meantime
+            df = SharedDatasets.publish(read(filename), path)
+        # only once it is mapped, the mapping stays readable whatever eviction removes
+        SharedDatasets.evict(keep=path)
+        return df
+
+    @staticmethod
+    def digest(filename: str) -> str:
+        import hashlib
+
+        st = os.stat(filename)
+        key = (os.path.realpath(filename), st.st_size, st.st_mtime_ns)
+        if key not in SharedDatasets._digests:
+            digest = hashlib.blake2b(digest_size=20)
+            with open(filename, "rb") as fp:
+                while chunk := fp.read(1024 * 1024):
+                    digest.update(chunk)
+            SharedDatasets._digests[key] = digest.hexdigest()
+        return SharedDatasets._digests[key]
+
+    @staticmethod
+    def publish(df, path: str):
+        """
+        write the dataset for the other kernels, the file appears under its name only once complete.
+        Returns the dataset attached from the file, mapped before it is visible to eviction.
+        """
+        import tempfile
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df)
+        fd, partial = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".partial")
+        try:
+            with os.fdopen(fd, "wb") as fp, pa.ipc.new_file(fp, table.schema) as writer:
+                writer.write_table(table)
+            attached = SharedDatasets.attach(partial)
+            # kernels publishing the same dataset at once write the same content, either one wins
+            os.replace(partial, path)
+        except BaseException:
+            os.remove(partial)
+            raise
+        return attached
+
+    @staticmethod
+    def attach(path: str):
+        import pandas as pd
+        import pyarrow as pa
+
+        if int(pd.__version__.split(".")[0]) < 3:
+            # always on from pandas 3
+            pd.set_option("mode.copy_on_write", True)
+        # the modification time tells eviction which datasets were used last
+        os.utime(path)
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        return table.to_pandas(split_blocks=True)
+
+    @staticmethod
+    def evict(keep: str | None = None):
+        """
+        remove the least recently used datasets beyond SHARED_DATASET_MAX_BYTES, mapped ones stay readable.
+        The dataset at keep, the one just loaded, stays even if it alone is larger.
+        """
+        if SharedDatasets.MAX_BYTES <= 0:
+            return
+        directory = SharedDatasets.DIRECTORY
+        datasets = []
+        for name in os.listdir(directory):
+            if name.endswith(".arrow"):
+                try:
+                    st = os.stat(os.path.join(directory, name))
+                except FileNotFoundError:
+                    continue
+                datasets.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in datasets)
+        for _, size, name in sorted(datasets):
+            if total <= SharedDatasets.MAX_BYTES:
+                break
+            if keep is not None and os.path.join(directory, name) == keep:
+                continue
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
 
 
 class DataModification:
@@ -44,6 +167,8 @@ class DataModification:
 
     @staticmethod
     def join_dataframe(df_list, field: str) -> ():
+        import pandas as pd
+
         try:
             df_merged = reduce(
                 lambda left, right: pd.merge(left, right, on=[field], how="outer"),
@@ -100,6 +225,10 @@ class MachineLearningAlgorithms:
         Multiple Linear Regression
         Show loss vs epoch and graph with regression line as output
         """
+        from sklearn.model_selection import train_test_split, learning_curve, LearningCurveDisplay
+        from sklearn.linear_model import LinearRegression
+
+        plt = _pyplot()
         x = df[x_cols].to_numpy().reshape(-1, 1)
         y = df[y_cols].to_numpy().reshape(-1, 1)
         X_train, X_test, y_train, y_test = train_test_split(x, y, test_size=test_size)  # noqa
@@ -134,7 +263,303 @@ class MachineLearningAlgorithms:
         }
 
 
+class HyperparameterSweep:
+    """
+    Fits a regression for every point of a parameter space on a pool of worker processes. The features and
+    the target are converted to arrays once, joblib hands them to the workers as read-only memory maps
+    instead of pickling a copy for every fit.
+    """
+
+    # 0 uses every cpu the kernel may use
+    MAX_WORKERS = int(os.getenv("SWEEP_MAX_WORKERS", "0"))
+
+    @staticmethod
+    def space(x_cols: list[str], test_sizes: list[float], alphas: list[float], feature_subsets: bool,
+              mode: str, samples: int, seed: int) -> list[dict]:
+        """the grid of test sizes, regularization strengths and feature sets, or a random sample of it"""
+        import itertools
+        from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+        features = [list(subset) for size in range(1, len(x_cols) + 1)
+                    for subset in itertools.combinations(x_cols, size)] if feature_subsets else [list(x_cols)]
+        grid = {"test_size": test_sizes, "alpha": alphas, "features": features}
+        if mode == "random":
+            return list(ParameterSampler(grid, n_iter=min(samples, len(ParameterGrid(grid))), random_state=seed))
+        return list(ParameterGrid(grid))
+
+    @staticmethod
+    def fit(x, y, x_cols: list[str], features: list[str], test_size: float, alpha: float, seed: int):
+        """runs in a worker, the model selects its features itself so that it takes every x column like the others"""
+        import time
+        from sklearn.compose import ColumnTransformer
+        from sklearn.linear_model import LinearRegression, Ridge
+        from sklearn.model_selection import train_test_split
+        from sklearn.pipeline import make_pipeline
+
+        started = time.perf_counter()
+        # the same seed splits every candidate with the same test size the same way
+        X_train, X_test, y_train, y_test = train_test_split(x, y, test_size=test_size, random_state=seed)  # noqa
+        select = ColumnTransformer([("features", "passthrough", [x_cols.index(name) for name in features])])
+        model = make_pipeline(select, Ridge(alpha=alpha) if alpha > 0 else LinearRegression())
+        model.fit(X_train, y_train)
+        return model, model.score(X_test, y_test), time.perf_counter() - started
+
+    @staticmethod
+    def regression(df, x_cols: list[str], y_col: str, test_sizes: list[float], alphas: list[float],
+                   feature_subsets: bool = False, mode: str = "grid", samples: int = 10, seed: int = 0):
+        """the best model and the leaderboard of every candidate, by R^2 on its test split"""
+        import math
+        import sys
+        import numpy as np
+        from joblib import Parallel, delayed, parallel_config
+
+        space = HyperparameterSweep.space(x_cols, test_sizes, alphas, feature_subsets, mode, samples, seed)
+        x = df[x_cols].to_numpy(dtype=np.float64)
+        y = df[[y_col]].to_numpy(dtype=np.float64)
+
+        # the workers import this module by name, the kernel loaded it from its path
+        directory = os.path.dirname(os.path.abspath(__file__))
+        if directory not in sys.path:
+            sys.path.append(directory)
+        # one BLAS thread per worker, the workers already use every cpu
+        with parallel_config(backend="loky", inner_max_num_threads=1):
+            fits = Parallel(n_jobs=HyperparameterSweep.MAX_WORKERS or -1, max_nbytes="1M", mmap_mode="r")(
+                delayed(HyperparameterSweep.fit)(x, y, x_cols, params["features"], params["test_size"],
+                                                 params["alpha"], seed)
+                for params in space
+            )
+
+        leaderboard = []
+        for params, (_, score, seconds) in zip(space, fits):
+            leaderboard.append({
+                "test_size": params["test_size"],
+                "alpha": params["alpha"],
+                "features": params["features"],
+                # a test split too small to score has no R^2
+                "score": None if math.isnan(score) else score,
+                "fit_seconds": seconds
+            })
+        order = sorted(range(len(fits)), key=lambda i: -math.inf if leaderboard[i]["score"] is None
+                       else leaderboard[i]["score"], reverse=True)
+        return fits[order[0]][0], {
+            "leaderboard": [leaderboard[i] for i in order],
+            "best": leaderboard[order[0]],
+            "score": leaderboard[order[0]]["score"],
+            "candidates": len(space)
+        }
+
+    @staticmethod
+    def report(sweep) -> str:
+        return json.dumps(sweep[1])
+
+
 class Inference:
     @staticmethod
-    def infer(model_detail, inputs):
-        return model_detail[0].predict(np.array(inputs).reshape(-1, 1))[0]
+    def infer(model_detail, inputs_path: str, outputs_path: str):
+        """predict the rows of the .npy file at inputs_path and save the predictions to outputs_path"""
+        import numpy as np
+
+        model = model_detail[0]
+        # memory mapped, the model reads the inputs straight from the buffer the slave wrote
+        inputs = np.load(inputs_path, mmap_mode="r")
+        np.save(outputs_path, model.predict(inputs.reshape(-1, model.n_features_in_)))
+
+
+class Preview:
+    @staticmethod
+    def write_arrow(df, path: str, offset: int, limit: int, columns: list[str] | None = None,
+                    sort: list[tuple[str, bool]] | None = None) -> int:
+        """write rows [offset, offset + limit) of a DataFrame to path as an Arrow IPC stream, returns the row count"""
+        import pandas as pd
+        import pyarrow as pa
+
+        if not isinstance(df, pd.DataFrame):
+            raise TypeError(f"the output is a {type(df).__name__}, not a DataFrame")
+        missing = [column for column in (columns or []) + [key for key, _ in sort or []] if column not in df.columns]
+        if missing:
+            raise ValueError(f"unknown columns {missing}")
+
+        if sort:
+            # only the sort keys are copied, the rest of the frame is sliced by position
+            keys = [key for key, _ in sort]
+            order = df[keys].reset_index(drop=True) \
+                .sort_values(keys, ascending=[ascending for _, ascending in sort], kind="stable") \
+                .index[offset:offset + limit]
+            rows = df.iloc[order]
+        else:
+            rows = df.iloc[offset:offset + limit]
+        if columns:
+            rows = rows[columns]
+
+        table = pa.Table.from_pandas(rows, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b"total_rows": str(len(df)).encode(),
+            b"offset": str(offset).encode()
+        })
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return len(df)
+
+
+class Statistics:
+    """column summaries of node outputs, computed on demand and cached by node fingerprint"""
+    CACHE_SIZE = int(os.getenv("STATISTICS_CACHE_SIZE", "128"))
+    cache: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def _number(value):
+        # NaN and infinities are not valid json
+        value = float(value)
+        return value if value == value and value not in (float("inf"), float("-inf")) else None
+
+    @staticmethod
+    def compute(df) -> dict:
+        import pandas as pd
+
+        columns = {}
+        for name in df.columns:
+            series = df[name]
+            nulls = int(series.isna().sum())
+            summary = {"dtype": str(series.dtype), "count": len(series) - nulls, "nulls": nulls}
+            if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                described = series.describe()
+                summary["distinct"] = int(series.nunique())
+                for key in ("mean", "std", "min", "25%", "50%", "75%", "max"):
+                    summary[key] = Statistics._number(described[key]) if nulls < len(series) else None
+            else:
+                counts = series.astype(str).where(series.notna()).value_counts()
+                summary["distinct"] = len(counts)
+                summary["top"] = counts.index[0] if len(counts) else None
+                summary["freq"] = int(counts.iloc[0]) if len(counts) else 0
+            columns[str(name)] = summary
+        return {"rows": len(df), "columns": columns}
+
+    @staticmethod
+    def empty(parent: dict) -> dict:
+        return {"rows": 0, "columns": {
+            name: {"dtype": summary["dtype"], "count": 0, "nulls": 0, "distinct": 0}
+            for name, summary in parent["columns"].items()
+        }}
+
+    @staticmethod
+    def derive(df, node_type: str, parent: dict | None, detail: dict) -> dict:
+        """reuse the statistics of the parent where the node cannot have changed them"""
+        if parent is not None and node_type == "rename" and detail["from"] in parent["columns"]:
+            columns = {detail["to"] if name == detail["from"] else name: summary
+                       for name, summary in parent["columns"].items()}
+            return {"rows": parent["rows"], "columns": columns}
+        if parent is not None and node_type == "filter":
+            # the filtered frame keeps the index of its parent, its length is the size of the mask
+            if len(df) == parent["rows"]:
+                return parent
+            if len(df) == 0:
+                return Statistics.empty(parent)
+        return Statistics.compute(df)
+
+    @staticmethod
+    def get(fingerprint: str) -> dict | None:
+        if fingerprint in Statistics.cache:
+            Statistics.cache.move_to_end(fingerprint)
+        return Statistics.cache.get(fingerprint)
+
+    @staticmethod
+    def put(fingerprint: str, statistics: dict):
+        Statistics.cache[fingerprint] = statistics
+        Statistics.cache.move_to_end(fingerprint)
+        while len(Statistics.cache) > Statistics.CACHE_SIZE:
+            Statistics.cache.popitem(last=False)
+
+    @staticmethod
+    def report(namespace: dict, plan: list) -> str:
+        """
+        statistics of the outputs in plan, as json by node id. plan lists the nodes in execution
+        order as (node id, fingerprint, variable, node type, parent fingerprint, detail)
+        """
+        import pandas as pd
+
+        report = {}
+        for node_id, fingerprint, var_name, node_type, parent_fingerprint, detail in plan:
+            statistics = Statistics.get(fingerprint)
+            if statistics is None:
+                df = namespace.get(var_name)
+                if not isinstance(df, pd.DataFrame):
+                    continue
+                parent = Statistics.get(parent_fingerprint) if parent_fingerprint is not None else None
+                statistics = Statistics.derive(df, node_type, parent, detail)
+                Statistics.put(fingerprint, statistics)
+            report[node_id] = statistics
+        return json.dumps(report)
+
+
+class Snapshot:
+    MANIFEST = "manifest.json"
+    # manifest kind of variables which could not be written, the slave reports them
+    SKIPPED = "skipped"
+    # names IPython and the kernel put into the namespace on their own
+    RESERVED = {"In", "Out", "exit", "quit", "get_ipython", "preprocessing", "__kernel_name__"}
+
+    @staticmethod
+    def _variables(namespace: dict):
+        for name, value in namespace.items():
+            if name.startswith("_") or name in Snapshot.RESERVED:
+                continue
+            if isinstance(value, (types.ModuleType, types.FunctionType, type)):
+                continue
+            yield name, value
+
+    @staticmethod
+    def save(namespace: dict, directory: str) -> dict:
+        """write DataFrames as parquet and every other variable with joblib, returns the manifest"""
+        import joblib
+        import pandas as pd
+
+        os.makedirs(directory, exist_ok=True)
+        manifest = {}
+        for name, value in list(Snapshot._variables(namespace)):
+            try:
+                if isinstance(value, pd.DataFrame):
+                    try:
+                        value.to_parquet(os.path.join(directory, f"{name}.parquet"))
+                        manifest[name] = "parquet"
+                        continue
+                    except Exception:
+                        # e.g. non string column names, fall back to pickling the frame
+                        pass
+                joblib.dump(value, os.path.join(directory, f"{name}.joblib"))
+                manifest[name] = "joblib"
+            except Exception:
+                manifest[name] = Snapshot.SKIPPED
+
+        with open(os.path.join(directory, Snapshot.MANIFEST), "w") as fp:
+            json.dump(manifest, fp)
+        return manifest
+
+    @staticmethod
+    def restore(namespace: dict, directory: str) -> list[str]:
+        """load a snapshot written by save into the namespace and discard it"""
+        manifest_path = os.path.join(directory, Snapshot.MANIFEST)
+        if not os.path.exists(manifest_path):
+            return []
+
+        import joblib
+        import pandas as pd
+
+        with open(manifest_path) as fp:
+            manifest = json.load(fp)
+        for name, kind in manifest.items():
+            if kind == Snapshot.SKIPPED:
+                continue
+            if kind == "parquet":
+                namespace[name] = pd.read_parquet(os.path.join(directory, f"{name}.parquet"))
+            else:
+                namespace[name] = joblib.load(os.path.join(directory, f"{name}.joblib"))
+
+        # a snapshot is restored once, later restarts must not bring back stale state
+        # only the files of the manifest go, the slave keeps its own state (datasets.json) next to them
+        os.remove(manifest_path)
+        for name, kind in manifest.items():
+            path = os.path.join(directory, f"{name}.{kind}")
+            if os.path.exists(path):
+                os.remove(path)
+        return [name for name, kind in manifest.items() if kind != Snapshot.SKIPPED]
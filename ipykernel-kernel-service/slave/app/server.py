@@ -1,81 +1,158 @@
+import json
 import logging
 import os
 import stat
 import typing
 from contextlib import asynccontextmanager
 from datetime import datetime
-from multiprocessing import Process
-from multiprocessing.connection import Listener
 from typing import Optional, List
 from urllib.request import urlretrieve
-import pandas as pd
 import base64
 import io
-import matplotlib.pyplot as plt
+import tempfile
+import time
 
 import aiofiles
 import uvicorn
-import zmq
-from fastapi import FastAPI, UploadFile, HTTPException
-from jupyter_client import BlockingKernelClient
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, FastAPI, UploadFile, HTTPException, Response
+from opentelemetry.trace import SpanKind, StatusCode
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from pydantic import BaseModel, Field
 from starlette import status
-from starlette.responses import RedirectResponse
-from zmq import Context
+from starlette.requests import Request
+from starlette.background import BackgroundTask
+from starlette.responses import FileResponse, RedirectResponse
 
-import kernel
 from code_generator import CodeGenerator
 from graph_processor import NodeScheduler
+from kernels import Kernel, KernelRegistry, NoCapacityError
+from metrics import INFERENCE_DURATION, NODE_EXECUTION_DURATION, track_request_duration
+from preprocessing import Snapshot
+from tracing import extract, setup_tracing, tracer
 
-kernel_process: Optional[Process] = None
-context = Context()
-heartbeat_sock = context.socket(zmq.XREQ)  # REQ: Send, Receive pattern
-client = BlockingKernelClient()
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+kernel_registry = KernelRegistry(int(os.getenv("SLAVE_MAX_KERNELS", "1")))
+PREVIEW_MAX_ROWS = int(os.getenv("PREVIEW_MAX_ROWS", "10000"))
+# a sweep fits many models in one cell
+SWEEP_TIMEOUT = float(os.getenv("SWEEP_TIMEOUT", "600"))
+# inference inputs and outputs are handed to the kernels as files here, in memory when /dev/shm exists
+INFERENCE_BUFFER_DIR = os.getenv("INFERENCE_BUFFER_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else None)
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI) -> None:
-    global kernel_process
-    ipc_address = ('localhost', 7000)
-    ipc_listener = Listener(ipc_address, authkey=b'password')
-    kernel_process = Process(target=kernel.main, daemon=True, name="mlblock-kernel")
-    kernel_process.start()
-    kernel_conn = ipc_listener.accept()
-    kernel_conn.recv()
-    # TODO: do some conditional stuff based on the message from the kernel subprocess
-    client.load_connection_file(os.getenv("KERNEL_CONFIG_FILE"))
-    client.start_channels()
-    heartbeat_sock.connect("tcp://127.0.0.1:6004")
+    setup_tracing("mlblock-slave")
+    # the master starts kernels through /kernels, a slave run on its own hosts the kernel in its environment
+    if os.getenv("KERNEL_ID"):
+        kernel_registry.start(os.getenv("KERNEL_ID"), os.getenv("CALLBACK_URL"), os.getenv("AUTH_TOKEN"))
     yield
-    heartbeat_sock.close()
-    kernel_process.kill()
+    kernel_registry.stop_all()
 
 
 # noinspection PyTypeChecker
 app = FastAPI(lifespan=lifespan)
+app.middleware("http")(track_request_duration)
 started_on = datetime.utcnow()
-dataset_schema_database = {}
-dataset_viz_database = {}
+# everything about a kernel is routed by its id
+kernel_router = APIRouter(prefix="/kernels/{kernel_id}")
+
+
+def find_kernel(kernel_id: str) -> Kernel:
+    kernel = kernel_registry.get(kernel_id)
+    if kernel is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Kernel not found")
+    return kernel
+
+
+def use_kernel(kernel: Kernel = Depends(find_kernel)) -> Kernel:
+    # health checks and snapshots look the kernel up with find_kernel, they don't count as usage
+    kernel.touch()
+    return kernel
 
 
 @app.get("/health")
 def health():
-    message = b"ping"
-    heartbeat_sock.send(message)
-    reply = heartbeat_sock.recv()
     return {
         "server": "ok",
-        "kernel_id": os.getenv("KERNEL_ID"),
-        "ipykernel": {
-            "process_alive": kernel_process.is_alive() if kernel_process is not None else False,
-            "heartbeat": reply == message,
-            "exitcode": kernel_process.exitcode if kernel_process is not None else None,
-        },
         "started_on": started_on.isoformat(),
+        "kernels": [kernel.id for kernel in kernel_registry.list()],
     }
 
 
-def get_visualizations(df: pd.DataFrame):
+@app.get("/metrics")
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+# Kernel endpoints
+class KernelParams(BaseModel):
+    kernel_id: str
+    callback: Optional[str] = None
+    token: Optional[str] = None
+
+
+@app.get("/kernels")
+def list_kernels():
+    return {"kernels": [kernel.health() for kernel in kernel_registry.list()]}
+
+
+@app.post("/kernels")
+def start_kernel(params: KernelParams):
+    """start a kernel, it registers with the master on its own once it is up"""
+    try:
+        kernel = kernel_registry.start(params.kernel_id, params.callback, params.token)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except NoCapacityError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except Exception as e:
+        logging.error(f"Failed to start kernel {params.kernel_id}: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Kernel failed to start")
+    return kernel.health()
+
+
+@app.delete("/kernels/{kernel_id}")
+def stop_kernel(kernel_id: str, keep_snapshot: bool = False):
+    """stop a kernel, with keep_snapshot its snapshot and files stay for it to be started again"""
+    if not kernel_registry.stop(kernel_id, keep_snapshot):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Kernel not found")
+    return {"status": "deleted", "kernel_id": kernel_id}
+
+
+@kernel_router.get("/health")
+def kernel_health(kernel: Kernel = Depends(find_kernel)):
+    return kernel.health()
+
+
+# Snapshot endpoints
+@kernel_router.post("/snapshot")
+def snapshot(kernel: Kernel = Depends(find_kernel)):
+    """save the kernel namespace and dataset metadata so that the kernel can be stopped"""
+    reply = kernel.client.execute_interactive(
+        f"preprocessing.Snapshot.save(globals(), {kernel.snapshot_dir!r})", silent=True, timeout=600
+    )
+    if reply["content"]["status"] != "ok":
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Snapshot failed")
+
+    kernel.save_datasets()
+
+    # variables which can't be pickled are lost when the kernel is stopped
+    with open(os.path.join(kernel.snapshot_dir, Snapshot.MANIFEST)) as fp:
+        skipped = [name for name, kind in json.load(fp).items() if kind == Snapshot.SKIPPED]
+    if skipped:
+        logging.warning(f"Snapshot of kernel {kernel.id} skipped {', '.join(skipped)}")
+
+    return {"status": "OK", "skipped": skipped}
+
+
+def get_visualizations(df: "pd.DataFrame"):
+    import pandas as pd
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
     df = df.select_dtypes(include='number')
 
     plt.rcParams.update({'font.size': 22})
@@ -95,12 +172,14 @@ def get_visualizations(df: pd.DataFrame):
     return [pic1_base64, pic2_base64]
 
 
-def extract_schema(file: typing.IO, filename: str):
+def extract_schema(file: typing.IO, filename: str, kernel: Kernel):
     _, ext = os.path.splitext(filename)
 
     if ext not in ('.csv', '.json'):
         raise Exception(f"invalid file extension {ext}")
 
+    import pandas as pd
+
     df: pd.DataFrame | None = None
 
     if ext == '.csv':
@@ -122,73 +201,79 @@ def extract_schema(file: typing.IO, filename: str):
         })
 
     try:
-        dataset_viz_database[filename] = get_visualizations(df)
+        kernel.dataset_viz_database[filename] = get_visualizations(df)
     except Exception as e:
         logging.error(e)
 
     return schema
 
 
-def get_file_details(file_name: str, cwd: str) -> dict:
-    st = os.stat(os.path.join(cwd, file_name))
+def get_file_details(kernel: Kernel, file_name: str) -> dict:
+    path = kernel.resolve(file_name)
+    st = os.stat(path)
     return {
         "name": file_name,
         "last_modified": st.st_mtime_ns,
         "last_accessed": st.st_atime_ns,
         "size": st.st_size,
         "mode": stat.filemode(st.st_mode),
-        "kind": "file" if os.path.isfile(file_name) else "directory",
-        "schema": dataset_schema_database[file_name],
-        "viz": dataset_viz_database.get(file_name, [])
+        "kind": "file" if os.path.isfile(path) else "directory",
+        "schema": kernel.dataset_schema_database[file_name],
+        "viz": kernel.dataset_viz_database.get(file_name, [])
     }
 
 
 # File System Endpoints
 # TODO: Add rename endpoint
 
-@app.get("/fs")
-def read_filesystem(hidden: bool = False):
+@kernel_router.get("/fs")
+def read_filesystem(hidden: bool = False, kernel: Kernel = Depends(use_kernel)):
     try:
-        cwd = os.getcwd()
-        dir_content = [get_file_details(f, cwd) for f in os.listdir(cwd) if
-                       (not f.startswith(".") or hidden) and f in dataset_schema_database]
+        dir_content = [get_file_details(kernel, f) for f in os.listdir(kernel.cwd) if
+                       (not f.startswith(".") or hidden) and f in kernel.dataset_schema_database]
         return {"content": dir_content}
     except Exception as e:
         logging.error(e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to retrieve files")
 
 
-@app.get("/fs/cd/{destination:path}")
-def change_directory(destination: str, hidden: bool = False):
-    print(f"{destination=}")
-    os.chdir(destination if len(destination) > 0 else '.')
-    return RedirectResponse("/fs" + ("?hidden=true" if hidden else ""))
+@kernel_router.get("/fs/cd/{destination:path}")
+def change_directory(destination: str, hidden: bool = False, kernel: Kernel = Depends(use_kernel)):
+    try:
+        path = kernel.resolve(destination if len(destination) > 0 else '.')
+    except PermissionError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not os.path.isdir(path):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Path doesn't exist")
+    kernel.cwd = path
+    return RedirectResponse(f"/kernels/{kernel.id}/fs" + ("?hidden=true" if hidden else ""))
 
 
-@app.post("/fs")
-async def upload_file(file: UploadFile):
+@kernel_router.post("/fs")
+async def upload_file(file: UploadFile, kernel: Kernel = Depends(use_kernel)):
     if file.size > 512 * 1024 * 1024:
         raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail="File too large")
-    file_path = os.path.join(os.getcwd(), file.filename)
     try:
-        schema = extract_schema(file.file, file.filename)
+        file_path = kernel.resolve(file.filename)
+    except PermissionError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    try:
+        schema = extract_schema(file.file, file.filename, kernel)
     except Exception as e:
         print(e)
         logging.getLogger("uvicorn").error(e)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Schema could not be extracted")
 
-    dataset_schema_database[file.filename] = schema
+    kernel.dataset_schema_database[file.filename] = schema
 
     async with aiofiles.open(file_path, 'wb') as fp:
         await file.seek(0)
         while content := await file.read(1024):
             await fp.write(content)
 
-    cwd = os.getcwd()
-
     return {
         "status": "OK",
-        "file": get_file_details(file.filename, cwd)
+        "file": get_file_details(kernel, file.filename)
     }
 
 
@@ -196,36 +281,41 @@ class UploadFromUrlParam(BaseModel):
     url: str
 
 
-@app.post("/fs/url")
-async def upload_file_from_url(params: UploadFromUrlParam):
+@kernel_router.post("/fs/url")
+async def upload_file_from_url(params: UploadFromUrlParam, kernel: Kernel = Depends(use_kernel)):
     dataset_url = params.url
     _, filename = os.path.split(dataset_url)
     try:
-        path, _ = urlretrieve(dataset_url, filename)
+        file_path = kernel.resolve(filename)
+    except PermissionError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    try:
+        path, _ = urlretrieve(dataset_url, file_path)
     except Exception:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to download the dataset")
 
     try:
-        with open(filename, "r") as fp:
-            schema = extract_schema(fp, filename)
+        with open(file_path, "r") as fp:
+            schema = extract_schema(fp, filename, kernel)
     except Exception:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Schema could not be extracted")
 
-    dataset_schema_database[filename] = schema
-
-    cwd = os.getcwd()
+    kernel.dataset_schema_database[filename] = schema
 
     return {
         "status": "OK",
-        "file": get_file_details(filename, cwd)
+        "file": get_file_details(kernel, filename)
     }
 
 
-@app.delete("/fs/{path}")
-def remove_file(path: str):
+@kernel_router.delete("/fs/{path}")
+def remove_file(path: str, kernel: Kernel = Depends(use_kernel)):
     if path in ('.', '..', ''):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Action cannot be performed")
-    file_path = os.path.join(os.getcwd(), path)
+    try:
+        file_path = kernel.resolve(path)
+    except PermissionError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     if not os.path.exists(file_path):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Path doesn't exist")
     if os.path.isfile(file_path):
@@ -244,10 +334,19 @@ class Graph(BaseModel):
     edges: List[dict]
 
 
-@app.post("/execute/{source_node_id}")
-def execute(source_node_id: str, graph: Graph):
+@kernel_router.post("/execute/{source_node_id}")
+def execute(source_node_id: str, graph: Graph, kernel: Kernel = Depends(use_kernel), request: Request = None,
+            statistics: bool = False):
+    with tracer.start_as_current_span("execute", kind=SpanKind.SERVER,
+                                      context=extract(request.headers) if request is not None else None,
+                                      attributes={"graph.source_node_id": source_node_id,
+                                                  "graph.nodes": len(graph.nodes)}):
+        return execute_graph(kernel, source_node_id, graph, statistics)
+
+
+def execute_graph(kernel: Kernel, source_node_id: str, graph: Graph, statistics: bool = False) -> dict:
     node_scheduler = NodeScheduler(graph.nodes, graph.edges, source_node_id)
-    code_generator = CodeGenerator(node_scheduler)
+    code_generator = CodeGenerator(node_scheduler, kernel.working_dir)
 
     results = {}
 
@@ -266,30 +365,81 @@ def execute(source_node_id: str, graph: Graph):
             results[response_cell_id]["stream_text"] = value + response["content"]["text"]
 
     cell_to_node_id_map = {}
+    executed = []
     for idx in node_scheduler.get_execution_order():
-        reply = client.execute_interactive(code_generator.generate_code(graph.nodes[idx]), silent=True,
-                                           output_hook=handle_response, timeout=20)
-        cell_id = reply["parent_header"]["msg_id"]
-        cell_to_node_id_map[cell_id] = graph.nodes[idx]["id"]
-        content = reply["content"]
-        if content["status"] == "error":
-            break
+        node = graph.nodes[idx]
+        # the kernel parents its cell span to this one, see tracing.CellTracer
+        with tracer.start_as_current_span(f"node {node['type']}", attributes={
+            "node.id": node["id"], "node.type": node["type"]
+        }) as span:
+            code = code_generator.generate_code(node)
+            started = time.perf_counter()
+            timeout = SWEEP_TIMEOUT if node["type"] == "regressionSweep" else 20
+            reply = kernel.client.execute_interactive(code, silent=True, output_hook=handle_response, timeout=timeout)
+            cell_id = reply["parent_header"]["msg_id"]
+            cell_to_node_id_map[cell_id] = node["id"]
+            content = reply["content"]
+            NODE_EXECUTION_DURATION.labels(node["type"], content["status"]) \
+                .observe(time.perf_counter() - started)
+            span.set_attribute("kernel.msg_id", cell_id)
+            if content["status"] == "error":
+                span.set_status(StatusCode.ERROR, f"{content.get('ename')}: {content.get('evalue')}")
+                break
+            executed.append(node["id"])
 
     results = {cell_to_node_id_map[cell_id]: data for cell_id, data in results.items()}
+    if statistics and executed:
+        for node_id, node_statistics in get_statistics(kernel, code_generator, executed).items():
+            results.setdefault(node_id, {})["statistics"] = node_statistics
 
     return results
 
 
+def get_statistics(kernel: Kernel, code_generator: CodeGenerator, node_ids: List[str]) -> dict:
+    """summaries of the outputs of the nodes, the kernel caches them by node fingerprint"""
+    output = []
+
+    def handle_response(response: dict):
+        # warnings of the summarized libraries go to stderr, only stdout carries the JSON
+        if response["msg_type"] == "stream" and response["content"]["name"] == "stdout":
+            output.append(response["content"]["text"])
+
+    with tracer.start_as_current_span("statistics"):
+        reply = kernel.client.execute_interactive(code_generator.get_statistics_code(node_ids), silent=True,
+                                                  output_hook=handle_response, timeout=20)
+    if reply["content"]["status"] != "ok":
+        logging.error(f"Statistics failed: {reply['content'].get('ename')}: {reply['content'].get('evalue')}")
+        return {}
+    try:
+        return json.loads("".join(output))
+    except json.JSONDecodeError as e:
+        logging.error(f"Statistics output is not JSON: {e}")
+        return {}
+
+
 class InferenceParams(BaseModel):
     graph: Graph
     inputs: List[typing.Any]
 
 
-@app.post("/execute/{source_node_id}/infer")
-def infer(source_node_id: str, params: InferenceParams):
+@kernel_router.post("/execute/{source_node_id}/infer")
+def infer(source_node_id: str, params: InferenceParams, kernel: Kernel = Depends(use_kernel), request: Request = None):
+    with tracer.start_as_current_span("infer", kind=SpanKind.SERVER,
+                                      context=extract(request.headers) if request is not None else None,
+                                      attributes={"graph.source_node_id": source_node_id}):
+        return infer_graph(kernel, source_node_id, params)
+
+
+def infer_graph(kernel: Kernel, source_node_id: str, params: InferenceParams) -> dict:
+    import numpy as np
+
+    try:
+        inputs = np.asarray(params.inputs, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inputs must be numeric")
     graph = params.graph
     node_scheduler = NodeScheduler(graph.nodes, graph.edges, source_node_id)
-    code_generator = CodeGenerator(node_scheduler)
+    code_generator = CodeGenerator(node_scheduler, kernel.working_dir)
 
     results = {}
 
@@ -308,14 +458,87 @@ def infer(source_node_id: str, params: InferenceParams):
             results[response_cell_id]["stream_text"] = value + response["content"]["text"]
 
     cell_to_node_id_map = {}
-    reply = client.execute_interactive(code_generator.get_inference_code(source_node_id, params.inputs), silent=True,
-                                       output_hook=handle_response, timeout=20)
-    cell_id = reply["parent_header"]["msg_id"]
+    fd, inputs_path = tempfile.mkstemp(prefix=f"infer-{kernel.id}-", suffix=".npy", dir=INFERENCE_BUFFER_DIR)
+    outputs_path = inputs_path.removesuffix(".npy") + "-out.npy"
+    try:
+        started = time.perf_counter()
+        with os.fdopen(fd, "wb") as fp:
+            np.save(fp, inputs)
+        reply = kernel.client.execute_interactive(
+            code_generator.get_inference_code(source_node_id, inputs_path, outputs_path),
+            silent=True, output_hook=handle_response, timeout=20
+        )
+        cell_id = reply["parent_header"]["msg_id"]
+        if reply["content"]["status"] == "ok":
+            results.setdefault(cell_id, {})["predictions"] = np.load(outputs_path).tolist()
+        INFERENCE_DURATION.labels(reply["content"]["status"]).observe(time.perf_counter() - started)
+    finally:
+        for path in (inputs_path, outputs_path):
+            if os.path.exists(path):
+                os.remove(path)
     cell_to_node_id_map[cell_id] = source_node_id
     results = {cell_to_node_id_map[cell_id]: data for cell_id, data in results.items()}
 
     return results
 
 
+class SortKey(BaseModel):
+    column: str
+    ascending: bool = True
+
+
+class PreviewParams(BaseModel):
+    graph: Graph
+    offset: int = Field(0, ge=0)
+    limit: int = Field(100, ge=1, le=PREVIEW_MAX_ROWS)
+    columns: Optional[List[str]] = None
+    sort: List[SortKey] = []
+
+
+@kernel_router.post("/execute/{source_node_id}/preview")
+def preview(source_node_id: str, params: PreviewParams, kernel: Kernel = Depends(use_kernel),
+            request: Request = None):
+    """a slice of the output DataFrame of an executed node, as an Arrow IPC stream"""
+    with tracer.start_as_current_span("preview", kind=SpanKind.SERVER,
+                                      context=extract(request.headers) if request is not None else None,
+                                      attributes={"graph.source_node_id": source_node_id}):
+        return preview_output(kernel, source_node_id, params)
+
+
+def preview_output(kernel: Kernel, source_node_id: str, params: PreviewParams) -> FileResponse:
+    import pyarrow as pa
+
+    graph = params.graph
+    node_scheduler = NodeScheduler(graph.nodes, graph.edges, source_node_id)
+    code_generator = CodeGenerator(node_scheduler, kernel.working_dir)
+
+    # the kernel writes the slice next to the server, only the slice is ever converted
+    fd, path = tempfile.mkstemp(prefix="preview-", suffix=".arrow")
+    os.close(fd)
+    code = code_generator.get_preview_code(source_node_id, path, params.offset, params.limit, params.columns,
+                                           [(key.column, key.ascending) for key in params.sort])
+
+    reply = kernel.client.execute_interactive(code, silent=True, timeout=20)
+    content = reply["content"]
+    if content["status"] != "ok":
+        os.remove(path)
+        if content.get("ename") == "NameError":
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="The node has not been executed yet")
+        if content.get("ename") in ("KeyError", "TypeError", "ValueError"):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=content.get("evalue"))
+        logging.error(f"Preview of {source_node_id} failed: {content.get('ename')}: {content.get('evalue')}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Preview failed")
+
+    # only the schema at the head of the stream is read
+    with pa.ipc.open_stream(pa.memory_map(path)) as reader:
+        total_rows = int(reader.schema.metadata[b"total_rows"])
+
+    return FileResponse(path, media_type="application/vnd.apache.arrow.stream",
+                        headers={"X-Total-Rows": str(total_rows)},
+                        background=BackgroundTask(os.remove, path))
+
+
+app.include_router(kernel_router)
+
 if __name__ == '__main__':
     uvicorn.run('server:app', host='0.0.0.0', port=5000, log_level='info', reload=True)
@@ -0,0 +1,115 @@
+import importlib
+import os
+import sys
+from typing import Optional
+
+from jupyter_client import BlockingKernelClient
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor, \
+    SpanExporter
+from opentelemetry.trace import Span, StatusCode
+
+# none, console, file, otlp or module:ExporterClass
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+
+# a proxy, spans are dropped until tracing is set up
+tracer = trace.get_tracer("mlblock.slave")
+
+
+def _json_line(span) -> str:
+    return span.to_json(indent=None) + os.linesep
+
+
+def create_exporter(name: str) -> SpanExporter:
+    if name == "console":
+        return ConsoleSpanExporter(out=sys.stdout, formatter=_json_line)
+    if name == "file":
+        return ConsoleSpanExporter(out=open(TRACE_FILE, "a", buffering=1), formatter=_json_line)
+    if name == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    module, _, exporter_class = name.partition(":")
+    if not exporter_class:
+        raise Exception(f"unknown trace exporter {name}")
+    return getattr(importlib.import_module(module), exporter_class)()
+
+
+def setup_tracing(service_name: str):
+    if TRACE_EXPORTER == "none":
+        return
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    exporter = create_exporter(TRACE_EXPORTER)
+    # local exporters write right away, so that nothing is lost when the kernel process is killed
+    if TRACE_EXPORTER in ("console", "file"):
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+    else:
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+
+def inject() -> dict:
+    """the current trace context as w3c headers"""
+    carrier = {}
+    propagate.inject(carrier)
+    return carrier
+
+
+def extract(carrier):
+    return propagate.extract(carrier)
+
+
+class TracingKernelClient(BlockingKernelClient):
+    """Sends the current trace context along with every execute request, in the message metadata"""
+
+    def execute(self, code: str, silent: bool = False, store_history: bool = True, user_expressions=None,
+                allow_stdin=None, stop_on_error: bool = True) -> str:
+        content = {
+            "code": code,
+            "silent": silent,
+            "store_history": store_history,
+            "user_expressions": user_expressions or {},
+            "allow_stdin": self.allow_stdin if allow_stdin is None else allow_stdin,
+            "stop_on_error": stop_on_error,
+        }
+        msg = self.session.msg("execute_request", content, metadata=inject())
+        self.shell_channel.send(msg)
+        return msg["header"]["msg_id"]
+
+
+class CellTracer:
+    """
+    Runs inside the kernel, spans the execution of every cell whose request carries a trace
+    context. pre_execute and post_execute fire for silent cells too.
+    """
+
+    def __init__(self, kernel):
+        self._kernel = kernel
+        self._span: Optional[Span] = None
+
+    def register(self, shell):
+        shell.events.register("pre_execute", self.pre_execute)
+        shell.events.register("post_execute", self.post_execute)
+
+    def pre_execute(self):
+        parent = self._kernel.get_parent("shell") or {}
+        carrier = parent.get("metadata") or {}
+        if "traceparent" not in carrier:
+            return
+        self._span = tracer.start_span("kernel.cell", context=extract(carrier), attributes={
+            "kernel.msg_id": parent["header"]["msg_id"],
+            "kernel.session": parent["header"].get("session", ""),
+        })
+
+    def post_execute(self):
+        if self._span is None:
+            return
+        result = self._kernel.shell.last_execution_result
+        if result is not None and not result.success:
+            error = result.error_in_exec or result.error_before_exec
+            self._span.set_status(StatusCode.ERROR, repr(error))
+        self._span.end()
+        self._span = None
+
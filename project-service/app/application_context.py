@@ -1,7 +1,7 @@
 import logging
 import os
 
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, DESCENDING, IndexModel
 from pymongo.database import Database
 from dotenv import load_dotenv
 
@@ -9,6 +9,17 @@ from app.singleton import Singleton
 
 logger = logging.getLogger('uvicorn')
 
+# indexes backing the queries of each collection, created when the context starts
+INDEXES = {
+    "projects": [
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("kernel_id", ASCENDING)], sparse=True)
+    ],
+    "project_versions": [
+        IndexModel([("project_id", ASCENDING), ("version", DESCENDING)], unique=True)
+    ]
+}
+
 
 class ApplicationContext(metaclass=Singleton):
     database: Database = None
@@ -19,4 +30,9 @@ class ApplicationContext(metaclass=Singleton):
         self.database_client = MongoClient(os.getenv('MONGO_URI'))
         self.database = self.database_client[os.getenv('MONGO_DATABASE')]
         logger.info(f"connected to database {os.getenv('MONGO_URI')}")
+        self.create_indexes()
         logger.info("application context loaded")
+
+    def create_indexes(self):
+        for collection_name, indexes in INDEXES.items():
+            self.database[collection_name].create_indexes(indexes)
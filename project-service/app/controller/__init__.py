@@ -1,5 +1,12 @@
+import os
+
+from app.controller.checkpoint_controller import CheckpointController
+from app.controller.event_hub import EventHub
 from app.controller.kernel_controller import KernelController
-from app.repository import project_repository
+from app.repository import project_repository, graph_version_repository
 from app.service import kernel_service
 
-kernel_controller = KernelController(project_repository, kernel_service)
+event_hub = EventHub()
+kernel_controller = KernelController(project_repository, kernel_service, event_hub,
+                                     int(os.getenv("KERNEL_PROVISION_CONCURRENCY", "8")))
+checkpoint_controller = CheckpointController(project_repository, graph_version_repository)
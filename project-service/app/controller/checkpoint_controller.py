@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+import jsonpatch
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+from starlette import status
+
+from app.model.graph_version_model import GraphVersion, GraphVersionKind
+from app.model.project_model import Project
+from app.repository.graph_version_repository import GraphVersionRepository
+from app.repository.project_repository import ProjectRepository
+
+logger = logging.getLogger("uvicorn")
+
+
+def compress(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode())
+
+
+def decompress(data: bytes) -> Any:
+    return json.loads(zlib.decompress(data))
+
+
+class CheckpointController:
+    """
+    Stores graph checkpoints as compressed JSON patches against the previous version, with a
+    full base snapshot every base_interval versions so that rebuilding a graph stays cheap.
+    """
+
+    def __init__(self, project_repository: ProjectRepository, graph_version_repository: GraphVersionRepository,
+                 base_interval: int = int(os.getenv("CHECKPOINT_BASE_INTERVAL", "20")), cache_size: int = 256):
+        self.project_repository = project_repository
+        self.graph_version_repository = graph_version_repository
+        self.base_interval = base_interval
+        self.cache_size = cache_size
+        # project id -> (version, graph) of recently checkpointed projects
+        self._heads: OrderedDict[str, Tuple[int, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def checkpoint(self, project_id: str, graph: Any, restored_from: Optional[int] = None) -> Optional[int]:
+        project = self.project_repository.fetch_by_id(project_id)
+        if not project:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+
+        head_version, head_graph = self._head(project)
+        version = (head_version or 0) + 1
+        if head_version is None or version % self.base_interval == 0:
+            kind, data = GraphVersionKind.BASE, compress(graph)
+        else:
+            patch = jsonpatch.make_patch(head_graph, graph).patch
+            if not patch and restored_from is None:
+                return head_version
+            kind, data = GraphVersionKind.DELTA, compress(patch)
+
+        try:
+            self.graph_version_repository.insert(GraphVersion(
+                project_id=project_id, version=version, kind=kind, data=data, size=len(data),
+                restored_from=restored_from
+            ))
+        except DuplicateKeyError:
+            self._forget(project_id)
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Concurrent checkpoint, retry")
+
+        self.project_repository.update_graph_version(project_id, version)
+        self._remember(project_id, version, graph)
+        return version
+
+    def get_graph(self, project: Project, version: Optional[int] = None) -> Any:
+        """the graph of a project at a version, the latest one by default"""
+        if version is None:
+            return self._head(project)[1]
+
+        chain = self.graph_version_repository.fetch_chain(project.id, version)
+        if not chain or chain[-1].version != version:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Version not found")
+        return self._replay(chain)
+
+    def list_versions(self, project_id: str, skip: int = 0, limit: int = 50):
+        return self.graph_version_repository.fetch_all(project_id, skip, limit)
+
+    def restore(self, project_id: str, version: int) -> Optional[int]:
+        """make an old version the latest one again, keeping the history in between"""
+        project = self.project_repository.fetch_by_id(project_id)
+        if not project:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+        return self.checkpoint(project_id, self.get_graph(project, version), restored_from=version)
+
+    def delete(self, project_id: str):
+        self._forget(project_id)
+        self.graph_version_repository.delete_all(project_id)
+
+    def _head(self, project: Project) -> Tuple[Optional[int], Any]:
+        latest = self.graph_version_repository.fetch_latest_version(project.id)
+        if latest is None:
+            # projects saved before versioning keep their graph on the document
+            return None, project.graph
+
+        with self._lock:
+            head = self._heads.get(project.id)
+        if head is not None and head[0] == latest:
+            return head
+
+        graph = self._replay(self.graph_version_repository.fetch_chain(project.id, latest))
+        self._remember(project.id, latest, graph)
+        return latest, graph
+
+    @staticmethod
+    def _replay(chain) -> Any:
+        graph = decompress(chain[0].data)
+        for graph_version in chain[1:]:
+            graph = jsonpatch.apply_patch(graph, decompress(graph_version.data))
+        return graph
+
+    def _remember(self, project_id: str, version: int, graph: Any):
+        with self._lock:
+            self._heads[project_id] = (version, graph)
+            self._heads.move_to_end(project_id)
+            while len(self._heads) > self.cache_size:
+                self._heads.popitem(last=False)
+
+    def _forget(self, project_id: str):
+        with self._lock:
+            self._heads.pop(project_id, None)
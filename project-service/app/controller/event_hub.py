@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Set, Tuple
+
+logger = logging.getLogger("uvicorn")
+
+
+class EventHub:
+    """
+    In-process publish/subscribe of project events. Publishing is thread safe, so sync endpoints
+    running in the threadpool can push events to subscribers waiting on the event loop.
+    Subscribers only see events published by the same worker process.
+    """
+
+    def __init__(self, queue_size: int = 64):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, project_id: str, type: str, **data):
+        event = {"type": type, "project_id": project_id, "timestamp": datetime.utcnow().isoformat(), **data}
+        with self._lock:
+            subscribers = list(self._subscribers.get(project_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:
+                # the loop of the subscriber is already closed
+                pass
+
+    def subscribe(self, project_id: str) -> "Subscription":
+        """register right away, so that no event is missed while the caller reads the current state"""
+        subscription = Subscription(self, project_id, asyncio.Queue(self.queue_size))
+        with self._lock:
+            self._subscribers.setdefault(project_id, set()).add((subscription.loop, subscription.queue))
+        return subscription
+
+    def unsubscribe(self, subscription: "Subscription"):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.project_id)
+            if subscribers is None:
+                return
+            subscribers.discard((subscription.loop, subscription.queue))
+            if not subscribers:
+                del self._subscribers[subscription.project_id]
+
+    @staticmethod
+    def _deliver(queue: asyncio.Queue, event: dict):
+        if queue.full():
+            # a slow subscriber loses its oldest events rather than blocking the publisher
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+
+class Subscription:
+    def __init__(self, hub: EventHub, project_id: str, queue: asyncio.Queue):
+        self.hub = hub
+        self.project_id = project_id
+        self.queue = queue
+        self.loop = asyncio.get_running_loop()
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """next event, or None if nothing was published within the timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
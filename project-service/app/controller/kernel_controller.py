@@ -1,9 +1,12 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from fastapi import HTTPException
 from starlette import status
 from starlette.responses import JSONResponse
 
+from app.controller.event_hub import EventHub
+from app.controller.tunnel_controller import invalidate_route
 from app.model.kernel_event import KernelEvent
 from app.model.project_model import KernelStatus
 from app.repository.project_repository import ProjectRepository
@@ -13,69 +16,98 @@ logger = logging.getLogger("uvicorn")
 
 
 class KernelController:
-    def __init__(self, project_repository: ProjectRepository, kernel_service: KernelService):
+    def __init__(self, project_repository: ProjectRepository, kernel_service: KernelService, event_hub: EventHub,
+                 provision_concurrency: int = 8):
         self.project_repository = project_repository
         self.kernel_service = kernel_service
+        self.event_hub = event_hub
+        # bounds the requests in flight to the kernel service during a burst of connects
+        self.provision_executor = ThreadPoolExecutor(max_workers=provision_concurrency,
+                                                     thread_name_prefix="kernel-provision")
 
     def connect_kernel(self, project_id: str):
-        project = self.project_repository.fetch_by_id(project_id)
+        # only one of concurrent connects gets to provision a kernel
+        if not self.project_repository.transition_kernel_status(
+                project_id, (KernelStatus.DISCONNECTED, KernelStatus.ERROR), KernelStatus.CONNECTING):
+            project = self.project_repository.fetch_by_id(project_id)
 
-        if project is None:
-            return HTTPException(status_code=404, detail="Project doesn't exist")
+            if project is None:
+                return HTTPException(status_code=404, detail="Project doesn't exist")
 
-        if project.kernel_id is not None or project.kernel_status in (KernelStatus.CONNECTED, KernelStatus.CONNECTING):
             return {
                 "status": project.kernel_status,
                 "kernel_id": project.kernel_id
             }
 
-        project.kernel_status = KernelStatus.CONNECTING
-        self.project_repository.persist(project)
-
-        try:
-            self.kernel_service.provision_kernel(project_id)
-        except Exception as e:
-            logger.error(e)
-            return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Kernel provisioning failed")
+        self.publish_kernel_status(project_id, KernelStatus.CONNECTING)
+        # the outcome reaches the project through the kernel webhook or the event stream
+        self.provision_executor.submit(self.provision_kernel, project_id)
 
         return JSONResponse({
             "status": KernelStatus.CONNECTING,
             "kernel_id": None
         })
 
+    def provision_kernel(self, project_id: str):
+        try:
+            self.kernel_service.provision_kernel(project_id)
+        except Exception as e:
+            logger.error(f"Kernel provisioning for project {project_id} failed: {e}")
+            if self.project_repository.transition_kernel_status(
+                    project_id, (KernelStatus.CONNECTING,), KernelStatus.ERROR):
+                self.publish_kernel_status(project_id, KernelStatus.ERROR, error="Kernel provisioning failed")
+
     def disconnect_kernel(self, project_id: str):
         project = self.project_repository.fetch_by_id(project_id)
 
         if not project:
             return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project doesn't exist")
 
-        project.kernel_status = KernelStatus.DISCONNECTED
+        if project.kernel_status == KernelStatus.CONNECTING:
+            return HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                                 detail="Doesn't support disconnection while kernel state is in 'CONNECTING'")
 
         if project.kernel_id:
-            if project.kernel_status == KernelStatus.CONNECTING:
-                return HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED,
-                                     detail="Doesn't support disconnection while kernel state is in 'CONNECTING'")
-
             try:
                 self.kernel_service.stop_kernel(project.id, project.kernel_id)
-                project.kernel_id = None
-                project.kernel_url = None
+                invalidate_route(project.kernel_id)
             except Exception as e:
                 logger.error(e)
                 return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Kernel decommissioning failed")
 
-        self.project_repository.persist(project)
+        if self.project_repository.transition_kernel_status(
+                project.id, (KernelStatus.CONNECTED, KernelStatus.ERROR), KernelStatus.DISCONNECTED,
+                kernel_id=None, kernel_url=None):
+            self.publish_kernel_status(project.id, KernelStatus.DISCONNECTED)
 
     def update_kernel_state(self, project_id: str, event: KernelEvent):
-        project = self.project_repository.fetch_by_id(project_id)
-        if not project:
-            return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project doesn't exist")
-
-        logger.info(f"Project {project.id} received event: {event}")
+        logger.info(f"Project {project_id} received event: {event}")
+        # the kernel url may have changed, e.g. after resuming a suspended kernel
+        invalidate_route(event.kernel_id)
 
         if event.type == "started":
-            logger.info(f"Kernel connected to project {project.id}")
-            project.kernel_status = KernelStatus.CONNECTED
-            project.kernel_id = event.kernel_id
-            project.kernel_url = event.kernel_url
-            self.project_repository.persist(project)
+            # written before it is published, the tunnel and new subscribers read the project from the database
+            if self.project_repository.transition_kernel_status(
+                    project_id, (KernelStatus.CONNECTING,), KernelStatus.CONNECTED,
+                    kernel_id=event.kernel_id, kernel_url=event.kernel_url):
+                logger.info(f"Kernel connected to project {project_id}")
+                self.publish_kernel_status(project_id, KernelStatus.CONNECTED, kernel_id=event.kernel_id)
+            elif not self.project_repository.refresh_kernel_url(project_id, event.kernel_id, event.kernel_url):
+                # the project disconnected or failed meanwhile, the master releases a kernel it won't take
+                logger.warning(f"Project {project_id} is not waiting for kernel {event.kernel_id}")
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                    detail="Project is not waiting for this kernel")
+        elif event.type == "error":
+            logger.error(f"Kernel {event.kernel_id} of project {project_id} failed: {event.error}")
+            if self.project_repository.transition_kernel_status(
+                    project_id, (KernelStatus.CONNECTING, KernelStatus.CONNECTED), KernelStatus.ERROR):
+                self.publish_kernel_status(project_id, KernelStatus.ERROR, kernel_id=event.kernel_id,
+                                           error=event.error)
+        else:
+            self.event_hub.publish(project_id, "kernel_event", kernel_id=event.kernel_id, event=event.type,
+                                   status=event.status)
+
+    def publish_kernel_status(self, project_id: str, kernel_status: KernelStatus, kernel_id: str = None,
+                              error: str = None):
+        self.event_hub.publish(project_id, "kernel_status", status=kernel_status.value, kernel_id=kernel_id,
+                               error=error)
@@ -1,36 +1,261 @@
+import asyncio
+import json
 import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 
-import requests
+import httpx
+import websockets
+from opentelemetry.trace import SpanKind
 from starlette import status
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from starlette.exceptions import HTTPException
 from starlette.requests import Request
-from starlette.responses import Response
+from starlette.responses import Response, StreamingResponse
+from starlette.websockets import WebSocket, WebSocketDisconnect, WebSocketState
 
+from app.metrics import TUNNEL_BYTES, TUNNEL_RESUMES, TUNNEL_UPSTREAM_DURATION
 from app.repository import project_repository
+from app.service import kernel_service
+from app.tracing import extract, inject, tracer
 
 logger = logging.getLogger("uvicorn")
 
+# headers which only apply to a single connection and must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailers",
+    "transfer-encoding", "upgrade", "host"
+}
 
-async def tunnel(request: Request):
-    kernel_id = request.path_params.get('kernel_id')
-    destination = request.path_params.get('destination', '')
-    project = project_repository.fetch_by_kernel_id(kernel_id)
+ROUTE_TTL = float(os.getenv("TUNNEL_ROUTE_TTL", "60"))
+POOL_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("TUNNEL_MAX_CONNECTIONS", "20")),
+    max_keepalive_connections=int(os.getenv("TUNNEL_MAX_KEEPALIVE", "10")),
+    keepalive_expiry=30
+)
+TIMEOUT = httpx.Timeout(float(os.getenv("TUNNEL_TIMEOUT", "300")), connect=5)
+# request bodies up to this size are kept, to send them again once a suspended kernel is resumed
+REPLAY_LIMIT = int(os.getenv("TUNNEL_REPLAY_LIMIT", str(8 * 1024 * 1024)))
+
+# kernel id -> (project id, kernel url, expires at)
+_routes: Dict[str, Tuple[str, str, float]] = {}
+# kernel url -> keep-alive connection pool
+_clients: Dict[str, httpx.AsyncClient] = {}
+# pools of kernels which went away, closed from the event loop on the next request
+_retired_clients: List[httpx.AsyncClient] = []
+_lock = threading.Lock()
+
+
+def invalidate_route(kernel_id: Optional[str]):
+    """forget where a kernel lives, called whenever its url changes or it is removed"""
+    if kernel_id is None:
+        return
+    with _lock:
+        route = _routes.pop(kernel_id, None)
+        if route is not None and route[1] in _clients:
+            _retired_clients.append(_clients.pop(route[1]))
+
+
+def _set_route(kernel_id: str, project_id: str, kernel_url: str):
+    with _lock:
+        _routes[kernel_id] = (project_id, kernel_url, time.monotonic() + ROUTE_TTL)
+
+
+async def _resolve_route(kernel_id: str) -> Tuple[str, str]:
+    with _lock:
+        route = _routes.get(kernel_id)
+    if route is not None and route[2] > time.monotonic():
+        return route[0], route[1]
 
+    project = await run_in_threadpool(project_repository.fetch_by_kernel_id, kernel_id)
     if not project:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No associated project found")
     if not project.kernel_url:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Kernel URL is not set")
+    _set_route(kernel_id, project.id, project.kernel_url)
+    return project.id, project.kernel_url
+
+
+async def _get_client(kernel_url: str) -> httpx.AsyncClient:
+    with _lock:
+        retired = _retired_clients[:]
+        _retired_clients.clear()
+        client = _clients.get(kernel_url)
+        if client is None:
+            client = httpx.AsyncClient(base_url=kernel_url, limits=POOL_LIMITS, timeout=TIMEOUT)
+            _clients[kernel_url] = client
+    for retired_client in retired:
+        await retired_client.aclose()
+    return client
+
+
+async def _resume(kernel_id: str, project_id: str) -> str:
+    # the kernel may have been suspended for being idle, wake it up
+    kernel_url = await run_in_threadpool(kernel_service.resume_kernel, project_id, kernel_id)
+    TUNNEL_RESUMES.inc()
+    invalidate_route(kernel_id)
+    _set_route(kernel_id, project_id, kernel_url)
+    return kernel_url
+
+
+def _forward_headers(headers) -> Dict[str, str]:
+    return {key: value for key, value in headers.items() if key.lower() not in HOP_BY_HOP_HEADERS}
+
+
+async def _count_bytes(chunks, direction: str):
+    counter = TUNNEL_BYTES.labels(direction)
+    async for chunk in chunks:
+        counter.inc(len(chunk))
+        yield chunk
+
+
+class _ReplayableBody:
+    """a request body which can be sent a second time, as long as it was read completely and is small enough"""
 
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._kept: Optional[List[bytes]] = []
+        self._size = 0
+        self._complete = False
+
+    @property
+    def replayable(self) -> bool:
+        return self._complete and self._kept is not None
+
+    async def __aiter__(self):
+        if self._complete:
+            for chunk in self._kept:
+                yield chunk
+            return
+        async for chunk in self._chunks:
+            if self._kept is not None:
+                self._size += len(chunk)
+                if self._size <= REPLAY_LIMIT:
+                    self._kept.append(chunk)
+                else:
+                    self._kept = None
+            yield chunk
+        self._complete = True
+
+
+def _is_kernel_missing(content: bytes) -> bool:
     try:
-        response = requests.request(
+        return json.loads(content).get("detail") == "Kernel not found"
+    except (ValueError, AttributeError):
+        return False
+
+
+async def close_clients():
+    with _lock:
+        clients = list(_clients.values()) + _retired_clients[:]
+        _clients.clear()
+        _retired_clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+async def tunnel(request: Request):
+    kernel_id = request.path_params.get('kernel_id')
+    destination = request.path_params.get('destination', '')
+    project_id, kernel_url = await _resolve_route(kernel_id)
+    body = _ReplayableBody(_count_bytes(request.stream(), "upstream"))
+
+    async def send(url: str) -> httpx.Response:
+        client = await _get_client(url)
+        # the kernel continues the trace of the tunnel span
+        headers = _forward_headers(request.headers)
+        headers.update(inject())
+        upstream_request = client.build_request(
             request.method,
-            url=f"{project.kernel_url}/{destination}" + request.base_url.query,
-            allow_redirects=False,
-            cookies=request.cookies,
-            headers=request.headers,
-            data=await request.body()
+            f"/{destination}",
+            params=request.url.query,
+            headers=headers,
+            content=body
         )
-        return Response(content=response.content, status_code=response.status_code, headers=response.headers)
+        started = time.perf_counter()
+        response = await client.send(upstream_request, stream=True, follow_redirects=False)
+        TUNNEL_UPSTREAM_DURATION.labels(request.method, str(response.status_code)) \
+            .observe(time.perf_counter() - started)
+        return response
+
+    with tracer.start_as_current_span(f"tunnel {request.method}", kind=SpanKind.CLIENT,
+                                      context=extract(request.headers), attributes={
+                                          "kernel.id": kernel_id, "project.id": project_id,
+                                          "tunnel.destination": f"/{destination}"
+                                      }) as span:
+        try:
+            try:
+                response = await send(kernel_url)
+            except httpx.ConnectError:
+                # nothing of the body was read yet when the connection could not be opened
+                span.add_event("resume")
+                response = await send(await _resume(kernel_id, project_id))
+            else:
+                if response.status_code == status.HTTP_404_NOT_FOUND and \
+                        destination.startswith(f"kernels/{kernel_id}/") and body.replayable:
+                    # a container shared with other kernels stays up, it only no longer knows the suspended one
+                    content = b"".join([chunk async for chunk in response.aiter_raw()])
+                    await response.aclose()
+                    if not _is_kernel_missing(content):
+                        span.set_attribute("http.status_code", response.status_code)
+                        return Response(content, status_code=response.status_code,
+                                        headers=_forward_headers(response.headers))
+                    span.add_event("resume")
+                    response = await send(await _resume(kernel_id, project_id))
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(e)
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Proxy failed")
+        span.set_attribute("http.status_code", response.status_code)
+
+    return StreamingResponse(
+        _count_bytes(response.aiter_raw(), "downstream"),
+        status_code=response.status_code,
+        headers=_forward_headers(response.headers),
+        background=BackgroundTask(response.aclose)
+    )
+
+
+async def tunnel_websocket(websocket: WebSocket):
+    kernel_id = websocket.path_params.get('kernel_id')
+    destination = websocket.path_params.get('destination', '')
+    _, kernel_url = await _resolve_route(kernel_id)
+    upstream_url = "ws" + kernel_url.removeprefix("http") + f"/{destination}"
+    if websocket.url.query:
+        upstream_url += f"?{websocket.url.query}"
+
+    await websocket.accept()
+    try:
+        async with websockets.connect(upstream_url) as upstream:
+            async def client_to_upstream():
+                while True:
+                    message = await websocket.receive()
+                    if message["type"] == "websocket.disconnect":
+                        return
+                    data = message.get("bytes") or message.get("text")
+                    TUNNEL_BYTES.labels("upstream").inc(len(data))
+                    await upstream.send(data)
+
+            async def upstream_to_client():
+                async for message in upstream:
+                    TUNNEL_BYTES.labels("downstream").inc(len(message))
+                    if isinstance(message, bytes):
+                        await websocket.send_bytes(message)
+                    else:
+                        await websocket.send_text(message)
+
+            tasks = [asyncio.create_task(client_to_upstream()), asyncio.create_task(upstream_to_client())]
+            _, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+    except (WebSocketDisconnect, websockets.ConnectionClosed):
+        pass
     except Exception as e:
         logger.error(e)
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Proxy failed")
+    finally:
+        if websocket.client_state != WebSocketState.DISCONNECTED:
+            await websocket.close()
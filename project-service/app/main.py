@@ -1,25 +1,44 @@
+import asyncio
 import datetime
+import json
 import os
 
 import jwt
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from starlette import status
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
+from starlette.responses import StreamingResponse
+from starlette.websockets import WebSocket, WebSocketDisconnect
 
-from app.controller import kernel_controller
-from app.controller.tunnel_controller import tunnel
+from app.controller import kernel_controller, checkpoint_controller, event_hub
+from app.controller.tunnel_controller import tunnel, tunnel_websocket, close_clients
+from app.metrics import track_request_duration
 from app.model.kernel_event import KernelEvent
 from app.model.project_model import Project
 from app.repository import project_repository
+from app.repository.impl.mongo_project_repository import InvalidCursorError
+from app.tracing import setup_tracing
+
+EVENTS_KEEPALIVE = float(os.getenv("EVENTS_KEEPALIVE", "15"))
 
 app = FastAPI()
+setup_tracing("project-service")
 
+app.middleware("http")(track_request_duration)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"],
-                   allow_headers=["*"])
+                   allow_headers=["*"], expose_headers=["X-Total-Rows"])
 
 # Tunnel requests to corresponding container
 app.add_route('/tunnel/{kernel_id:str}/{destination:path}', tunnel, methods=['GET', 'POST', 'DELETE', 'PUT'])
+app.add_websocket_route('/tunnel/{kernel_id:str}/{destination:path}', tunnel_websocket)
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await close_clients()
 
 
 @app.get("/health")
@@ -29,6 +48,11 @@ def health():
     }
 
 
+@app.get("/metrics")
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.post("/auth/register", description="Register a new user account")
 def auth_register():
     pass
@@ -47,8 +71,15 @@ def create_project():
 
 
 @app.get("/projects", description="Get list of all project sessions")
-def get_projects(skip: int = 0, limit: int = 10):
-    return project_repository.fetch_all(skip, limit)
+def get_projects(limit: int = Query(default=10, ge=1, le=100), cursor: str | None = None):
+    try:
+        projects, next_cursor = project_repository.fetch_page(limit, cursor)
+    except InvalidCursorError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return {
+        "projects": projects,
+        "next_cursor": next_cursor
+    }
 
 
 @app.get("/projects/{project_id}", description="Fetches a specific project")
@@ -56,6 +87,7 @@ def get_project(project_id: str):
     project = project_repository.fetch_by_id(project_id)
     if not project:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+    project.graph = checkpoint_controller.get_graph(project)
     return project
 
 
@@ -64,6 +96,7 @@ def delete_project(project_id: str):
     res = project_repository.delete(project_id)
     if not res:
         raise HTTPException(status_code=404, detail="Failed to delete project")
+    checkpoint_controller.delete(project_id)
     return {
         "message": "Project deleted"
     }
@@ -79,17 +112,99 @@ def disconnect_kernel(project_id: str):
     return kernel_controller.disconnect_kernel(project_id)
 
 
+def _kernel_status_event(project: Project) -> dict:
+    # sent first on every subscription, so clients start from the current state
+    return {
+        "type": "kernel_status",
+        "project_id": project.id,
+        "timestamp": datetime.datetime.utcnow().isoformat(),
+        "status": project.kernel_status.value,
+        "kernel_id": project.kernel_id,
+        "error": None
+    }
+
+
+@app.get("/projects/{project_id}/events", description="Stream kernel state changes of the project as server-sent events")
+async def project_events(project_id: str, request: Request):
+    subscription = event_hub.subscribe(project_id)
+    project = await run_in_threadpool(project_repository.fetch_by_id, project_id)
+    if not project:
+        subscription.close()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+
+    async def stream():
+        with subscription:
+            yield f"data: {json.dumps(_kernel_status_event(project))}\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.get(EVENTS_KEEPALIVE)
+                # comment lines keep proxies from closing an idle stream
+                yield f"data: {json.dumps(event)}\n\n" if event is not None else ": keepalive\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.websocket("/projects/{project_id}/events")
+async def project_events_websocket(websocket: WebSocket, project_id: str):
+    with event_hub.subscribe(project_id) as subscription:
+        project = await run_in_threadpool(project_repository.fetch_by_id, project_id)
+        if not project:
+            await websocket.close(code=4404)
+            return
+        await websocket.accept()
+        await websocket.send_json(_kernel_status_event(project))
+        # clients send nothing, receiving only notices when they go away
+        receive = asyncio.create_task(websocket.receive())
+        try:
+            while True:
+                event = asyncio.create_task(subscription.get())
+                await asyncio.wait((receive, event), return_when=asyncio.FIRST_COMPLETED)
+                if event.done():
+                    await websocket.send_json(event.result())
+                else:
+                    event.cancel()
+                if receive.done():
+                    if receive.result()["type"] == "websocket.disconnect":
+                        return
+                    receive = asyncio.create_task(websocket.receive())
+        except WebSocketDisconnect:
+            pass
+        finally:
+            receive.cancel()
+
+
 @app.post("/projects/{project_id}/checkpoint", description="Create a new checkpoint for the graph")
 async def checkpoint(project_id: str, request: Request):
+    graph = await request.json()
+    version = await run_in_threadpool(checkpoint_controller.checkpoint, project_id, graph)
+    return {
+        "status": "ok",
+        "version": version,
+        "saved_at": datetime.datetime.utcnow()
+    }
+
+
+@app.get("/projects/{project_id}/versions", description="List the checkpointed versions of the graph")
+def get_versions(project_id: str, skip: int = 0, limit: int = 50):
+    return checkpoint_controller.list_versions(project_id, skip, limit)
+
+
+@app.get("/projects/{project_id}/versions/{version}", description="Fetch the graph at a given version")
+def get_version(project_id: str, version: int):
     project = project_repository.fetch_by_id(project_id)
     if not project:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
-    graph = await request.json()
-    project.graph = graph
-    project_repository.persist(project)
+    return {
+        "version": version,
+        "graph": checkpoint_controller.get_graph(project, version)
+    }
+
+
+@app.post("/projects/{project_id}/versions/{version}/restore", description="Make an older version the latest one")
+def restore_version(project_id: str, version: int):
     return {
         "status": "ok",
-        "saved_at": datetime.datetime.utcnow()
+        "version": checkpoint_controller.restore(project_id, version),
+        "restored_from": version
     }
 
 
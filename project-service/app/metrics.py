@@ -0,0 +1,40 @@
+import time
+
+from prometheus_client import Counter, Histogram
+from starlette.requests import Request
+from starlette.responses import Response
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent handling HTTP requests", ["method", "route", "status"]
+)
+TUNNEL_UPSTREAM_DURATION = Histogram(
+    "tunnel_upstream_duration_seconds", "Time until a kernel answered a tunnelled request with its headers",
+    ["method", "status"]
+)
+TUNNEL_BYTES = Counter(
+    "tunnel_bytes_total", "Bytes proxied through the tunnel", ["direction"]  # upstream, downstream
+)
+TUNNEL_RESUMES = Counter(
+    "tunnel_resumes_total", "Suspended kernels woken up by a tunnelled request"
+)
+
+
+async def track_request_duration(request: Request, call_next) -> Response:
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        HTTP_REQUEST_DURATION.labels(request.method, route_name(request), str(status_code)) \
+            .observe(time.perf_counter() - started)
+
+
+def route_name(request: Request) -> str:
+    # the route template keeps project and kernel ids out of the labels
+    route = request.scope.get("route")
+    if route is not None:
+        return route.path
+    endpoint = request.scope.get("endpoint")
+    return endpoint.__name__ if endpoint is not None else "unmatched"
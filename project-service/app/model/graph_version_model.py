@@ -0,0 +1,28 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from app.model.project_model import PyObjectId
+
+
+class GraphVersionKind(str, Enum):
+    BASE = "base"
+    DELTA = "delta"
+
+
+class GraphVersion(BaseModel):
+    id: PyObjectId = Field(alias="_id", serialization_alias="id", default=None)
+    project_id: str
+    version: int
+    kind: GraphVersionKind
+    # zlib compressed JSON, the whole graph for a base and a JSON patch against the previous version for a delta
+    data: bytes = Field(exclude=True)
+    size: int
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    restored_from: Optional[int] = None
+
+    class Config:
+        populate_by_name = True
+        arbitrary_types_allowed = True
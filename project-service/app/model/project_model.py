@@ -3,7 +3,7 @@ from enum import Enum
 from typing import Annotated, Optional
 from coolname import generate_slug
 
-from pydantic import BaseModel, Field, BeforeValidator
+from pydantic import BaseModel, Field, BeforeValidator, PrivateAttr
 
 PyObjectId = Annotated[str, BeforeValidator(str)]
 
@@ -24,7 +24,21 @@ class Project(BaseModel):
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     name: str = Field(default_factory=generate_slug)
     graph: Optional[object] = None
+    graph_version: Optional[int] = None
+    # fields assigned since the project was loaded or last persisted
+    _dirty_fields: set = PrivateAttr(default_factory=set)
 
     class Config:
         populate_by_name = True
         arbitrary_types_allowed = True
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in self.model_fields:
+            self._dirty_fields.add(name)
+
+    def dirty_fields(self) -> set:
+        return set(self._dirty_fields)
+
+    def mark_clean(self):
+        self._dirty_fields.clear()
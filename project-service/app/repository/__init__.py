@@ -1,6 +1,9 @@
 from app.application_context import ApplicationContext
+from app.repository.graph_version_repository import GraphVersionRepository
+from app.repository.impl.mongo_graph_version_repository import MongoGraphVersionRepository
 from app.repository.impl.mongo_project_repository import MongoProjectRepository
 from app.repository.project_repository import ProjectRepository
 
 context = ApplicationContext()
 project_repository: ProjectRepository = MongoProjectRepository("projects", context)
+graph_version_repository: GraphVersionRepository = MongoGraphVersionRepository("project_versions", context)
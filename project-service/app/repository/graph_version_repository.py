@@ -0,0 +1,27 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from app.model.graph_version_model import GraphVersion
+
+
+class GraphVersionRepository(ABC):
+    @abstractmethod
+    def insert(self, graph_version: GraphVersion):
+        pass
+
+    @abstractmethod
+    def fetch_latest_version(self, project_id: str) -> Optional[int]:
+        pass
+
+    @abstractmethod
+    def fetch_chain(self, project_id: str, version: int) -> List[GraphVersion]:
+        """the closest base at or before version followed by the deltas up to version"""
+        pass
+
+    @abstractmethod
+    def fetch_all(self, project_id: str, skip=0, limit=0) -> List[GraphVersion]:
+        pass
+
+    @abstractmethod
+    def delete_all(self, project_id: str) -> bool:
+        pass
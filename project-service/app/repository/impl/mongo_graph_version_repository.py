@@ -0,0 +1,42 @@
+from typing import List, Optional
+
+from pymongo import ASCENDING, DESCENDING
+
+from app.application_context import ApplicationContext
+from app.model.graph_version_model import GraphVersion, GraphVersionKind
+from app.repository.graph_version_repository import GraphVersionRepository
+
+
+class MongoGraphVersionRepository(GraphVersionRepository):
+    def __init__(self, collection_name: str, context: ApplicationContext):
+        self.collection = context.database[collection_name]
+
+    def insert(self, graph_version: GraphVersion):
+        result = self.collection.insert_one(graph_version.model_dump(exclude={"id"}, by_alias=True) |
+                                            {"data": graph_version.data})
+        graph_version.id = str(result.inserted_id)
+
+    def fetch_latest_version(self, project_id: str) -> Optional[int]:
+        result = self.collection.find_one({"project_id": project_id}, projection={"version": 1},
+                                          sort=[("version", DESCENDING)])
+        return None if result is None else result["version"]
+
+    def fetch_chain(self, project_id: str, version: int) -> List[GraphVersion]:
+        base = self.collection.find_one(
+            {"project_id": project_id, "kind": GraphVersionKind.BASE.value, "version": {"$lte": version}},
+            projection={"version": 1}, sort=[("version", DESCENDING)]
+        )
+        if base is None:
+            return []
+        return [GraphVersion(**record) for record in self.collection.find(
+            {"project_id": project_id, "version": {"$gte": base["version"], "$lte": version}},
+            sort=[("version", ASCENDING)]
+        )]
+
+    def fetch_all(self, project_id: str, skip=0, limit=0) -> List[GraphVersion]:
+        return [GraphVersion(**record, data=b"") for record in self.collection.find(
+            {"project_id": project_id}, projection={"data": 0}, sort=[("version", DESCENDING)], skip=skip, limit=limit
+        )]
+
+    def delete_all(self, project_id: str) -> bool:
+        return self.collection.delete_many({"project_id": project_id}).acknowledged
@@ -1,12 +1,35 @@
+import base64
+import json
 from datetime import datetime
-from typing import List, Optional
+from typing import Iterable, List, Optional, Tuple
 
+from pymongo import DESCENDING
 from pymongo.collection import ObjectId
 
 from app.application_context import ApplicationContext
-from app.model.project_model import Project
+from app.model.project_model import Project, KernelStatus
 from app.repository.project_repository import ProjectRepository
 
+# listings leave out the graph, it can be megabytes per project
+LISTING_PROJECTION = {"graph": 0}
+
+
+class InvalidCursorError(Exception):
+    pass
+
+
+def encode_cursor(project: Project) -> str:
+    position = {"created_at": project.created_at.isoformat(), "id": project.id}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(position["created_at"]), ObjectId(position["id"])
+    except Exception:
+        raise InvalidCursorError(f"invalid cursor {cursor}")
+
 
 class MongoProjectRepository(ProjectRepository):
     def __init__(self, collection_name: str, context: ApplicationContext):
@@ -22,15 +45,57 @@ class MongoProjectRepository(ProjectRepository):
 
     def fetch_all(self, skip=0, limit=0) -> List[Project]:
         return [Project(**record) for record in
-                self.collection.find(sort=[('created_at', -1)], skip=skip, limit=limit)]
+                self.collection.find(projection=LISTING_PROJECTION, sort=[('created_at', -1)], skip=skip, limit=limit)]
+
+    def fetch_page(self, limit: int, cursor: Optional[str] = None) -> Tuple[List[Project], Optional[str]]:
+        query = {}
+        if cursor is not None:
+            created_at, project_id = decode_cursor(cursor)
+            query = {"$or": [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": project_id}}
+            ]}
+        projects = [Project(**record) for record in self.collection.find(
+            query, projection=LISTING_PROJECTION, sort=[("created_at", DESCENDING), ("_id", DESCENDING)], limit=limit + 1
+        )]
+        # the extra project only tells whether there is a next page
+        next_cursor = encode_cursor(projects[limit - 1]) if len(projects) > limit else None
+        return projects[:limit], next_cursor
 
     def persist(self, project: Project):
         if project.id is None:
             result = self.collection.insert_one(project.model_dump(exclude={"id"}, by_alias=True))
             project.id = str(result.inserted_id)
         else:
+            dirty_fields = project.dirty_fields() - {"id"}
+            if not dirty_fields:
+                return
             project.updated_at = datetime.utcnow()
-            self.collection.update_one({"_id": ObjectId(project.id)}, {"$set": project.model_dump()})
+            self.collection.update_one({"_id": ObjectId(project.id)},
+                                       {"$set": project.model_dump(include=dirty_fields | {"updated_at"})})
+        project.mark_clean()
+
+    def transition_kernel_status(self, project_id: str, from_statuses: Iterable[KernelStatus],
+                                 to_status: KernelStatus, **fields) -> bool:
+        result = self.collection.update_one(
+            {"_id": ObjectId(project_id), "kernel_status": {"$in": [s.value for s in from_statuses]}},
+            {"$set": {"kernel_status": to_status.value, "updated_at": datetime.utcnow(), **fields}}
+        )
+        return result.modified_count > 0
+
+    def refresh_kernel_url(self, project_id: str, kernel_id: str, kernel_url: str) -> bool:
+        result = self.collection.update_one(
+            {"_id": ObjectId(project_id), "kernel_status": KernelStatus.CONNECTED.value, "kernel_id": kernel_id},
+            {"$set": {"kernel_url": kernel_url, "updated_at": datetime.utcnow()}}
+        )
+        return result.matched_count > 0
+
+    def update_graph_version(self, project_id: str, version: int):
+        # the graph itself lives in the versions collection once a project is checkpointed
+        self.collection.update_one({"_id": ObjectId(project_id)}, {
+            "$set": {"graph_version": version, "updated_at": datetime.utcnow()},
+            "$unset": {"graph": ""}
+        })
 
     def delete(self, project_id: str) -> bool:
         response = self.collection.delete_one({"_id": ObjectId(project_id)})
@@ -1,7 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import Iterable, List, Optional, Tuple
 
-from app.model.project_model import Project
+from app.model.project_model import Project, KernelStatus
 
 
 class ProjectRepository(ABC):
@@ -13,12 +13,33 @@ class ProjectRepository(ABC):
     def fetch_all(self, skip=None, limit=0) -> List[Project]:
         pass
 
+    @abstractmethod
+    def fetch_page(self, limit: int, cursor: Optional[str] = None) -> Tuple[List[Project], Optional[str]]:
+        """newest projects first without their graph, returns the page and the cursor of the next one"""
+        pass
+
     @abstractmethod
     def fetch_by_kernel_id(self, kernel_id: str) -> Optional[Project]:
         pass
 
     @abstractmethod
     def persist(self, project: Project):
+        """insert a new project, or write the fields changed since it was loaded"""
+        pass
+
+    @abstractmethod
+    def transition_kernel_status(self, project_id: str, from_statuses: Iterable[KernelStatus],
+                                 to_status: KernelStatus, **fields) -> bool:
+        """move the kernel status only if it is currently one of from_statuses, setting fields alongside"""
+        pass
+
+    @abstractmethod
+    def refresh_kernel_url(self, project_id: str, kernel_id: str, kernel_url: str) -> bool:
+        """set the url of the kernel a project is connected to, only while it is still connected to that kernel"""
+        pass
+
+    @abstractmethod
+    def update_graph_version(self, project_id: str, version: int):
         pass
 
     @abstractmethod
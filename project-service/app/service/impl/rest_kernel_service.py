@@ -2,11 +2,17 @@ import logging
 import os
 import jwt
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from app.service.kernel_service import KernelService
 
 logger = logging.getLogger("uvicorn")
 
+# (connect, read) timeouts, resuming waits for the kernel to register again
+TIMEOUT = (5, 30)
+RESUME_TIMEOUT = (5, 150)
+
 
 class RestKernelService(KernelService):
     def __init__(self):
@@ -18,17 +24,40 @@ class RestKernelService(KernelService):
         if self.host_server is None:
             raise Exception("Missing HOST_SERVER")
 
+        self.session = self.__create_session__(int(os.getenv("KERNEL_API_RETRIES", "4")),
+                                               int(os.getenv("KERNEL_API_POOL_SIZE", "16")))
+
     def provision_kernel(self, project_id: str):
-        response = requests.post(self.__build_url__(project_id, "kernels"))
+        response = self.session.post(self.__build_url__(project_id, "kernels"), timeout=TIMEOUT)
         if response.status_code != 200:
             raise Exception(f"Kernel service returned status code {response.status_code}")
 
     def stop_kernel(self, project_id: str, kernel_id: str):
         logger.info(f"Stopping kernel {kernel_id}")
-        response = requests.delete(self.__build_url__(project_id, f"kernels/{kernel_id}"))
+        response = self.session.delete(self.__build_url__(project_id, f"kernels/{kernel_id}"), timeout=TIMEOUT)
         if response.status_code not in (200, 404):
             raise Exception(f"Kernel service returned status code {response.status_code}")
 
+    def resume_kernel(self, project_id: str, kernel_id: str) -> str:
+        logger.info(f"Resuming kernel {kernel_id}")
+        response = self.session.post(self.__build_url__(project_id, f"kernels/{kernel_id}/resume"),
+                                     timeout=RESUME_TIMEOUT)
+        if response.status_code != 200:
+            raise Exception(f"Kernel service returned status code {response.status_code}")
+        return response.json()["url"]
+
+    @staticmethod
+    def __create_session__(retries: int, pool_size: int) -> requests.Session:
+        # only requests which never reached the kernel service or were turned away are retried,
+        # with an exponentially growing, jittered delay
+        retry = Retry(total=retries, connect=retries, read=0, status=retries, status_forcelist=(502, 503, 504),
+                      allowed_methods=None, backoff_factor=0.5, backoff_jitter=0.5, raise_on_status=False)
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
     def __build_url__(self, project_id: str, path: str):
         auth_token = jwt.encode({
             "project_id": project_id
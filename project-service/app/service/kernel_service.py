@@ -9,3 +9,8 @@ class KernelService(ABC):
     @abstractmethod
     def stop_kernel(self, project_id: str, kernel_id: str):
         pass
+
+    @abstractmethod
+    def resume_kernel(self, project_id: str, kernel_id: str) -> str:
+        """wake up a suspended kernel, returns its new url"""
+        pass
@@ -0,0 +1,57 @@
+import importlib
+import os
+import sys
+
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor, \
+    SpanExporter
+
+# none, console, file, otlp or module:ExporterClass
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+
+# a proxy, spans are dropped until tracing is set up
+tracer = trace.get_tracer("mlblock.project")
+
+
+def _json_line(span) -> str:
+    return span.to_json(indent=None) + os.linesep
+
+
+def create_exporter(name: str) -> SpanExporter:
+    if name == "console":
+        return ConsoleSpanExporter(out=sys.stdout, formatter=_json_line)
+    if name == "file":
+        return ConsoleSpanExporter(out=open(TRACE_FILE, "a", buffering=1), formatter=_json_line)
+    if name == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    module, _, exporter_class = name.partition(":")
+    if not exporter_class:
+        raise Exception(f"unknown trace exporter {name}")
+    return getattr(importlib.import_module(module), exporter_class)()
+
+
+def setup_tracing(service_name: str):
+    if TRACE_EXPORTER == "none":
+        return
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    exporter = create_exporter(TRACE_EXPORTER)
+    if TRACE_EXPORTER in ("console", "file"):
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+    else:
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+
+def inject() -> dict:
+    """the current trace context as w3c headers"""
+    carrier = {}
+    propagate.inject(carrier)
+    return carrier
+
+
+def extract(carrier):
+    return propagate.extract(carrier)
@@ -0,0 +1,27 @@
+import os
+
+import mongomock
+import pymongo
+import pytest
+
+# the application context connects when the repositories are imported, the tests use an in-memory database
+pymongo.MongoClient = mongomock.MongoClient
+os.environ.setdefault("MONGO_DATABASE", "project-service-test")
+os.environ.setdefault("REST_KERNEL_API", "http://kernel-service")
+os.environ.setdefault("HOST_SERVER", "http://project-service")
+
+from app.application_context import ApplicationContext  # noqa: E402
+from app.repository.impl.mongo_project_repository import MongoProjectRepository  # noqa: E402
+
+
+@pytest.fixture
+def context():
+    context = ApplicationContext()
+    yield context
+    for collection_name in context.database.list_collection_names():
+        context.database[collection_name].delete_many({})
+
+
+@pytest.fixture
+def project_repository(context):
+    return MongoProjectRepository("projects", context)
@@ -0,0 +1,77 @@
+import pytest
+from fastapi import HTTPException
+
+from app.controller.checkpoint_controller import CheckpointController
+from app.model.graph_version_model import GraphVersionKind
+from app.model.project_model import Project
+from app.repository.impl.mongo_graph_version_repository import MongoGraphVersionRepository
+
+
+@pytest.fixture
+def graph_version_repository(context):
+    return MongoGraphVersionRepository("project_versions", context)
+
+
+@pytest.fixture
+def controller(project_repository, graph_version_repository):
+    return CheckpointController(project_repository, graph_version_repository, base_interval=3)
+
+
+@pytest.fixture
+def project(project_repository):
+    project = Project()
+    project_repository.persist(project)
+    return project
+
+
+def graph(version: int) -> dict:
+    return {
+        "nodes": [{"id": str(i), "data": {"value": i * version}} for i in range(version % 4 + 1)],
+        "edges": [{"source": "0", "target": str(i)} for i in range(1, version % 4 + 1)]
+    }
+
+
+def test_versions_replay_across_bases(controller, graph_version_repository, project_repository, project):
+    for version in range(1, 8):
+        assert controller.checkpoint(project.id, graph(version)) == version
+
+    kinds = {graph_version.version: graph_version.kind for graph_version in controller.list_versions(project.id)}
+    # a base every base_interval versions, deltas in between
+    assert kinds == {1: GraphVersionKind.BASE, 2: GraphVersionKind.DELTA, 3: GraphVersionKind.BASE,
+                     4: GraphVersionKind.DELTA, 5: GraphVersionKind.DELTA, 6: GraphVersionKind.BASE,
+                     7: GraphVersionKind.DELTA}
+    for version in range(1, 8):
+        assert controller.get_graph(project, version) == graph(version)
+
+    # without cached heads the latest graph is replayed from the database
+    fresh = CheckpointController(project_repository, graph_version_repository, base_interval=3)
+    assert fresh.get_graph(project_repository.fetch_by_id(project.id)) == graph(7)
+
+
+def test_unchanged_graph_keeps_its_version(controller, project):
+    assert controller.checkpoint(project.id, graph(1)) == 1
+    assert controller.checkpoint(project.id, graph(1)) == 1
+    assert [graph_version.version for graph_version in controller.list_versions(project.id)] == [1]
+
+
+def test_restore_appends_the_old_graph(controller, project_repository, project):
+    for version in range(1, 6):
+        controller.checkpoint(project.id, graph(version))
+
+    assert controller.restore(project.id, 2) == 6
+    project = project_repository.fetch_by_id(project.id)
+    assert project.graph_version == 6
+    assert controller.get_graph(project) == graph(2)
+    assert controller.get_graph(project, 5) == graph(5)
+    assert controller.list_versions(project.id)[0].restored_from == 2
+
+    # restoring the latest graph still records the restore
+    assert controller.restore(project.id, 6) == 7
+    assert controller.get_graph(project) == graph(2)
+
+
+def test_unknown_version(controller, project):
+    controller.checkpoint(project.id, graph(1))
+    with pytest.raises(HTTPException) as error:
+        controller.get_graph(project, 2)
+    assert error.value.status_code == 404
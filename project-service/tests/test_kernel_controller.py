@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.controller.event_hub import EventHub
+from app.controller.kernel_controller import KernelController
+from app.model.kernel_event import KernelEvent
+from app.model.project_model import KernelStatus, Project
+
+
+class FakeKernelService:
+    def __init__(self):
+        self.provisioned = []
+
+    def provision_kernel(self, project_id: str):
+        self.provisioned.append(project_id)
+
+
+@pytest.fixture
+def event_hub():
+    return EventHub()
+
+
+@pytest.fixture
+def controller(project_repository, event_hub):
+    return KernelController(project_repository, FakeKernelService(), event_hub)
+
+
+@pytest.fixture
+def project(project_repository):
+    project = Project()
+    project_repository.persist(project)
+    return project
+
+
+def started(kernel_id: str, kernel_url: str) -> KernelEvent:
+    return KernelEvent(type="started", timestamp=datetime.utcnow(), kernel_id=kernel_id, status="running",
+                       kernel_url=kernel_url)
+
+
+def test_started_kernel_is_stored_before_it_is_published(controller, project_repository, event_hub, project):
+    project_repository.transition_kernel_status(project.id, (KernelStatus.DISCONNECTED,), KernelStatus.CONNECTING)
+    published = []
+    event_hub.publish = lambda project_id, type, **data: published.append(
+        project_repository.fetch_by_id(project_id).model_dump(include={"kernel_status", "kernel_id", "kernel_url"}))
+
+    controller.update_kernel_state(project.id, started("kernel-1", "http://slave:5000"))
+
+    stored = {"kernel_status": KernelStatus.CONNECTED, "kernel_id": "kernel-1", "kernel_url": "http://slave:5000"}
+    assert published == [stored]
+    assert project_repository.fetch_by_id(project.id).model_dump(include=set(stored)) == stored
+
+
+def test_resumed_kernel_refreshes_its_url(controller, project_repository, project):
+    project_repository.transition_kernel_status(project.id, (KernelStatus.DISCONNECTED,), KernelStatus.CONNECTING)
+    controller.update_kernel_state(project.id, started("kernel-1", "http://slave:5000"))
+
+    controller.update_kernel_state(project.id, started("kernel-1", "http://slave:5001"))
+
+    project = project_repository.fetch_by_id(project.id)
+    assert project.kernel_status == KernelStatus.CONNECTED
+    assert project.kernel_url == "http://slave:5001"
+
+
+def test_started_kernel_of_a_disconnected_project_is_rejected(controller, project_repository, project):
+    with pytest.raises(HTTPException) as error:
+        controller.update_kernel_state(project.id, started("kernel-1", "http://slave:5000"))
+
+    assert error.value.status_code == 409
+    project = project_repository.fetch_by_id(project.id)
+    assert project.kernel_status == KernelStatus.DISCONNECTED
+    assert project.kernel_id is None
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.model.project_model import Project
+from app.repository.impl.mongo_project_repository import InvalidCursorError
+
+
+def create_projects(project_repository, created_at) -> list:
+    projects = []
+    for timestamp in created_at:
+        project = Project(created_at=timestamp)
+        project_repository.persist(project)
+        projects.append(project.id)
+    return projects
+
+
+def fetch_pages(project_repository, limit: int) -> list:
+    pages, cursor = [], None
+    while True:
+        projects, cursor = project_repository.fetch_page(limit, cursor)
+        pages.append([project.id for project in projects])
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("count, limit, sizes", [
+    (5, 2, [2, 2, 1]),
+    # a last page which is exactly full has no next cursor
+    (4, 2, [2, 2]),
+    (2, 5, [2]),
+    (0, 3, [0])
+])
+def test_pages_cover_every_project_once(project_repository, count, limit, sizes):
+    start = datetime(2024, 1, 1)
+    ids = create_projects(project_repository, [start + timedelta(minutes=i) for i in range(count)])
+
+    pages = fetch_pages(project_repository, limit)
+
+    assert [len(page) for page in pages] == sizes
+    # newest first
+    assert [project_id for page in pages for project_id in page] == ids[::-1]
+
+
+def test_projects_created_at_the_same_time_are_split_by_id(project_repository):
+    created_at = datetime(2024, 1, 1)
+    ids = create_projects(project_repository, [created_at] * 3 + [created_at - timedelta(seconds=1)] * 2)
+
+    pages = fetch_pages(project_repository, 2)
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [project_id for page in pages for project_id in page] == ids[2::-1] + ids[:2:-1]
+
+
+def test_invalid_cursor(project_repository):
+    with pytest.raises(InvalidCursorError):
+        project_repository.fetch_page(10, "not a cursor")